@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database.models import UserModel
+from schemas.response import MetricsResponse, ProfileResponse
+from schemas.employee import IndexBackfillResponse
+from schemas.column_alias import ColumnAliasCreate, ColumnAliasResponse
+from core.dependencies import get_db, require_admin
+from services.employee_index import backfill_employee_index
+from services.column_resolver import add_alias, delete_alias, list_aliases
+from services.dashboard_cache import cache_stats
+from services.retention import run_retention
+from core.profiling import list_profiles, resolve_profile, render_profile_text
+
+router = APIRouter()
+
+
+@router.get("/profiles", response_model=List[ProfileResponse])
+async def get_request_profiles(current_user: UserModel = Depends(require_admin)):
+    return list_profiles()
+
+
+@router.get("/profiles/{name}")
+async def download_request_profile(
+    name: str,
+    as_text: bool = Query(False, description="Return a pstats summary sorted by cumulative time"),
+    current_user: UserModel = Depends(require_admin),
+):
+    profile = resolve_profile(name)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if as_text:
+        return PlainTextResponse(render_profile_text(profile))
+
+    return FileResponse(
+        path=profile, filename=profile.name, media_type="application/octet-stream"
+    )
+
+
+@router.post("/employee_index/backfill", response_model=IndexBackfillResponse)
+async def backfill_index(
+    scheme: str = Query(..., regex="^(pf|esi)$", description="Scheme to backfill (pf or esi)"),
+    current_user: UserModel = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    return backfill_employee_index(db, scheme)
+
+
+@router.get("/column_aliases", response_model=List[ColumnAliasResponse])
+async def get_column_aliases(
+    scheme: Optional[str] = Query(None, regex="^(pf|esi)$", description="Only aliases of this scheme"),
+    current_user: UserModel = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    return list_aliases(db, scheme)
+
+
+@router.post("/column_aliases", response_model=ColumnAliasResponse)
+async def create_column_alias(
+    payload: ColumnAliasCreate,
+    current_user: UserModel = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    return add_alias(db, payload.scheme, payload.field, payload.alias)
+
+
+@router.delete("/column_aliases/{alias_id}")
+async def remove_column_alias(
+    alias_id: int,
+    current_user: UserModel = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    delete_alias(db, alias_id)
+    return {"message": "Alias removed"}
+
+
+@router.get("/metrics", response_model=MetricsResponse)
+async def get_metrics(current_user: UserModel = Depends(require_admin)):
+    return MetricsResponse(dashboard_cache=cache_stats())
+
+
+@router.post("/retention/run")
+async def run_output_retention(
+    dry_run: bool = Query(False, description="Report what would be removed and archived without changing anything"),
+    current_user: UserModel = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    try:
+        # Zipping and deleting take a while; keep them off the event loop
+        return await run_in_threadpool(run_retention, db, dry_run=dry_run)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
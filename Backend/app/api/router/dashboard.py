@@ -4,7 +4,6 @@ from typing import Optional
 import asyncio
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract, text
-from dateutil.relativedelta import relativedelta
 
 from database.models import ProcessedFilePF, ProcessedFileESI, UserModel
 from schemas.dashboard import (
@@ -25,6 +24,8 @@ from services.dashboard import (
     get_delayed_submissions_chart_data,
     get_avg_remittance_day_by_year,  # Add this import
 )
+from services.dashboard_cache import cached_response
+from core.responses import prevalidated_response
 
 router = APIRouter()
 
@@ -36,7 +37,11 @@ async def get_monthly_amounts_endpoint(
     db: Session = Depends(get_db),
 ):
     current_year = year or datetime.now().year
-    return await get_monthly_amounts(db, current_year, current_user)
+    return prevalidated_response(await cached_response(
+        "monthly_amounts", current_user, current_year,
+        lambda: get_monthly_amounts(db, current_year, current_user),
+        response_model=MonthlyAmountData,
+    ))
 
 
 @router.get("/summary_stats", response_model=SummaryStatsResponse)
@@ -48,14 +53,19 @@ async def get_summary_stats_endpoint(
 ):
     current_year = year or datetime.now().year
 
-    # Get the raw summary stats
-    summary_data = await get_summary_stats(db, current_year, month, current_user)
-    monthly_data = await get_monthly_amounts(db, current_year, current_user)
+    async def compute():
+        # Get the raw summary stats
+        summary_data = await get_summary_stats(db, current_year, month, current_user)
+        monthly_data = await get_monthly_amounts(db, current_year, current_user)
 
-    # Create the proper response structure
-    return SummaryStatsResponse(
-        summary_stats=summary_data, monthly_amounts=monthly_data, year=current_year
-    )
+        # Create the proper response structure
+        return SummaryStatsResponse(
+            summary_stats=summary_data, monthly_amounts=monthly_data, year=current_year
+        )
+
+    return prevalidated_response(await cached_response(
+        "summary_stats", current_user, current_year, compute, response_model=SummaryStatsResponse, month=month
+    ))
 
 
 @router.get("/submissions_data", response_model=SubmissionsDataResponse)
@@ -66,25 +76,32 @@ async def get_submissions_data_endpoint(
 ):
     current_year = year or datetime.now().year
 
-    pf_submissions, esi_submissions, delayed_data = await asyncio.gather(
-        get_submission_timeline_data(db, ProcessedFilePF, current_year, current_user),
-        get_submission_timeline_data(db, ProcessedFileESI, current_year, current_user),
-        get_delayed_submissions(db, current_year, current_user),
-    )
+    async def compute():
+        pf_submissions, esi_submissions, delayed_data = await asyncio.gather(
+            get_submission_timeline_data(db, ProcessedFilePF, current_year, current_user),
+            get_submission_timeline_data(db, ProcessedFileESI, current_year, current_user),
+            get_delayed_submissions(db, current_year, current_user),
+        )
 
-    return SubmissionsDataResponse(
-        pf_submissions=pf_submissions,
-        esi_submissions=esi_submissions,
-        delayed_submissions=delayed_data,
-        year=current_year,
-    )
+        return SubmissionsDataResponse(
+            pf_submissions=pf_submissions,
+            esi_submissions=esi_submissions,
+            delayed_submissions=delayed_data,
+            year=current_year,
+        )
+
+    return prevalidated_response(await cached_response(
+        "submissions_data", current_user, current_year, compute, response_model=SubmissionsDataResponse
+    ))
 
 
 @router.get("/year_list", response_model=Years)
 async def get_all_years_endpoint(
     current_user: UserModel = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    return await get_all_years(current_user, db)
+    return prevalidated_response(await cached_response(
+        "year_list", current_user, None, lambda: get_all_years(current_user, db), response_model=Years
+    ))
 
 
 @router.get("/yearly_summary", response_model=SummaryStatsResponse)
@@ -95,14 +112,19 @@ async def get_yearly_summary_endpoint(
 ):
     current_year = year or datetime.now().year
 
-    # Get the raw summary stats
-    summary_data = await get_summary_stats(db, current_year, None, current_user)
-    monthly_data = await get_monthly_amounts(db, current_year, current_user)
+    async def compute():
+        # Get the raw summary stats
+        summary_data = await get_summary_stats(db, current_year, None, current_user)
+        monthly_data = await get_monthly_amounts(db, current_year, current_user)
 
-    # Create the proper response structure
-    return SummaryStatsResponse(
-        summary_stats=summary_data, monthly_amounts=monthly_data, year=current_year
-    )
+        # Create the proper response structure
+        return SummaryStatsResponse(
+            summary_stats=summary_data, monthly_amounts=monthly_data, year=current_year
+        )
+
+    return prevalidated_response(await cached_response(
+        "yearly_summary", current_user, current_year, compute, response_model=SummaryStatsResponse
+    ))
 
 
 @router.get("/delayed-submissions_mode", response_model=DelayedChartResponse)
@@ -112,7 +134,11 @@ async def delayed_submissions_chart_endpoint(
     db: Session = Depends(get_db),
 ):
     current_year = year or datetime.now().year
-    return await get_delayed_submissions_chart_data(db, current_year, current_user)
+    return prevalidated_response(await cached_response(
+        "delayed_submissions_chart", current_user, current_year,
+        lambda: get_delayed_submissions_chart_data(db, current_year, current_user),
+        response_model=DelayedChartResponse,
+    ))
 
 
 @router.get("/uploads/by-year-days")
@@ -122,4 +148,7 @@ async def get_avg_remittance_day_by_year_endpoint(
     db: Session = Depends(get_db),
 ):
     # Use the fixed function from services
-    return await get_avg_remittance_day_by_year(db, year, current_user)
+    return await cached_response(
+        "avg_remittance_day", current_user, year,
+        lambda: get_avg_remittance_day_by_year(db, year, current_user),
+    )
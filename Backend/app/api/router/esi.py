@@ -7,25 +7,43 @@ from fastapi import (
     HTTPException,
     Query,
     BackgroundTasks,
+    Request,
 )
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta,date
-from pathlib import Path
 from typing import List, Optional
 from io import BytesIO
 import zipfile
-import pandas as pd
-import math
-import uuid
-import shutil
-import filetype
 
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from database.models import ProcessedFileESI, UserModel
 from schemas.response import FileProcessResult, ProcessedFileResponse
+from schemas.remittance import ChallanCheckResponse, ChallanFields
+from schemas.reconciliation import ReconciliationReport
 from services.esi import process_esi_files, build_esi_response
+from services.contribution_store import search_contributions, summarize_contributions
+from services.employee_index import get_employee_history
+from services.payroll_diff import get_record_diff
+from services.artifacts import (
+    CHALLAN, ERRORS, TXT, XLSX, ensure_digest, get_artifact, record_artifact, run_key, sha256_file,
+    with_artifacts,
+)
+from services.file_digests import REVALIDATE, stored_file_response
+from services.remittance import submit_remittances
+from services.reconciliation import reconcile, reconciliation_report
+from services.challan_parser import (
+    challan_fields, cached_extraction, cross_check, extract_stored_challan, extract_uploaded_challan,
+    resolve_remittance_values,
+)
+from services.dashboard_cache import invalidate_dashboard
+from core.responses import validated_json_response
+from services.retention import output_exists, resolve_output
+from services.storage import get_storage
+from schemas.employee import ESIEmployeeHistory
+from core.config import settings
 from core.dependencies import get_db, get_current_user, require_hr_or_admin
-from utlis.files_utils import sanitize_folder_name
+from utlis.files_utils import sanitize_folder_name, unique_run_folder
 
 router = APIRouter()
 
@@ -37,10 +55,11 @@ async def process_esi_file(
     ),
     folder_name: str = Form(..., min_length=1, max_length=500),
     upload_month: str = Form(..., description="Date in YYYY-MM-DD format"),
+    duplicate_policy: Optional[str] = Form(None, description="reject, keep-last or sum for an ESI number found in several rows"),
     current_user: UserModel = Depends(require_hr_or_admin),
     db: Session = Depends(get_db),
 ):
-    return await process_esi_files(files, folder_name, upload_month, current_user, db)
+    return await process_esi_files(files, folder_name, upload_month, current_user, db, duplicate_policy)
 
 
 @router.get("/processed_files", response_model=List[ProcessedFileResponse])
@@ -72,42 +91,30 @@ async def get_processed_files_esi(
     elif user_id is not None:
         query = query.filter(ProcessedFileESI.user_id == user_id)
 
-    files = query.order_by(ProcessedFileESI.created_at.desc()).all()
+    rows = with_artifacts(query.order_by(ProcessedFileESI.created_at.desc()), "esi", (XLSX, TXT, CHALLAN))
     processed_results = []
     seen_folders = set()
 
-    for file in files:
+    for file, artifacts in rows:
         if file.status == "success":
-            try:
-                filepaths = file.filepath.split(",")
-                if len(filepaths) == 2:
-                    excel_path = Path(filepaths[0])
-                    timestamp_folder = excel_path.parent.name
-
-                    if timestamp_folder in seen_folders:
-                        continue
-
-                    seen_folders.add(timestamp_folder)
-                    text_path = Path(filepaths[1])
-
-                    if not excel_path.exists() or not text_path.exists():
-                        file.status = "error"
-                        file.message = "Output files not found on server"
-                        db.add(file)
-                        continue
-
-                    processed_results.append(file)
-                else:
-                    file.status = "error"
-                    file.message = "Invalid file path format in database"
-                    db.add(file)
-            except Exception:
+            excel, text = artifacts.get(XLSX), artifacts.get(TXT)
+            if excel is None or text is None:
                 file.status = "error"
-                file.message = "Error processing file path"
+                file.message = "No output files recorded for this file"
                 db.add(file)
-                processed_results.append(file)
-        else:
-            processed_results.append(file)
+                continue
+
+            timestamp_folder = run_key(excel.key)
+            if timestamp_folder in seen_folders:
+                continue
+            seen_folders.add(timestamp_folder)
+
+            if not output_exists(excel.key) or not output_exists(text.key):
+                file.status = "error"
+                file.message = "Output files not found on server"
+                db.add(file)
+                continue
+        processed_results.append((file, artifacts))
 
     try:
         db.commit()
@@ -115,30 +122,37 @@ async def get_processed_files_esi(
         db.rollback()
 
     if current_user.role != "admin" or user_id is not None:
-        return [build_esi_response(file) for file in processed_results]
+        return validated_json_response(
+            [build_esi_response(file, artifacts) for file, artifacts in processed_results],
+            List[ProcessedFileResponse],
+        )
 
     user_latest = {}
-    for file in processed_results:
+    for file, artifacts in processed_results:
         if (
             file.user_id not in user_latest
-            or file.created_at > user_latest[file.user_id].created_at
+            or file.created_at > user_latest[file.user_id][0].created_at
         ):
-            user_latest[file.user_id] = file
+            user_latest[file.user_id] = (file, artifacts)
 
-    return [build_esi_response(file) for file in user_latest.values()]
+    return validated_json_response(
+        [build_esi_response(file, artifacts) for file, artifacts in user_latest.values()],
+        List[ProcessedFileResponse],
+    )
 
 
 @router.post("/processed_files/{file_id}/submit_remittance")
 async def submit_remittance(
     file_id: int,
-    remittance_date: str = Form(..., description="Enter the date for the Remittance in YYYY-MM-DD format"), 
-    remittance_amount: float = Form(..., description="Total remittance amount"),
+    background_tasks: BackgroundTasks,
+    remittance_date: Optional[str] = Form(None, description="Enter the date for the Remittance in YYYY-MM-DD format (read from the challan when left out)"), 
+    remittance_amount: Optional[float] = Form(None, description="Total remittance amount (read from the challan when left out)"),
     remittance_file: UploadFile = File(...),
     current_user: UserModel = Depends(require_hr_or_admin),
     db: Session = Depends(get_db),
 ):  
     try:
-        parsed_date = datetime.strptime(remittance_date, "%Y-%m-%d").date()
+        parsed_date = datetime.strptime(remittance_date, "%Y-%m-%d").date() if remittance_date else None
     except ValueError:
         raise HTTPException(
             status_code=400,
@@ -147,7 +161,7 @@ async def submit_remittance(
     if not remittance_file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are accepted")
 
-    if remittance_amount <= 0:
+    if remittance_amount is not None and remittance_amount <= 0:
         raise HTTPException(
             status_code=400, detail="Remittance amount must be positive"
         )
@@ -161,82 +175,118 @@ async def submit_remittance(
             status_code=400, detail="File missing upload month information"
         )
     upload_month_str = file.upload_month.strftime("%Y-%m-%d") if isinstance(file.upload_month, date) else str(file.upload_month)
-    remittance_dir = Path("remittance_challans") / upload_month_str
-    remittance_dir.mkdir(parents=True, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = unique_run_folder()
     month_for_filename = file.upload_month.strftime("%Y_%m_%d") if isinstance(file.upload_month, date) else str(file.upload_month).replace('-', '_')
     new_filename = f"ESI_Remittance_{month_for_filename}_{file_id}_{timestamp}.pdf"
-    file_path = remittance_dir / new_filename
+    challan_key = f"remittance_challans/{upload_month_str}/{new_filename}"
 
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(remittance_file.file, buffer)
+        file_path = get_storage().put_stream(challan_key, remittance_file.file)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to save remittance file: {str(e)}"
         )
 
+    challan_sha256 = sha256_file(file_path)
+    remittance_amount, parsed_date, extraction = await run_in_threadpool(
+        resolve_remittance_values, db, challan_sha256, file_path, remittance_amount, parsed_date
+    )
+    if remittance_amount is None or parsed_date is None or remittance_amount <= 0:
+        get_storage().delete(challan_key)
+        raise HTTPException(
+            status_code=400,
+            detail="Could not read the remittance amount and date from the challan, please enter them",
+        )
+
     try:
         file.remittance_submitted = True
         file.remittance_month = file.upload_month
         file.remittance_date = parsed_date
         file.remittance_amount = remittance_amount
-        file.remittance_challan_path = str(file_path)
+        file.remittance_challan_path = challan_key
         file.remittance_submitted_at = datetime.now()
         file.remittance_submitted_by = current_user.id
+        record_artifact(db, "esi", file.id, CHALLAN, challan_key, file_path, challan_sha256)
+        reconciliation = reconcile(db, "esi", file)
         db.commit()
     except Exception as e:
-        if file_path.exists():
-            file_path.unlink()
+        get_storage().delete(challan_key)
         raise HTTPException(
             status_code=500, detail=f"Failed to update database: {str(e)}"
         )
 
+    invalidate_dashboard(file.user_id)
+    if extraction is None and settings.CHALLAN_PARSING:
+        background_tasks.add_task(extract_stored_challan, challan_key, challan_sha256)
+
     return {
         "status": "success",
         "message": "Remittance submitted successfully",
         "details": {
             "file_id": file_id,
             "remittance_month": upload_month_str,
-            "remittance_date": remittance_date,
+            "remittance_date": parsed_date.isoformat(),
             "remittance_amount": remittance_amount,
-            "challan_path": str(file_path),
+            "challan_path": challan_key,
             "submitted_at": datetime.now().isoformat(),
+            "challan_check": cross_check(extraction, remittance_amount, parsed_date),
+            "reconciliation": reconciliation,
         },
     }
 
+@router.post("/processed_files/batch_submit_remittance")
+async def submit_esi_remittances(
+    background_tasks: BackgroundTasks,
+    manifest: Optional[str] = Form(None, description="JSON list or CSV of file_id, challan, remittance_amount, remittance_date"),
+    challan_files: Optional[List[UploadFile]] = File(None, description="Challan PDFs named in the manifest"),
+    archive: Optional[UploadFile] = File(None, description="Zip of the challan PDFs, optionally with manifest.json / manifest.csv"),
+    atomic: bool = Form(False, description="Submit nothing unless every item is valid"),
+    current_user: UserModel = Depends(require_hr_or_admin),
+    db: Session = Depends(get_db),
+):
+    if not challan_files and archive is None:
+        raise HTTPException(status_code=400, detail="Upload the challan files or a zip archive of them")
+    return await run_in_threadpool(
+        submit_remittances, db, "esi", current_user, background_tasks, manifest, challan_files, archive, atomic
+    )
+
 @router.get("/processed_files/{file_id}/remittance_challan")
 async def download_remittance_challan(
     file_id:int,
+    request: Request,
     current_user: UserModel = Depends(require_hr_or_admin),
     db: Session = Depends(get_db),
 ):
     file = db.query(ProcessedFileESI).filter(ProcessedFileESI.id == file_id).first()
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
-    if not file.remittance_submitted or not file.remittance_challan_path:
+    challan = get_artifact(db, "esi", file_id, CHALLAN)
+    if not file.remittance_submitted or challan is None:
         raise HTTPException(status_code=404, detail="No remittance challan found for this file")
     if current_user.role not in ["hr","admin"] and file.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="You don't have permission to access this remittance challan")
-    challan_path = Path(file.remittance_challan_path)
-    if not challan_path.exists():
-        raise HTTPException(status_code=404, detail="Remittance file not found on server")
     upload_month_str = file.upload_month.strftime("%Y_%m_%d") if isinstance(file.upload_month, date) else str(file.upload_month).replace('-', '_')
     filename = f"ESI_Remittance_{upload_month_str}_{file_id}.pdf"
     month_header = file.upload_month.strftime("%Y-%m-%d") if isinstance(file.upload_month, date) else str(file.upload_month) or ""
 
 
-    return FileResponse(
-        str(challan_path),
+    response = stored_file_response(
+        request,
+        db,
+        challan,
         filename=filename,
         media_type="application/pdf",
+        cache_control=REVALIDATE,
         headers={
             "Content-Disposition": f"attachment; filename={filename}",
             "X-Remittance-Month": month_header,
             "X-Remittance-Amount": str(file.remittance_amount) if file.remittance_amount else "0",
         },
     )
+    if response is None:
+        raise HTTPException(status_code=404, detail="Remittance file not found on server")
+    return response
 
 
 
@@ -245,6 +295,7 @@ async def download_remittance_challan(
 @router.get("/processed_files/{file_id}/download")
 async def download_esi_file(
     file_id: int,
+    request: Request,
     file_type: str = Query(
         None, regex="^(txt|xlsx)$", description="File type to download (txt or xlsx)"
     ),
@@ -266,36 +317,30 @@ async def download_esi_file(
             detail="File cannot be downloaded as processing was not successful",
         )
 
-    try:
-        excel_path, text_path = file.filepath.split(",")
-    except ValueError:
-        raise HTTPException(
-            status_code=500, detail="Invalid file path format in database"
-        )
     upload_month_str = file.upload_month.strftime("%Y_%m_%d") if isinstance(file.upload_month, date) else str(file.upload_month).replace('-', '_')
     if file_type and file_type.lower() == "txt":
-        file_path = Path(text_path)
+        kind = TXT
         media_type = "text/plain"
         filename = f"ESI_{upload_month_str}_{file_id}.txt"
     else:
-        file_path = Path(excel_path)
+        kind = XLSX
         media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         filename = f"ESI_{upload_month_str}_{file_id}.xlsx"
 
-    if not file_path.exists():
-        raise HTTPException(
-            status_code=404,
-            detail=f"Requested file not found on server: {file_path.name}",
-        )
     month_header = file.upload_month.strftime("%Y-%m-%d") if isinstance(file.upload_month, date) else str(file.upload_month) or ""
     headers = {
         "Content-Disposition": f"attachment; filename={filename}",
         "X-File-Month": month_header
     }
-
-    return FileResponse(
-        path=file_path, filename=filename, media_type=media_type, headers=headers
+    response = stored_file_response(
+        request, db, get_artifact(db, "esi", file_id, kind), filename=filename, media_type=media_type, headers=headers
     )
+    if response is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Requested file not found on server: {filename}",
+        )
+    return response
 
 
 @router.get("/processed_files/batch_download")
@@ -312,30 +357,27 @@ async def download_multiple_esi_files(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid file IDs format")
 
-    files = (
-        db.query(ProcessedFileESI).filter(ProcessedFileESI.id.in_(file_ids_list)).all()
+    rows = with_artifacts(
+        db.query(ProcessedFileESI).filter(ProcessedFileESI.id.in_(file_ids_list)), "esi"
     )
-    if not files:
+    if not rows:
         raise HTTPException(
             status_code=404, detail="No files found with the provided IDs"
         )
 
     valid_files = []
-    for file in files:
+    for file, artifacts in rows:
         if current_user.role == "user" and file.user_id != current_user.id:
             continue
 
         if file.status != "success":
             continue
 
-        try:
-            excel_path, text_path = file.filepath.split(",")
-            if not Path(excel_path).exists() or not Path(text_path).exists():
-                continue
-        except (ValueError, AttributeError):
+        excel, text = artifacts.get(XLSX), artifacts.get(TXT)
+        if excel is None or text is None or not output_exists(excel.key) or not output_exists(text.key):
             continue
 
-        valid_files.append(file)
+        valid_files.append((file, excel, text))
 
     if not valid_files:
         raise HTTPException(
@@ -347,17 +389,16 @@ async def download_multiple_esi_files(
     files_added = 0
 
     with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for file in valid_files:
+        for file, excel, text in valid_files:
             try:
-                excel_path, text_path = file.filepath.split(",")
                 month_folder = file.upload_month.strftime("%Y-%m-%d") if isinstance(file.upload_month, date) else str(file.upload_month) or "unknown_month"
                 month_for_filename = file.upload_month.strftime("%Y_%m_%d") if isinstance(file.upload_month, date) else str(file.upload_month).replace('-', '_')
                 base_filename = f"ESI_{month_for_filename}_{file.id}"
 
                 zip_dir = f"ESI_Files/{month_folder}"
-                zip_file.write(excel_path, f"{zip_dir}/{base_filename}.xlsx")
+                zip_file.write(resolve_output(excel.key), f"{zip_dir}/{base_filename}.xlsx")
                 files_added += 1
-                zip_file.write(text_path, f"{zip_dir}/{base_filename}.txt")
+                zip_file.write(resolve_output(text.key), f"{zip_dir}/{base_filename}.txt")
                 files_added += 1
             except Exception:
                 continue
@@ -390,3 +431,144 @@ async def download_multiple_esi_files(
         },
         background=background_tasks,
     )
+
+
+@router.get("/contributions")
+async def get_esi_contributions(
+    esi_no: Optional[str] = Query(None, description="Only rows for this ESI number"),
+    from_month: Optional[str] = Query(None, description="First wage month in YYYY-MM-DD format"),
+    to_month: Optional[str] = Query(None, description="Last wage month in YYYY-MM-DD format"),
+    file_id: Optional[int] = Query(None, description="Only rows from this processed file"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    include_superseded: bool = Query(False, description="Include rows from re-processed months"),
+    user_id: Optional[int] = Query(None, description="Specific user ID to filter by (Admin only)"),
+    limit: int = Query(1000, ge=1, le=100000),
+    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # Parquet scans of up to `limit` rows; keep them off the event loop
+    return await run_in_threadpool(
+        search_contributions,
+        db, "esi", ProcessedFileESI, current_user,
+        member_id=esi_no, from_month=from_month, to_month=to_month, user_id=user_id,
+        file_id=file_id, columns=columns, include_superseded=include_superseded, limit=limit,
+    )
+
+
+@router.get("/contributions/totals")
+async def get_esi_contribution_totals(
+    esi_no: Optional[str] = Query(None, description="Only totals for this ESI number"),
+    from_month: Optional[str] = Query(None, description="First wage month in YYYY-MM-DD format"),
+    to_month: Optional[str] = Query(None, description="Last wage month in YYYY-MM-DD format"),
+    user_id: Optional[int] = Query(None, description="Specific user ID to filter by (Admin only)"),
+    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return await run_in_threadpool(
+        summarize_contributions,
+        db, "esi", ProcessedFileESI, current_user,
+        member_id=esi_no, from_month=from_month, to_month=to_month, user_id=user_id,
+    )
+
+
+@router.get("/employees/{esi_no}", response_model=ESIEmployeeHistory)
+async def get_esi_employee_history(
+    esi_no: str,
+    include_superseded: bool = Query(False, description="Include rows from re-processed months"),
+    user_id: Optional[int] = Query(None, description="Specific user ID to filter by (Admin only)"),
+    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return get_employee_history(
+        db, "esi", esi_no, current_user, user_id=user_id, include_superseded=include_superseded
+    )
+
+
+@router.get("/processed_files/{file_id}/diff")
+async def get_esi_file_diff(
+    file_id: int,
+    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # A cache miss loads both months and merges them with pandas
+    return await run_in_threadpool(get_record_diff, db, "esi", file_id, current_user)
+
+
+@router.get("/processed_files/{file_id}/validation_errors")
+async def download_esi_validation_errors(
+    file_id: int,
+    request: Request,
+    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    file = db.query(ProcessedFileESI).filter(ProcessedFileESI.id == file_id).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if current_user.role == "user" and file.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="You can only download your own files")
+
+    response = stored_file_response(
+        request,
+        db,
+        get_artifact(db, "esi", file_id, ERRORS),
+        filename=f"ESI_validation_errors_{file_id}.csv",
+        media_type="text/csv",
+    )
+    if response is None:
+        raise HTTPException(status_code=404, detail="No validation errors were recorded for this file")
+    return response
+
+
+@router.post("/challan/extract", response_model=ChallanFields)
+async def extract_esi_challan(
+    challan_file: UploadFile = File(...),
+    current_user: UserModel = Depends(require_hr_or_admin),
+    db: Session = Depends(get_db),
+):
+    if not challan_file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are accepted")
+    extraction = await run_in_threadpool(extract_uploaded_challan, db, challan_file.file)
+    return challan_fields(extraction)
+
+
+@router.get("/processed_files/{file_id}/challan_check", response_model=ChallanCheckResponse)
+async def check_esi_challan(
+    file_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: UserModel = Depends(require_hr_or_admin),
+    db: Session = Depends(get_db),
+):
+    file = db.query(ProcessedFileESI).filter(ProcessedFileESI.id == file_id).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    challan = get_artifact(db, "esi", file_id, CHALLAN)
+    if not file.remittance_submitted or challan is None:
+        raise HTTPException(status_code=404, detail="No remittance challan found for this file")
+
+    if challan.sha256 is None:
+        # Challans recorded by the migration are hashed on first use
+        local_path = resolve_output(challan.key)
+        if local_path is not None:
+            ensure_digest(db, challan, local_path)
+    extraction = cached_extraction(db, challan.sha256)
+    if extraction is None and settings.CHALLAN_PARSING:
+        background_tasks.add_task(extract_stored_challan, challan.key, challan.sha256)
+
+    return {
+        "file_id": file_id,
+        "submitted_amount": file.remittance_amount,
+        "submitted_date": file.remittance_date,
+        **cross_check(extraction, file.remittance_amount, file.remittance_date),
+    }
+
+
+@router.get("/reconciliation", response_model=ReconciliationReport)
+async def get_esi_reconciliation(
+    year: int = Query(..., description="Financial year, e.g. 2025 for April 2024 - March 2025"),
+    user_id: Optional[int] = Query(None, description="Specific user ID to filter by (Admin only)"),
+    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return reconciliation_report(db, "esi", year, current_user, user_id)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, File, UploadFile, Form
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from database.models import UserModel
+from schemas.response import CombinedProcessResult
+from services.combined import process_combined_files
+from core.dependencies import get_db, require_hr_or_admin
+
+router = APIRouter()
+
+@router.post("/process_folder", response_model=CombinedProcessResult)
+async def process_folder(
+    files: List[UploadFile] = File(..., description="List of Excel files from the folder"),
+    folder_name: str = Form(..., min_length=1, max_length=500),
+    current_user: UserModel = Depends(require_hr_or_admin),
+    upload_month: str = Form(..., description="Date in YYYY-MM-DD format"),
+    duplicate_policy: Optional[str] = Form(None, description="reject, keep-last or sum for a member found in several rows"),
+    db: Session = Depends(get_db),
+):
+    return await process_combined_files(files, folder_name, current_user, upload_month, db, duplicate_policy)
@@ -8,12 +8,14 @@
 # router.include_router(pf_router, prefix="/pf", tags=["providentfund"])
 
 from fastapi import APIRouter
-from api.router import auth, pf,esi,dashboard # import modules, not APIRouter instances
+from api.router import auth, pf,esi,payroll,dashboard,admin # import modules, not APIRouter instances
 
 router = APIRouter()
 
 router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 router.include_router(pf.router, prefix="/pf", tags=["ProvidentFund"])
 router.include_router(esi.router, prefix="/esi", tags=["ESI"])
+router.include_router(payroll.router, prefix="/payroll", tags=["Payroll"])
 router.include_router(dashboard.router,prefix="/dashboard",tags=["Dashboard"])
+router.include_router(admin.router,prefix="/admin",tags=["Admin"])
 
@@ -1,18 +1,143 @@
 # from pydantic_settings import BaseSettings
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_workers(default: int = 1) -> int:
+    """WORKERS accepts a number or "auto" (one worker per CPU core)"""
+    value = os.getenv("WORKERS", str(default)).strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(int(value), 1)
 
 
 # class Settings(BaseSettings):
 class Settings():
 
     # DATABASE_URL: str = "mssql+pyodbc://@DESKTOP-PG5RLUD/HR_Extraction_DB?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes&TrustServerCertificate=yes"
-    DATABASE_URL = "sqlite:///./hr_extraction.db"
-    SECRET_KEY: str = "your-secret-key"
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./hr_extraction.db")
+    SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
     PROJECT_NAME: str = "HR Extraction API"
 
+    # Server. With WORKERS > 1 every worker is a separate process sharing only the
+    # database and the output folders on disk.
+    HOST: str = os.getenv("HOST", "192.168.10.14")
+    PORT: int = int(os.getenv("PORT", "7056"))
+    WORKERS: int = _env_workers()
+    CORS_ORIGINS: list = [
+        origin.strip()
+        for origin in os.getenv("CORS_ORIGINS", "http://192.168.10.14:7057").split(",")
+        if origin.strip()
+    ]
+    # How long a SQLite connection waits for another process' write lock
+    SQLITE_BUSY_TIMEOUT_S: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_S", "30"))
+
+    # Parquet archive of normalized per-employee rows (needs pyarrow)
+    CONTRIBUTION_STORE_DIR: str = os.getenv("CONTRIBUTION_STORE_DIR", "contribution_store")
+
+    # Header matching for uploaded sheets: similarity (0-1) needed for a fuzzy
+    # match, and how many rows are searched when the header is not on row 1
+    HEADER_FUZZY_CUTOFF: float = float(os.getenv("HEADER_FUZZY_CUTOFF", "0.9"))
+    HEADER_SCAN_ROWS: int = int(os.getenv("HEADER_SCAN_ROWS", "20"))
+
+    # Read .xls sheets through xlrd directly, loading only the matched columns
+    XLS_FAST_PATH: bool = _env_bool("XLS_FAST_PATH", True)
+    # Rows per chunk when streaming CSV / TSV uploads
+    CSV_CHUNK_ROWS: int = int(os.getenv("CSV_CHUNK_ROWS", "50000"))
+    # Hold ECR frames in Arrow-backed string / int64 columns when pyarrow is installed
+    ARROW_DTYPES: bool = _env_bool("ARROW_DTYPES", True)
+    # Threads converting the sheets of one multi-sheet workbook
+    SHEET_WORKERS: int = int(os.getenv("SHEET_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+    # Cache-Control max-age for processed file downloads (they never change once
+    # written); challans are always revalidated since a resubmission replaces them
+    DOWNLOAD_CACHE_MAX_AGE_S: int = int(os.getenv("DOWNLOAD_CACHE_MAX_AGE_S", "3600"))
+
+    # Where outputs and challans are stored: "local" (under STORAGE_LOCAL_ROOT) or
+    # "s3" (any S3-compatible service, needs boto3). With s3, files are staged and
+    # cached in STORAGE_CACHE_DIR, cached copies unused for STORAGE_CACHE_TTL_HOURS
+    # are pruned by the retention pass, uploads above the threshold go in parts,
+    # and downloads redirect to URLs presigned for S3_PRESIGN_EXPIRES_S (0 serves
+    # them through the API instead). S3_ENDPOINT_URL points at MinIO and the like.
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_LOCAL_ROOT: str = os.getenv("STORAGE_LOCAL_ROOT", ".")
+    STORAGE_CACHE_DIR: str = os.getenv("STORAGE_CACHE_DIR", "storage_cache")
+    STORAGE_CACHE_TTL_HOURS: int = int(os.getenv("STORAGE_CACHE_TTL_HOURS", "24"))
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")
+    S3_REGION: str = os.getenv("S3_REGION", "us-east-1")
+    S3_ACCESS_KEY_ID: str = os.getenv("S3_ACCESS_KEY_ID", "")
+    S3_SECRET_ACCESS_KEY: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
+    S3_ADDRESSING_STYLE: str = os.getenv("S3_ADDRESSING_STYLE", "path")
+    S3_MULTIPART_THRESHOLD_MB: int = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+    S3_MULTIPART_CHUNK_MB: int = int(os.getenv("S3_MULTIPART_CHUNK_MB", "8"))
+    S3_MAX_CONCURRENCY: int = int(os.getenv("S3_MAX_CONCURRENCY", "4"))
+    S3_PRESIGN_EXPIRES_S: int = int(os.getenv("S3_PRESIGN_EXPIRES_S", "300"))
+
+    # Read TRRN, amount and payment date off uploaded challan PDFs (pypdf is used
+    # when installed). Submitted amounts further off than the tolerance (rupees)
+    # from the challan are reported as mismatches.
+    CHALLAN_PARSING: bool = _env_bool("CHALLAN_PARSING", True)
+    CHALLAN_AMOUNT_TOLERANCE: float = float(os.getenv("CHALLAN_AMOUNT_TOLERANCE", "1"))
+    CHALLAN_PARSE_MAX_PAGES: int = int(os.getenv("CHALLAN_PARSE_MAX_PAGES", "5"))
+    # Bulk remittance submission: items per request and challans stored in parallel
+    REMITTANCE_BULK_MAX_ITEMS: int = int(os.getenv("REMITTANCE_BULK_MAX_ITEMS", "500"))
+    REMITTANCE_BULK_WORKERS: int = int(os.getenv("REMITTANCE_BULK_WORKERS", "4"))
+    # Submitted remittances within this many rupees, or this percentage, of the
+    # computed contributions (PF: EPF + EPS + difference, ESI: 4% of ESI gross)
+    # are reconciled as matched; others are flagged short or excess
+    RECONCILIATION_TOLERANCE: float = float(os.getenv("RECONCILIATION_TOLERANCE", "1"))
+    RECONCILIATION_TOLERANCE_PCT: float = float(os.getenv("RECONCILIATION_TOLERANCE_PCT", "0"))
+
+    # Output retention (POST /admin/retention/run). Months older than
+    # RETENTION_ARCHIVE_AFTER_MONTHS are zipped per month (0 disables archiving);
+    # superseded runs older than the grace period are deleted. Archived files are
+    # extracted into RETENTION_RESTORE_DIR on demand and pruned after the TTL.
+    RETENTION_ARCHIVE_AFTER_MONTHS: int = int(os.getenv("RETENTION_ARCHIVE_AFTER_MONTHS", "6"))
+    RETENTION_SUPERSEDED_GRACE_DAYS: int = int(os.getenv("RETENTION_SUPERSEDED_GRACE_DAYS", "30"))
+    RETENTION_COMPRESS_LEVEL: int = int(os.getenv("RETENTION_COMPRESS_LEVEL", "6"))
+    RETENTION_RESTORE_DIR: str = os.getenv("RETENTION_RESTORE_DIR", "restored_outputs")
+    RETENTION_RESTORE_TTL_HOURS: int = int(os.getenv("RETENTION_RESTORE_TTL_HOURS", "24"))
+
+    # What to do with a UAN / ESI number found more than once in one folder
+    # upload: "reject", "keep-last" or "sum" (overridable per request)
+    DUPLICATE_POLICY: str = os.getenv("DUPLICATE_POLICY", "keep-last")
+
+    # Month-over-month payroll diff. Wage changes above the threshold (percent) and
+    # NCP / worked-day swings of DIFF_DAYS_JUMP or more are reported; each list in
+    # a diff is capped at DIFF_MAX_ITEMS entries (the counts are always complete).
+    DIFF_CACHE_DIR: str = os.getenv("DIFF_CACHE_DIR", "payroll_diffs")
+    DIFF_WAGE_CHANGE_THRESHOLD_PCT: float = float(os.getenv("DIFF_WAGE_CHANGE_THRESHOLD_PCT", "10"))
+    DIFF_DAYS_JUMP: int = int(os.getenv("DIFF_DAYS_JUMP", "10"))
+    DIFF_MAX_ITEMS: int = int(os.getenv("DIFF_MAX_ITEMS", "500"))
+
+    # Dashboard response cache: entry lifetime (0 disables), LRU bound per worker,
+    # and an optional directory shared by all workers for entries and invalidations
+    DASHBOARD_CACHE_TTL_S: int = int(os.getenv("DASHBOARD_CACHE_TTL_S", "300"))
+    DASHBOARD_CACHE_MAX_ENTRIES: int = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "1024"))
+    DASHBOARD_CACHE_DIR: str = os.getenv("DASHBOARD_CACHE_DIR", "")
+
+    # Slow request profiler (opt-in). Requests to the profiled routes that take
+    # longer than the threshold get a cProfile dump written to PROFILE_DIR. The
+    # dump covers the whole event loop thread while the request ran, including
+    # other requests served meanwhile (see core/profiling.py).
+    SLOW_REQUEST_PROFILING: bool = _env_bool("SLOW_REQUEST_PROFILING", False)
+    SLOW_REQUEST_THRESHOLD_MS: int = int(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "request_profiles")
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    PROFILED_ROUTES: tuple = ("/pf/process_folder", "/esi/process_folder", "/payroll/process_folder", "/dashboard/")
+
     # class Config:
     #     env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
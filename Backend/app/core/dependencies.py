@@ -39,4 +39,12 @@ def require_hr_or_admin(current_user: UserModel = Depends(get_current_user)) ->
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to access this resource",
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+def require_admin(current_user: UserModel = Depends(get_current_user)) -> UserModel:
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can access this resource",
+        )
+    return current_user
@@ -0,0 +1,147 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.config import settings
+
+PROFILE_SUFFIX = ".prof"
+
+
+def is_profiled_route(path: str) -> bool:
+    """Routes ending in '/' are treated as prefixes, everything else must match exactly"""
+    for route in settings.PROFILED_ROUTES:
+        if route.endswith("/"):
+            if path.startswith(route):
+                return True
+        elif path == route:
+            return True
+    return False
+
+
+def get_profile_dir() -> Path:
+    return Path(settings.PROFILE_DIR)
+
+
+def _profile_filename(method: str, path: str, elapsed_ms: int, concurrent: int) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return f"{timestamp}_{os.getpid()}_{method.upper()}_{slug[:80]}_c{concurrent}_{elapsed_ms}ms{PROFILE_SUFFIX}"
+
+
+def rotate_profiles(profile_dir: Path, max_files: int) -> None:
+    profiles = sorted(profile_dir.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime)
+    for stale in profiles[: max(len(profiles) - max_files, 0)]:
+        try:
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def save_profile(profiler: cProfile.Profile, method: str, path: str, elapsed_ms: int, concurrent: int = 0) -> Path:
+    profile_dir = get_profile_dir()
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    target = profile_dir / _profile_filename(method, path, elapsed_ms, concurrent)
+    tmp_path = target.with_suffix(".tmp")
+    profiler.dump_stats(str(tmp_path))
+    os.replace(tmp_path, target)
+    rotate_profiles(profile_dir, settings.PROFILE_MAX_FILES)
+    return target
+
+
+def list_profiles() -> List[Dict]:
+    profile_dir = get_profile_dir()
+    if not profile_dir.exists():
+        return []
+    result = []
+    for profile in sorted(profile_dir.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True):
+        stat = profile.stat()
+        match = re.search(r"(?:_c(\d+))?_(\d+)ms\.prof$", profile.name)
+        result.append({
+            "name": profile.name,
+            "size": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime),
+            "elapsed_ms": int(match.group(2)) if match else None,
+            "concurrent_requests": int(match.group(1)) if match and match.group(1) else None,
+        })
+    return result
+
+
+def resolve_profile(name: str) -> Optional[Path]:
+    """Return the profile path for a listed name, refusing anything outside PROFILE_DIR"""
+    if Path(name).name != name or not name.endswith(PROFILE_SUFFIX):
+        return None
+    profile = get_profile_dir() / name
+    return profile if profile.is_file() else None
+
+
+def render_profile_text(profile: Path, limit: int = 60) -> str:
+    buffer = io.StringIO()
+    stats = pstats.Stats(str(profile), stream=buffer)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return buffer.getvalue()
+
+
+class SlowRequestProfilerMiddleware:
+    """ASGI middleware that profiles requests to the configured routes and keeps
+    the capture only when the request exceeded SLOW_REQUEST_THRESHOLD_MS.
+
+    Profiles are loop-wide, not per request: cProfile hooks the event loop
+    thread, so everything other requests run on the loop while the profiled one
+    is in flight is captured with it, and work the request hands to a thread
+    pool is not. Only one request is profiled at a time, and the number of
+    other requests that overlapped it is kept with the profile (the ``_c<n>``
+    part of the name, ``concurrent_requests`` in the listing); only captures
+    with 0 show the request alone.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        # Both only change on the event loop thread
+        self._in_flight = 0
+        self._overlapping: Optional[int] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self._in_flight += 1
+        if self._overlapping is not None:
+            self._overlapping += 1
+        try:
+            await self._profiled(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+    async def _profiled(self, scope, receive, send):
+        if (
+            not settings.SLOW_REQUEST_PROFILING
+            or not is_profiled_route(scope["path"])
+            or not self._lock.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = cProfile.Profile()
+        self._overlapping = self._in_flight - 1
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            concurrent, self._overlapping = self._overlapping, None
+            self._lock.release()
+            elapsed_ms = int((time.perf_counter() - start) * 1000)
+            if elapsed_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+                try:
+                    save_profile(profiler, scope["method"], scope["path"], elapsed_ms, concurrent)
+                except OSError as e:
+                    print("Failed to save request profile:", e)
@@ -0,0 +1,54 @@
+"""JSON response helpers.
+
+orjson is the default response class when it is installed; it encodes several
+times faster than json.dumps and handles datetimes natively.
+
+For an endpoint with a response_model, FastAPI validates the returned value,
+converts it to plain Python data, then encodes it. Endpoints that return a
+Response skip all of that, so the two helpers below let an endpoint keep its
+response_model (for the OpenAPI schema) while validating at most once:
+
+* validated_json_response - validates against the model and lets pydantic-core
+  write the JSON bytes directly, with no intermediate dicts
+* prevalidated_response   - encodes data that was already validated and dumped
+  (see dump_validated), e.g. a cached dashboard payload
+"""
+from typing import Any, Dict
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson  # noqa: F401
+
+    DefaultJSONResponse = ORJSONResponse
+except ImportError:
+    DefaultJSONResponse = JSONResponse
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def _adapter(annotation) -> TypeAdapter:
+    adapter = _adapters.get(annotation)
+    if adapter is None:
+        adapter = _adapters[annotation] = TypeAdapter(annotation)
+    return adapter
+
+
+def dump_validated(content: Any, annotation) -> Any:
+    """``content`` validated against ``annotation`` once, as JSON-ready data"""
+    adapter = _adapter(annotation)
+    return adapter.dump_python(adapter.validate_python(content), mode="json")
+
+
+def validated_json_response(content: Any, annotation, status_code: int = 200) -> Response:
+    adapter = _adapter(annotation)
+    return Response(
+        adapter.dump_json(adapter.validate_python(content)),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+def prevalidated_response(content: Any, status_code: int = 200) -> Response:
+    return DefaultJSONResponse(content, status_code=status_code)
@@ -9,10 +9,11 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     LargeBinary,
+    Index,
+    UniqueConstraint,
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from passlib.context import CryptContext
 from .base import Base  # assuming you defined `Base = declarative_base()` in db.py
 
 
@@ -85,5 +86,130 @@ class ProcessedFileESI(Base):
     user = relationship("UserModel", back_populates="processed_files_esi")
 
 
-# Password encryption context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class EmployeeContributionPF(Base):
+    """One row per employee per processed PF file, for UAN history lookups"""
+    __tablename__ = "employee_contributions_pf"
+
+    id = Column(Integer, primary_key=True)
+    record_id = Column(Integer, ForeignKey("processed_files_pf.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    uan = Column(String, nullable=False)
+    member_name = Column(String)
+    wage_month = Column(Date, nullable=False)
+    gross_wages = Column(Integer)
+    epf_wages = Column(Integer)
+    eps_wages = Column(Integer)
+    edli_wages = Column(Integer)
+    epf_contri_remitted = Column(Integer)
+    eps_contri_remitted = Column(Integer)
+    epf_eps_diff_remitted = Column(Integer)
+    ncp_days = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_employee_contributions_pf_uan_month", "uan", "wage_month"),
+    )
+
+
+class EmployeeContributionESI(Base):
+    """One row per employee per processed ESI file, for ESI number history lookups"""
+    __tablename__ = "employee_contributions_esi"
+
+    id = Column(Integer, primary_key=True)
+    record_id = Column(Integer, ForeignKey("processed_files_esi.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    esi_no = Column(String, nullable=False)
+    member_name = Column(String)
+    wage_month = Column(Date, nullable=False)
+    esi_gross = Column(Integer)
+    worked_days = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_employee_contributions_esi_no_month", "esi_no", "wage_month"),
+    )
+
+
+class ColumnAlias(Base):
+    """Header text accepted for a required input column, per scheme"""
+    __tablename__ = "column_aliases"
+
+    id = Column(Integer, primary_key=True)
+    scheme = Column(String, nullable=False)
+    field = Column(String, nullable=False)
+    alias = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("scheme", "alias", name="uq_column_aliases_scheme_alias"),
+    )
+
+
+class ProcessedArtifact(Base):
+    """A stored file of a processed PF / ESI record: output workbook, ECR text
+    file, validation errors or remittance challan"""
+    __tablename__ = "processed_artifacts"
+
+    id = Column(Integer, primary_key=True)
+    scheme = Column(String, nullable=False)
+    record_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False, unique=True)
+    # SHA-256 (the download ETag), size and st_mtime (Last-Modified) of the
+    # stored content; filled lazily for files recorded by the migration
+    size = Column(Integer)
+    sha256 = Column(String(64))
+    mtime = Column(Float)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("scheme", "record_id", "kind", name="uq_processed_artifacts_record_kind"),
+    )
+
+
+class ChallanExtraction(Base):
+    """TRRN / challan number, amount and payment date read from a challan PDF,
+    cached by the SHA-256 of the file"""
+    __tablename__ = "challan_extractions"
+
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False, unique=True, index=True)
+    # "parsed" when any field was found, "unreadable" when none was
+    status = Column(String, nullable=False)
+    layout = Column(String)
+    trrn = Column(String)
+    amount = Column(Float)
+    payment_date = Column(Date)
+    error = Column(Text)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class ContributionTotals(Base):
+    """Contribution totals computed for a processed PF / ESI record, and how
+    the remittance submitted for it compares"""
+    __tablename__ = "contribution_totals"
+
+    id = Column(Integer, primary_key=True)
+    scheme = Column(String, nullable=False)
+    record_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    wage_month = Column(Date, nullable=False)
+    members = Column(Integer, nullable=False, default=0)
+    # PF: gross wages; ESI: ESI gross
+    gross_wages = Column(Integer, nullable=False, default=0)
+    # PF: EPF (12%); ESI: employee share (0.75%)
+    employee_share = Column(Integer, nullable=False, default=0)
+    # PF: EPS + EPF-EPS difference; ESI: employer share (3.25%)
+    employer_share = Column(Integer, nullable=False, default=0)
+    eps_share = Column(Integer)
+    diff_share = Column(Integer)
+    expected_amount = Column(Integer, nullable=False, default=0)
+    remitted_amount = Column(Float)
+    difference = Column(Float)
+    # "pending" until a remittance is submitted, then "matched", "short" or "excess"
+    status = Column(String, nullable=False, default="pending")
+    reconciled_at = Column(DateTime)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("scheme", "record_id", name="uq_contribution_totals_record"),
+        Index("ix_contribution_totals_scheme_month", "scheme", "wage_month"),
+    )
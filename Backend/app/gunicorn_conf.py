@@ -0,0 +1,18 @@
+# Gunicorn settings for multi-process deployments (Linux):
+#   gunicorn -c gunicorn_conf.py main:app
+# Everything comes from the same environment variables as core/config.py.
+from core.config import settings
+
+bind = f"{settings.HOST}:{settings.PORT}"
+workers = settings.WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers share nothing in memory; long Excel uploads should not be killed mid-run
+timeout = 300
+graceful_timeout = 30
+
+
+def on_starting(server):
+    # Create the schema and migrate earlier rows once in the master before the workers start
+    from main import prepare_database
+
+    prepare_database()
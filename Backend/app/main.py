@@ -1,27 +1,71 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import OperationalError
 from core.config import settings
-from database.session import engine
+from core.profiling import SlowRequestProfilerMiddleware
+from core.responses import DefaultJSONResponse
+from database.session import SessionLocal, engine
 from database.base import Base
 from api.routers import router  # single point of import
 
-app = FastAPI(title=settings.PROJECT_NAME)
+app = FastAPI(title=settings.PROJECT_NAME, default_response_class=DefaultJSONResponse)
 
 # CORS config
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://192.168.10.14:7057"],
+    allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(SlowRequestProfilerMiddleware)
+
+def create_tables():
+    try:
+        Base.metadata.create_all(bind=engine)
+    except OperationalError:
+        # Another worker created the same tables between our check and CREATE
+        Base.metadata.create_all(bind=engine)
+
+def migrate_data():
+    """Seed the column aliases and bring rows written by earlier versions up to
+    date. Runs once per start, before any worker is forked (python main.py,
+    gunicorn on_starting or python main.py migrate); a failure stops the start."""
+    from services.artifacts import migrate_artifacts
+    from services.column_resolver import DEFAULT_ALIASES, seed_default_aliases
+    from services.reconciliation import backfill_totals
+
+    db = SessionLocal()
+    try:
+        for scheme in DEFAULT_ALIASES:
+            seed_default_aliases(db, scheme)
+        migrated = migrate_artifacts(db)
+        if migrated["artifacts"]:
+            print("Recorded file references of earlier records:", migrated)
+        totalled = backfill_totals(db)
+        if any(totalled.values()):
+            print("Totalled contributions of earlier records:", totalled)
+    finally:
+        db.close()
+
+def prepare_database():
+    create_tables()
+    migrate_data()
 
 @app.on_event("startup")
 async def startup():
-    Base.metadata.create_all(bind=engine)
+    create_tables()
 
 app.include_router(router)  # all subrouters included in one
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="192.168.10.14", port=7056)
+    # Workers import the app themselves, so the schema and data migrations run once up front
+    prepare_database()
+    if sys.argv[1:] == ["migrate"]:
+        sys.exit(0)
+    if settings.WORKERS > 1:
+        uvicorn.run("main:app", host=settings.HOST, port=settings.PORT, workers=settings.WORKERS)
+    else:
+        uvicorn.run(app, host=settings.HOST, port=settings.PORT)
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+
+class ColumnAliasCreate(BaseModel):
+    scheme: str = Field(..., pattern="^(pf|esi)$")
+    field: str
+    alias: str = Field(..., min_length=1, max_length=200)
+
+
+class ColumnAliasResponse(BaseModel):
+    id: int
+    scheme: str
+    field: str
+    alias: str
+    created_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
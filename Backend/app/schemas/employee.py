@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+
+class PFEmployeeMonth(BaseModel):
+    wage_month: date
+    file_id: int
+    user_id: Optional[int]
+    member_name: Optional[str]
+    gross_wages: Optional[int]
+    epf_wages: Optional[int]
+    eps_wages: Optional[int]
+    edli_wages: Optional[int]
+    epf_contri_remitted: Optional[int]
+    eps_contri_remitted: Optional[int]
+    epf_eps_diff_remitted: Optional[int]
+    ncp_days: Optional[int]
+
+
+class PFEmployeeHistory(BaseModel):
+    uan: str
+    member_name: Optional[str]
+    months_filed: int
+    months: List[PFEmployeeMonth]
+
+
+class ESIEmployeeMonth(BaseModel):
+    wage_month: date
+    file_id: int
+    user_id: Optional[int]
+    member_name: Optional[str]
+    esi_gross: Optional[int]
+    worked_days: Optional[int]
+
+
+class ESIEmployeeHistory(BaseModel):
+    esi_no: str
+    member_name: Optional[str]
+    months_filed: int
+    months: List[ESIEmployeeMonth]
+
+
+class IndexBackfillResponse(BaseModel):
+    indexed_records: int
+    indexed_rows: int
+    skipped_records: int
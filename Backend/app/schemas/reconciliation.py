@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+
+class ReconciliationMonth(BaseModel):
+    wage_month: date
+    records: int
+    members: int
+    expected_amount: float
+    remitted_amount: float
+    difference: float
+    matched: int
+    short: int
+    excess: int
+    # Records with no remittance submitted yet
+    pending: int
+
+
+class ReconciliationTotals(BaseModel):
+    records: int
+    members: int
+    expected_amount: float
+    remitted_amount: float
+    difference: float
+    matched: int
+    short: int
+    excess: int
+    pending: int
+
+
+class ReconciliationMismatch(BaseModel):
+    file_id: int
+    user_id: Optional[int]
+    wage_month: date
+    status: str
+    expected_amount: float
+    remitted_amount: Optional[float]
+    difference: Optional[float]
+    employee_share: int
+    employer_share: int
+
+
+class ReconciliationReport(BaseModel):
+    scheme: str
+    # Financial year ending in March of this year
+    year: int
+    months: List[ReconciliationMonth]
+    totals: ReconciliationTotals
+    mismatches: List[ReconciliationMismatch]
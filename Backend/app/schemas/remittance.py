@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+
+class ChallanFields(BaseModel):
+    sha256: str
+    # "parsed" when any field was found, "unreadable" when none was
+    status: str
+    layout: Optional[str]
+    trrn: Optional[str]
+    amount: Optional[float]
+    payment_date: Optional[date]
+
+
+class ChallanCheckResponse(BaseModel):
+    file_id: int
+    # "match", "mismatch", "unreadable", "pending" (still being parsed) or "disabled"
+    status: str
+    submitted_amount: Optional[float]
+    submitted_date: Optional[date]
+    extracted: Optional[ChallanFields]
+    mismatches: List[str]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from datetime import datetime
 from utlis.files_utils import Role
 
@@ -12,13 +12,30 @@ class FileProcessResult(BaseModel):
     processed_files: List[Dict[str, str]]
     total_files: int
     successful_files: int
+    file_id: Optional[int] = None
+    # Comparison with the previous month's upload, when there is one
+    diff: Optional[Dict[str, Any]] = None
+    # Rule counts and the errors file of the row validation
+    validation: Optional[Dict[str, Any]] = None
+    # Members found more than once across the uploaded files
+    duplicates: Optional[Dict[str, Any]] = None
+
+
+class CombinedProcessResult(BaseModel):
+    status: str
+    message: str
+    upload_month: str
+    # Left out when no uploaded file has the columns of the scheme
+    pf: Optional[FileProcessResult] = None
+    esi: Optional[FileProcessResult] = None
 
 
 class ProcessedFileResponse(BaseModel):
     id: int
     user_id: int
     filename: str
-    filepath: str
+    # Only set on records processed before processed_artifacts existed
+    filepath: Optional[str]
     status: str
     message: Optional[str]
     upload_date: Optional[datetime]
@@ -48,3 +65,17 @@ class UserResponse(BaseModel):
 
 class MessageResponse(BaseModel):
     message: str
+
+
+class ProfileResponse(BaseModel):
+    name: str
+    size: int
+    created_at: datetime
+    elapsed_ms: Optional[int]
+    # Other requests on the event loop during the capture; they are in the profile too
+    concurrent_requests: Optional[int] = None
+
+
+class MetricsResponse(BaseModel):
+    # Counters are per worker process
+    dashboard_cache: Dict[str, Any]
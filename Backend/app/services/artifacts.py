@@ -0,0 +1,195 @@
+"""Stored files of processed records (the processed_artifacts table).
+
+Every output workbook, ECR text file, validation error report and remittance
+challan of a ProcessedFilePF / ProcessedFileESI record is one row, unique per
+(scheme, record_id, kind), holding its storage key and the size, SHA-256 and
+mtime of its content. Readers load a record's files with an indexed join;
+the comma-joined ``filepath`` column is no longer written.
+
+migrate_artifacts() runs with the schema set-up: it records the files of
+records processed before the table existed from their ``filepath`` /
+``remittance_challan_path``. Their digests are computed on first download.
+"""
+import hashlib
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Query, Session
+
+from database.models import ProcessedArtifact, ProcessedFileESI, ProcessedFilePF
+from services.storage import storage_key
+
+XLSX = "xlsx"
+TXT = "txt"
+ERRORS = "errors"
+CHALLAN = "challan"
+OUTPUT_KINDS = (XLSX, TXT)
+
+RECORD_MODELS = {"pf": ProcessedFilePF, "esi": ProcessedFileESI}
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def sha256_file(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run_key(key: str) -> str:
+    """The run folder of an output key (``processed_<scheme>/<month>/<run>``)"""
+    return key.rsplit("/", 1)[0]
+
+
+def record_artifact(
+    db: Session,
+    scheme: str,
+    record_id: int,
+    kind: str,
+    key: str,
+    local_path=None,
+    sha256: Optional[str] = None,
+) -> ProcessedArtifact:
+    """Store the ``kind`` file of a record, replacing an earlier one. The caller commits."""
+    row = (
+        db.query(ProcessedArtifact)
+        .filter(
+            ProcessedArtifact.scheme == scheme,
+            ProcessedArtifact.record_id == record_id,
+            ProcessedArtifact.kind == kind,
+        )
+        .first()
+    )
+    if row is None:
+        row = ProcessedArtifact(scheme=scheme, record_id=record_id, kind=kind)
+        db.add(row)
+    row.key = key
+    row.size = row.sha256 = row.mtime = None
+    if local_path is not None:
+        stat = os.stat(local_path)
+        row.size = stat.st_size
+        row.mtime = stat.st_mtime
+        row.sha256 = sha256 or sha256_file(local_path)
+    return row
+
+
+def get_artifact(db: Session, scheme: str, record_id: int, kind: str) -> Optional[ProcessedArtifact]:
+    return (
+        db.query(ProcessedArtifact)
+        .filter(
+            ProcessedArtifact.scheme == scheme,
+            ProcessedArtifact.record_id == record_id,
+            ProcessedArtifact.kind == kind,
+        )
+        .first()
+    )
+
+
+def with_artifacts(query: Query, scheme: str, kinds: Iterable[str] = OUTPUT_KINDS) -> List[Tuple]:
+    """(record, {kind: artifact}) for each record of ``query``, in query order,
+    with the artifacts of ``kinds`` loaded by one outer join"""
+    model = RECORD_MODELS[scheme]
+    rows = (
+        query.add_entity(ProcessedArtifact)
+        .outerjoin(
+            ProcessedArtifact,
+            and_(
+                ProcessedArtifact.scheme == scheme,
+                ProcessedArtifact.record_id == model.id,
+                ProcessedArtifact.kind.in_(tuple(kinds)),
+            ),
+        )
+        .all()
+    )
+    grouped: Dict[int, Tuple] = {}
+    for record, artifact in rows:
+        entry = grouped.setdefault(record.id, (record, {}))
+        if artifact is not None:
+            entry[1][artifact.kind] = artifact
+    return list(grouped.values())
+
+
+def ensure_digest(db: Session, artifact: ProcessedArtifact, local_path) -> Tuple[str, float]:
+    """(sha256, mtime) of an artifact, computed from ``local_path`` when it was
+    recorded without them or the local copy no longer matches its size"""
+    stat = os.stat(local_path)
+    if artifact.sha256 is not None and artifact.size == stat.st_size:
+        return artifact.sha256, artifact.mtime if artifact.mtime is not None else stat.st_mtime
+    sha256 = sha256_file(local_path)
+    artifact.sha256 = sha256
+    artifact.size = stat.st_size
+    artifact.mtime = stat.st_mtime
+    try:
+        db.commit()
+    except Exception as e:
+        # Another worker stored it first; the computed values are just as good
+        db.rollback()
+        print("Failed to store file digest:", e)
+    return sha256, stat.st_mtime
+
+
+def delete_run_artifacts(db: Session, key_prefix: str) -> int:
+    """Forget the artifacts stored under a deleted run folder. The caller commits."""
+    return (
+        db.query(ProcessedArtifact)
+        .filter(ProcessedArtifact.key.like(f"{key_prefix}/%"))
+        .delete(synchronize_session=False)
+    )
+
+
+def _pending(db: Session, scheme: str, kind: str, *criteria) -> Query:
+    """Records matching ``criteria`` that have no ``kind`` artifact yet"""
+    model = RECORD_MODELS[scheme]
+    return (
+        db.query(model)
+        .outerjoin(
+            ProcessedArtifact,
+            and_(
+                ProcessedArtifact.scheme == scheme,
+                ProcessedArtifact.record_id == model.id,
+                ProcessedArtifact.kind == kind,
+            ),
+        )
+        .filter(ProcessedArtifact.id.is_(None), *criteria)
+    )
+
+
+def migrate_artifacts(db: Session) -> Dict[str, int]:
+    """Record the files of records written before processed_artifacts existed"""
+    from services.retention import output_exists
+    from services.validation import ERRORS_FILENAME
+
+    known_keys = None
+    created = {"artifacts": 0}
+
+    def add(scheme: str, record_id: int, kind: str, key: str) -> None:
+        nonlocal known_keys
+        if known_keys is None:
+            known_keys = {key for (key,) in db.query(ProcessedArtifact.key)}
+        if key in known_keys:
+            return
+        known_keys.add(key)
+        db.add(ProcessedArtifact(scheme=scheme, record_id=record_id, kind=kind, key=key))
+        created["artifacts"] += 1
+
+    for scheme, model in RECORD_MODELS.items():
+        outputs = _pending(db, scheme, XLSX, model.status == "success", model.filepath.isnot(None))
+        for record in outputs.all():
+            paths = record.filepath.split(",")
+            if len(paths) != 2:
+                continue
+            keys = [storage_key(path.strip()) for path in paths]
+            for kind, key in zip(OUTPUT_KINDS, keys):
+                add(scheme, record.id, kind, key)
+            errors_key = f"{run_key(keys[0])}/{ERRORS_FILENAME}"
+            if output_exists(errors_key):
+                add(scheme, record.id, ERRORS, errors_key)
+
+        challans = _pending(db, scheme, CHALLAN, model.remittance_challan_path.isnot(None))
+        for record in challans.all():
+            add(scheme, record.id, CHALLAN, storage_key(record.remittance_challan_path))
+
+    db.commit()
+    return created
@@ -0,0 +1,252 @@
+"""Reading the TRRN, amount and payment date off remittance challan PDFs.
+
+Text is taken from the PDF offline: with pypdf when it is installed, otherwise
+from the literal strings of the page content streams (enough for the text
+layer of EPFO / ESIC generated challans, which use standard fonts). The text
+is matched against the labels of the EPFO ECR challan / receipt and the ESIC
+challan; for ESIC the challan / transaction number is kept as the TRRN.
+
+Results are cached in challan_extractions by the SHA-256 of the PDF, so a
+challan read for pre-filling the remittance form is not parsed again when it
+is submitted. A submission that brings its own amount and date is parsed in
+the background after the response and cross-checked against what was read.
+"""
+import hashlib
+import re
+import tempfile
+import zlib
+from datetime import date, datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.models import ChallanExtraction
+from database.session import SessionLocal
+from services.artifacts import sha256_file
+from services.storage import get_storage
+
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+LAYOUTS = {
+    "epfo": re.compile(r"EPFO|Provident\s+Fund|\bTRRN\b", re.I),
+    "esic": re.compile(r"ESIC|State\s+Insurance", re.I),
+}
+TRRN_PATTERNS = [
+    re.compile(r"\bTRRN\b\s*(?:No\.?|Number)?\s*[:\-]?\s*(\d{10,16})", re.I),
+    re.compile(r"(?:Challan|Transaction)\s*(?:No\.?|Number|Id)\s*[:\-]?\s*([A-Z0-9]{8,20})\b", re.I),
+]
+AMOUNT_LABELS = [
+    r"Grand\s+Total",
+    r"Total\s+Amount\s+Paid",
+    r"Amount\s+Paid",
+    r"Total\s+Amount(?!\s*\(?\s*in\s+words)",
+    r"Total\s+Challan\s+Amount",
+    r"Amount\s*\(\s*(?:Rs\.?|INR)\s*\)",
+]
+AMOUNT_VALUE = r"[^0-9\n]{0,30}?(?:Rs\.?|INR|₹)?\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)"
+DATE_LABELS = [
+    r"Date\s+of\s+Payment",
+    r"Payment\s+Date",
+    r"Paid\s+(?:on|Date)",
+    r"Date\s+of\s+Credit",
+    r"Transaction\s+Date",
+    r"Challan\s+Submitted\s+Date",
+    r"Realisation\s+Date",
+]
+DATE_VALUE = r"[^0-9A-Za-z\n]{0,10}([0-9]{1,4}[\-/. ](?:[0-9]{1,2}|[A-Za-z]{3,9})[\-/. ][0-9]{2,4})"
+DATE_FORMATS = (
+    "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y-%m-%d", "%Y/%m/%d",
+    "%d-%b-%Y", "%d %b %Y", "%d-%B-%Y", "%d %B %Y", "%d/%b/%Y", "%d-%m-%y", "%d/%m/%y",
+)
+
+_STREAM = re.compile(rb"<<(.*?)>>\s*stream\r?\n(.*?)endstream", re.S)
+_TEXT_TOKEN = re.compile(
+    rb"\[((?:\\.|[^\]\\])*)\]\s*TJ"
+    rb"|\(((?:\\.|[^)\\])*)\)\s*(?:Tj|'|\")"
+    rb"|(T\*|Td|TD|Tm|ET)\b",
+    re.S,
+)
+_ARRAY_ITEM = re.compile(rb"\(((?:\\.|[^)\\])*)\)|(-?\d+(?:\.\d+)?)")
+_ESCAPE = re.compile(rb"\\([nrtbf()\\]|[0-7]{1,3})")
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"(": b"(", b")": b")", b"\\": b"\\"}
+
+
+def _unescape(literal: bytes) -> str:
+    def replace(match):
+        code = match.group(1)
+        return _ESCAPES.get(code) or bytes([int(code, 8) & 0xFF])
+
+    return _ESCAPE.sub(replace, literal).decode("latin-1")
+
+
+def _content_stream_text(pdf: bytes) -> str:
+    """Text shown by the Tj / TJ operators of every content stream"""
+    lines: List[str] = []
+    for header, data in _STREAM.findall(pdf):
+        if b"/FlateDecode" in header:
+            try:
+                data = zlib.decompress(data.rstrip(b"\r\n"))
+            except zlib.error:
+                continue
+        elif b"/Filter" in header:
+            continue
+        current = ""
+        for array, literal, operator in _TEXT_TOKEN.findall(data):
+            if operator:
+                if current.strip():
+                    lines.append(current.strip())
+                current = ""
+            elif literal:
+                current += _unescape(literal)
+            else:
+                for piece, kerning in _ARRAY_ITEM.findall(array):
+                    # A large negative adjustment inside TJ is a word gap
+                    current += _unescape(piece) if piece else (" " if float(kerning) <= -200 else "")
+        if current.strip():
+            lines.append(current.strip())
+    return "\n".join(lines)
+
+
+def extract_text(path) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return _content_stream_text(Path(path).read_bytes())
+    reader = PdfReader(str(path))
+    return "\n".join(page.extract_text() or "" for page in reader.pages[: settings.CHALLAN_PARSE_MAX_PAGES])
+
+
+def _parse_date(value: str) -> Optional[date]:
+    value = re.sub(r"\s+", " ", value.strip())
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_challan_text(text: str) -> Dict:
+    """layout, trrn, amount and payment_date found in the text of a challan"""
+    fields = {"layout": None, "trrn": None, "amount": None, "payment_date": None}
+    for layout, pattern in LAYOUTS.items():
+        if pattern.search(text):
+            fields["layout"] = layout
+            break
+    for pattern in TRRN_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            fields["trrn"] = match.group(1)
+            break
+    for label in AMOUNT_LABELS:
+        match = re.search(label + AMOUNT_VALUE, text, re.I)
+        if match:
+            fields["amount"] = float(match.group(1).replace(",", ""))
+            break
+    for label in DATE_LABELS:
+        match = re.search(label + DATE_VALUE, text, re.I)
+        if match:
+            fields["payment_date"] = _parse_date(match.group(1))
+            if fields["payment_date"] is not None:
+                break
+    return fields
+
+
+def cached_extraction(db: Session, sha256: Optional[str]) -> Optional[ChallanExtraction]:
+    if not sha256:
+        return None
+    return db.query(ChallanExtraction).filter(ChallanExtraction.sha256 == sha256).first()
+
+
+def extract_challan(db: Session, sha256: str, path) -> ChallanExtraction:
+    """The cached extraction of a challan, parsing and caching it on a miss"""
+    row = cached_extraction(db, sha256)
+    if row is not None:
+        return row
+    try:
+        fields = parse_challan_text(extract_text(path))
+        error = None
+    except Exception as e:
+        fields, error = {}, str(e)
+    found = any(fields.get(name) is not None for name in ("trrn", "amount", "payment_date"))
+    row = ChallanExtraction(sha256=sha256, status="parsed" if found else "unreadable", error=error, **fields)
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker parsed the same file first
+        db.rollback()
+        row = cached_extraction(db, sha256)
+    return row
+
+
+def extract_uploaded_challan(db: Session, upload: BinaryIO) -> ChallanExtraction:
+    """Extraction of an uploaded challan that is not stored (form pre-filling)"""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        for chunk in iter(lambda: upload.read(STREAM_CHUNK_BYTES), b""):
+            digest.update(chunk)
+            tmp.write(chunk)
+        tmp.flush()
+        return extract_challan(db, digest.hexdigest(), tmp.name)
+
+
+def extract_stored_challan(key: str, sha256: Optional[str]) -> None:
+    """Background task: parse a stored challan into the cache"""
+    db = SessionLocal()
+    try:
+        path = get_storage().fetch(key)
+        if path is not None:
+            extract_challan(db, sha256 or sha256_file(path), path)
+    except Exception as e:
+        print("Failed to parse remittance challan:", e)
+    finally:
+        db.close()
+
+
+def resolve_remittance_values(
+    db: Session, sha256: str, path, amount: Optional[float], payment_date: Optional[date]
+) -> Tuple[Optional[float], Optional[date], Optional[ChallanExtraction]]:
+    """Submitted amount and date, with the ones left out read from the challan"""
+    extraction = cached_extraction(db, sha256)
+    if extraction is None and settings.CHALLAN_PARSING and (amount is None or payment_date is None):
+        extraction = extract_challan(db, sha256, path)
+    if extraction is not None:
+        amount = amount if amount is not None else extraction.amount
+        payment_date = payment_date or extraction.payment_date
+    return amount, payment_date, extraction
+
+
+def challan_fields(extraction: ChallanExtraction) -> Dict:
+    return {
+        "sha256": extraction.sha256,
+        "status": extraction.status,
+        "layout": extraction.layout,
+        "trrn": extraction.trrn,
+        "amount": extraction.amount,
+        "payment_date": extraction.payment_date,
+    }
+
+
+def cross_check(extraction: Optional[ChallanExtraction], amount: Optional[float], payment_date: Optional[date]) -> Dict:
+    """Submitted remittance values compared with what was read from the challan"""
+    if extraction is None:
+        status = "pending" if settings.CHALLAN_PARSING else "disabled"
+        return {"status": status, "extracted": None, "mismatches": []}
+    mismatches = []
+    if (
+        extraction.amount is not None
+        and amount is not None
+        and abs(extraction.amount - amount) > settings.CHALLAN_AMOUNT_TOLERANCE
+    ):
+        mismatches.append("amount")
+    if extraction.payment_date is not None and payment_date is not None and extraction.payment_date != payment_date:
+        mismatches.append("payment_date")
+    if extraction.status == "unreadable":
+        status = "unreadable"
+    else:
+        status = "mismatch" if mismatches else "match"
+    return {"status": status, "extracted": challan_fields(extraction), "mismatches": mismatches}
@@ -0,0 +1,254 @@
+"""Maps the headers of an uploaded payroll sheet onto the fields each scheme needs.
+
+Accepted header texts live in the column_aliases table (seeded from
+DEFAULT_ALIASES the first time a scheme is used) so new client templates can be
+supported without a deploy. Headers are compared after normalization (case,
+punctuation and repeated spaces are ignored), then by fuzzy similarity. When
+row 1 is a title rather than the header, the first HEADER_SCAN_ROWS rows are
+searched for the header row.
+
+When row 1 is the header, the outcome is memoized per (scheme, registry
+version, header signature), so a repeat upload of the same client template
+skips resolution entirely. Sheets whose header is found further down are
+resolved every time, since their column labels say nothing about that row.
+"""
+import difflib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.models import ColumnAlias
+
+DEFAULT_ALIASES = {
+    "pf": {
+        "UAN No": ["UAN No","UAN","UAN Number"],
+        "Employee Name": ["Employee Name","Name"],
+        "Gross Wages": ["Total Salary", "Gross Salary","Total Earnings","T GROSS"],
+        "EPF Wages": ["PF Gross", "EPF Gross","EPF WAGES"],
+        "LOP Days": ["LOP", "LOP Days","Lop Days"],
+    },
+    "esi": {
+        "ESI No": ["ESI N0","ESI","ESI Number"],
+        "Employee Name": ["Employee Name","Name"],
+        "ESI Gross": ["ESI Gross","ESI SALARY"],
+        "Worked Days": ["Worked days","PD+EL","Pay Days"],
+    },
+}
+# Fields holding member ids; kept as text so leading zeros and long numbers survive
+ID_FIELDS = {"pf": "UAN No", "esi": "ESI No"}
+MAX_MEMOIZED_TEMPLATES = 256
+
+class MissingColumnsError(ValueError):
+    """No header of the sheet matched one or more required fields"""
+
+
+_registry_cache: Dict[str, Tuple[tuple, Dict[str, List[str]]]] = {}
+_mapping_cache: "OrderedDict[tuple, Tuple[Optional[int], Dict[str, object]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def normalize_header(value) -> str:
+    """'UAN No.' -> 'uan no', 'EPF  Wages' -> 'epf wages'"""
+    return re.sub(r"[^a-z0-9+]+", " ", str(value).lower()).strip()
+
+
+def seed_default_aliases(db: Session, scheme: str) -> None:
+    """Populate the registry for a scheme that has no aliases yet.
+
+    prepare_database() seeds both schemes before workers start; the calls made
+    on first use only cover databases set up some other way.
+    """
+    if db.query(ColumnAlias.id).filter(ColumnAlias.scheme == scheme).first():
+        return
+    for field, aliases in DEFAULT_ALIASES[scheme].items():
+        for alias in aliases:
+            db.add(ColumnAlias(scheme=scheme, field=field, alias=alias))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker seeded the same defaults first
+        db.rollback()
+
+
+def load_registry(db: Session, scheme: str) -> Tuple[tuple, Dict[str, List[str]]]:
+    """(version, {field: [aliases in priority order]}) for a scheme.
+
+    The table is tiny, so it is read on every call; the version is its content,
+    which keeps workers in step without any cross-process invalidation.
+    """
+    rows = (
+        db.query(ColumnAlias.id, ColumnAlias.field, ColumnAlias.alias)
+        .filter(ColumnAlias.scheme == scheme)
+        .order_by(ColumnAlias.id)
+        .all()
+    )
+    if not rows:
+        seed_default_aliases(db, scheme)
+        return load_registry(db, scheme)
+
+    version = tuple(tuple(row) for row in rows)
+    cached = _registry_cache.get(scheme)
+    if cached and cached[0] == version:
+        return cached
+
+    registry: Dict[str, List[str]] = {field: [] for field in DEFAULT_ALIASES[scheme]}
+    for _, field, alias in rows:
+        registry.setdefault(field, []).append(alias)
+    _registry_cache[scheme] = (version, registry)
+    return version, registry
+
+
+def match_headers(headers: List[object], registry: Dict[str, List[str]]) -> Dict[str, object]:
+    """{field: header} for every field that one of the headers satisfies"""
+    mapping: Dict[str, object] = {}
+    used = set()
+    normalized = {}
+    for header in headers:
+        normalized.setdefault(normalize_header(header), header)
+
+    # Exact text first, in alias priority order, then normalized text
+    for field, aliases in registry.items():
+        for alias in aliases:
+            if alias in headers and alias not in used:
+                mapping[field] = alias
+                break
+            header = normalized.get(normalize_header(alias))
+            if header is not None and header not in used:
+                mapping[field] = header
+                break
+        if field in mapping:
+            used.add(mapping[field])
+
+    # Fuzzy match what is left against headers no field has claimed
+    for field, aliases in registry.items():
+        if field in mapping:
+            continue
+        candidates = {key: header for key, header in normalized.items() if header not in used and key}
+        for alias in aliases:
+            close = difflib.get_close_matches(
+                normalize_header(alias), list(candidates), n=1, cutoff=settings.HEADER_FUZZY_CUTOFF
+            )
+            if close:
+                mapping[field] = candidates[close[0]]
+                used.add(mapping[field])
+                break
+    return mapping
+
+
+def _find_header_row(df, registry: Dict[str, List[str]]) -> Tuple[Optional[int], Dict[str, object]]:
+    """Position of the first data row that works as a header, with its mapping"""
+    best_row, best_mapping = None, match_headers(list(df.columns), registry)
+    if len(best_mapping) == len(registry):
+        return None, best_mapping
+    for position in range(min(settings.HEADER_SCAN_ROWS, len(df))):
+        mapping = match_headers(df.iloc[position].tolist(), registry)
+        if len(mapping) > len(best_mapping):
+            best_row, best_mapping = position, mapping
+            if len(mapping) == len(registry):
+                break
+    return best_row, best_mapping
+
+
+def _apply_header_row(df, header_row: Optional[int]):
+    if header_row is None:
+        return df
+    headers = df.iloc[header_row].tolist()
+    df = df.iloc[header_row + 1:].copy()
+    df.columns = headers
+    # Columns were object dtype while the title rows were part of them
+    return df.infer_objects()
+
+
+def _id_as_text(series):
+    """Member ids read as numbers (header not on row 1, or a new alias) back to digit strings"""
+    import pandas as pd
+
+    if pd.api.types.is_float_dtype(series):
+        # Missing ids stay missing so the isna() / fillna("") checks downstream see them
+        return series.map(lambda value: value if pd.isna(value) else str(int(value)) if value.is_integer() else str(value))
+    if pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        return series
+    return series.map(lambda value: str(int(value)) if isinstance(value, float) and value.is_integer() else value)
+
+
+def resolve_columns(registry_entry: Tuple[tuple, Dict[str, List[str]]], scheme: str, df) -> Tuple[object, Dict[str, object]]:
+    """Return the frame (re-headed if needed) and the {field: column} mapping.
+
+    ``registry_entry`` is the result of load_registry(); it is loaded once per
+    upload so sheets can be resolved off the request thread. Raises
+    MissingColumnsError naming the fields no header matched.
+    """
+    version, registry = registry_entry
+    signature = (scheme, version, tuple(str(column) for column in df.columns))
+
+    with _cache_lock:
+        memo = _mapping_cache.get(signature)
+        if memo is not None:
+            _mapping_cache.move_to_end(signature)
+
+    if memo is None:
+        memo = _find_header_row(df, registry)
+        # A mapping found on a data row depends on that row, not on df.columns
+        if memo[0] is None and len(memo[1]) == len(registry):
+            with _cache_lock:
+                _mapping_cache[signature] = memo
+                if len(_mapping_cache) > MAX_MEMOIZED_TEMPLATES:
+                    _mapping_cache.popitem(last=False)
+
+    header_row, mapping = memo
+    missing = [field for field in registry if field not in mapping]
+    if missing:
+        raise MissingColumnsError(f"Missing required columns: {', '.join(missing)}")
+
+    df = _apply_header_row(df, header_row)
+    id_column = mapping[ID_FIELDS[scheme]]
+    df[id_column] = _id_as_text(df[id_column])
+    return df, mapping
+
+
+def list_aliases(db: Session, scheme: Optional[str] = None) -> List[ColumnAlias]:
+    for name in ([scheme] if scheme else DEFAULT_ALIASES):
+        seed_default_aliases(db, name)
+    query = db.query(ColumnAlias)
+    if scheme:
+        query = query.filter(ColumnAlias.scheme == scheme)
+    return query.order_by(ColumnAlias.scheme, ColumnAlias.field, ColumnAlias.id).all()
+
+
+def add_alias(db: Session, scheme: str, field: str, alias: str) -> ColumnAlias:
+    if field not in DEFAULT_ALIASES[scheme]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field. Use one of: {', '.join(DEFAULT_ALIASES[scheme])}",
+        )
+    alias = alias.strip()
+    seed_default_aliases(db, scheme)
+    if db.query(ColumnAlias).filter(ColumnAlias.scheme == scheme, ColumnAlias.alias == alias).first():
+        raise HTTPException(status_code=400, detail="Alias already registered")
+    record = ColumnAlias(scheme=scheme, field=field, alias=alias)
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
+
+
+def delete_alias(db: Session, alias_id: int) -> None:
+    record = db.query(ColumnAlias).filter(ColumnAlias.id == alias_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Alias not found")
+    remaining = (
+        db.query(func.count(ColumnAlias.id))
+        .filter(ColumnAlias.scheme == record.scheme, ColumnAlias.field == record.field)
+        .scalar()
+    )
+    if remaining <= 1:
+        raise HTTPException(status_code=400, detail="Cannot remove the last alias of a field")
+    db.delete(record)
+    db.commit()
@@ -0,0 +1,103 @@
+"""PF and ESI outputs from one upload of a payroll folder.
+
+Each workbook is read once, with the member id columns of both schemes kept as
+text, and its sheets are converted by both the PF and the ESI builders. Each
+scheme then goes through its usual deduplication, validation, output and
+record stage (save_pf_run / save_esi_run), so the run leaves one processed
+record per scheme, exactly as two separate uploads would. A workbook that only
+has the columns of one scheme is skipped for the other, and a scheme that no
+workbook has columns for gets no record.
+
+CSV / TSV exports are still streamed once per scheme, each pass reading only
+that scheme's columns, and legacy .xls files are read whole rather than through
+the single-scheme column projection.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.orm import Session
+
+from database.models import UserModel
+from schemas.response import CombinedProcessResult
+from services import esi, pf
+from services.column_resolver import load_registry
+from services.dedup import resolve_policy
+from services.payroll_reader import (
+    DELIMITED_EXTENSIONS, PAYROLL_EXTENSIONS, convert_sheets, process_delimited, read_workbook,
+)
+
+ID_DTYPES = {**pf.ID_DTYPES, **esi.ID_DTYPES}
+
+
+def _has_data(workbooks) -> bool:
+    return any(entry["status"] != "skipped" for _, entries in workbooks for entry in entries)
+
+
+async def process_combined_files(
+    files: List[UploadFile],
+    folder_name: str,
+    current_user: UserModel,
+    upload_month: str,
+    db: Session,
+    duplicate_policy: Optional[str] = None,
+) -> CombinedProcessResult:
+    duplicate_policy = resolve_policy(duplicate_policy)
+    try:
+        upload_date_obj = datetime.strptime(upload_month, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid date format. Please use YYYY-MM-DD format (e.g., 2023-05-01)",
+        )
+
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    excel_files = [file for file in files if file.filename.lower().endswith(PAYROLL_EXTENSIONS)]
+    if not excel_files:
+        raise HTTPException(status_code=400, detail="No Excel or CSV files found in the upload")
+
+    pf_registry = load_registry(db, "pf")
+    esi_registry = load_registry(db, "esi")
+    # The PF resolver re-types its id column in place; each builder gets its own view
+    build_pf = lambda df: pf.build_pf_frame(pf_registry, df.copy(deep=False))
+    build_esi = lambda df: esi.build_esi_frame(esi_registry, df.copy(deep=False))
+
+    pf_workbooks, esi_workbooks = [], []
+    for excel_file in excel_files:
+        filename = excel_file.filename
+        if filename.lower().endswith(DELIMITED_EXTENSIONS):
+            pf_workbooks.append(process_delimited(excel_file, build_pf, pf_registry, "UAN No", optional=True))
+            esi_workbooks.append(process_delimited(excel_file, build_esi, esi_registry, "ESI No", optional=True))
+            continue
+        try:
+            sheets = read_workbook(excel_file, ID_DTYPES)
+        except Exception as e:
+            failed = [], [{"filename": filename, "status": "error", "message": f"Error processing file: {str(e)}"}]
+            pf_workbooks.append(failed)
+            esi_workbooks.append(failed)
+            continue
+        pf_workbooks.append(convert_sheets(filename, sheets, build_pf, optional=True))
+        esi_workbooks.append(convert_sheets(filename, sheets, build_esi, optional=True))
+
+    if not _has_data(pf_workbooks) and not _has_data(esi_workbooks):
+        raise HTTPException(status_code=400, detail="No PF or ESI columns were found in the uploaded files")
+
+    results = {}
+    for scheme, workbooks, save_run in (
+        ("pf", pf_workbooks, pf.save_pf_run),
+        ("esi", esi_workbooks, esi.save_esi_run),
+    ):
+        if _has_data(workbooks):
+            results[scheme] = save_run(
+                db, current_user, folder_name, upload_month, upload_date_obj, len(excel_files), workbooks, duplicate_policy
+            )
+
+    failed = [scheme.upper() for scheme, result in results.items() if result.status != "success"]
+    if failed:
+        status, message = "error", f"{' and '.join(failed)} processing had errors."
+    else:
+        status = "success"
+        message = f"{' and '.join(scheme.upper() for scheme in results)} files processed successfully."
+    return CombinedProcessResult(status=status, message=message, upload_month=upload_month, **results)
@@ -0,0 +1,282 @@
+"""Columnar archive of the normalized per-employee rows behind every processed file.
+
+Rows are written as Parquet, partitioned Hive-style by scheme and wage month:
+
+    contribution_store/scheme=pf/wage_month=2024-05-01/record_42.parquet
+
+Each file belongs to exactly one ProcessedFilePF / ProcessedFileESI record, so a
+re-run simply adds a new record file next to the old one. Queries scan the
+dataset through pyarrow with predicate and column pushdown instead of
+reopening workbooks. pyarrow is optional: without it archiving is skipped and
+the query endpoints answer 503.
+"""
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+
+# Output frame column -> archive column, per scheme
+ARCHIVE_COLUMNS = {
+    "pf": {
+        "UAN No": "uan",
+        "MEMBER NAME": "member_name",
+        "GROSS WAGES": "gross_wages",
+        "EPF Wages": "epf_wages",
+        "EPS Wages": "eps_wages",
+        "EDLI WAGES": "edli_wages",
+        "EPF CONTRI REMITTED": "epf_contri_remitted",
+        "EPS CONTRI REMITTED": "eps_contri_remitted",
+        "EPF EPS DIFF REMITTED": "epf_eps_diff_remitted",
+        "NCP DAYS": "ncp_days",
+        "REFUND OF ADVANCES": "refund_of_advances",
+    },
+    "esi": {
+        "ESI No": "esi_no",
+        "MEMBER NAME": "member_name",
+        "ESI GROSS": "esi_gross",
+        "WORKED DAYS": "worked_days",
+    },
+}
+MEMBER_ID_COLUMN = {"pf": "uan", "esi": "esi_no"}
+KEY_COLUMNS = ["record_id", "user_id", "wage_month"]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def store_available() -> bool:
+    return _pyarrow() is not None
+
+
+def get_store_root() -> Path:
+    return Path(settings.CONTRIBUTION_STORE_DIR)
+
+
+def archive_contributions(scheme: str, record, frame) -> Optional[Path]:
+    """Write the normalized rows of one processed record. Returns None when pyarrow is missing."""
+    pa = _pyarrow()
+    if pa is None or frame is None or frame.empty:
+        return None
+
+    columns = ARCHIVE_COLUMNS[scheme]
+    archive = frame[list(columns)].rename(columns=columns)
+    archive[MEMBER_ID_COLUMN[scheme]] = archive[MEMBER_ID_COLUMN[scheme]].astype(str)
+    archive["member_name"] = archive["member_name"].astype(str)
+    archive.insert(0, "record_id", record.id)
+    archive.insert(1, "user_id", record.user_id)
+
+    wage_month = record.upload_month.strftime("%Y-%m-%d")
+    partition = get_store_root() / f"scheme={scheme}" / f"wage_month={wage_month}"
+    partition.mkdir(parents=True, exist_ok=True)
+    target = partition / f"record_{record.id}.parquet"
+    tmp_path = partition / f".record_{record.id}.parquet.tmp"
+
+    table = pa.Table.from_pandas(archive, preserve_index=False)
+    pa.parquet.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, target)
+    return target
+
+
+def _dataset(scheme: str):
+    pa = _pyarrow()
+    if pa is None:
+        raise HTTPException(status_code=503, detail="Contribution archive requires pyarrow on the server")
+    root = get_store_root() / f"scheme={scheme}"
+    if not root.exists():
+        return None
+    partitioning = pa.dataset.partitioning(pa.schema([("wage_month", pa.string())]), flavor="hive")
+    return pa.dataset.dataset(
+        str(root), format="parquet", partitioning=partitioning, exclude_invalid_files=True
+    )
+
+
+def _filter_expression(
+    scheme: str,
+    member_id: Optional[str],
+    from_month: Optional[date],
+    to_month: Optional[date],
+    record_ids: Optional[List[int]],
+    user_id: Optional[int],
+):
+    ds = _pyarrow().dataset
+    conditions = []
+    if member_id:
+        conditions.append(ds.field(MEMBER_ID_COLUMN[scheme]) == member_id)
+    # wage_month partitions are ISO dates, so string comparison orders them correctly
+    if from_month:
+        conditions.append(ds.field("wage_month") >= from_month.strftime("%Y-%m-%d"))
+    if to_month:
+        conditions.append(ds.field("wage_month") <= to_month.strftime("%Y-%m-%d"))
+    if record_ids is not None:
+        conditions.append(ds.field("record_id").isin(record_ids))
+    if user_id is not None:
+        conditions.append(ds.field("user_id") == user_id)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _validate_columns(scheme: str, columns: Optional[List[str]]) -> Optional[List[str]]:
+    if not columns:
+        return None
+    allowed = set(ARCHIVE_COLUMNS[scheme].values()) | set(KEY_COLUMNS)
+    unknown = [c for c in columns if c not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    # Always return the keys so rows can be traced back to their processed file
+    return KEY_COLUMNS + [c for c in columns if c not in KEY_COLUMNS]
+
+
+def query_contributions(
+    scheme: str,
+    member_id: Optional[str] = None,
+    from_month: Optional[date] = None,
+    to_month: Optional[date] = None,
+    record_ids: Optional[List[int]] = None,
+    user_id: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+    limit: int = 1000,
+) -> List[Dict]:
+    dataset = _dataset(scheme)
+    if dataset is None:
+        return []
+    scanner = dataset.scanner(
+        columns=_validate_columns(scheme, columns),
+        filter=_filter_expression(scheme, member_id, from_month, to_month, record_ids, user_id),
+    )
+    table = scanner.head(limit)
+    return table.to_pylist()
+
+
+def contribution_totals(
+    scheme: str,
+    member_id: Optional[str] = None,
+    from_month: Optional[date] = None,
+    to_month: Optional[date] = None,
+    record_ids: Optional[List[int]] = None,
+    user_id: Optional[int] = None,
+) -> List[Dict]:
+    """Per wage month sums of the numeric columns, computed inside pyarrow"""
+    dataset = _dataset(scheme)
+    if dataset is None:
+        return []
+    numeric = [
+        column for column in ARCHIVE_COLUMNS[scheme].values()
+        if column not in (MEMBER_ID_COLUMN[scheme], "member_name")
+    ]
+    table = dataset.to_table(
+        columns=["wage_month", MEMBER_ID_COLUMN[scheme]] + numeric,
+        filter=_filter_expression(scheme, member_id, from_month, to_month, record_ids, user_id),
+    )
+    if table.num_rows == 0:
+        return []
+    grouped = table.group_by("wage_month").aggregate(
+        [(MEMBER_ID_COLUMN[scheme], "count_distinct")] + [(column, "sum") for column in numeric]
+    )
+    rows = grouped.sort_by("wage_month").to_pylist()
+    return [
+        {
+            "wage_month": row["wage_month"],
+            "employees": row[f"{MEMBER_ID_COLUMN[scheme]}_count_distinct"],
+            **{column: row[f"{column}_sum"] for column in numeric},
+        }
+        for row in rows
+    ]
+
+
+def current_record_ids(db: Session, model, user_id: Optional[int] = None) -> List[int]:
+    """Latest successful record per user and month; earlier re-runs of a month are superseded"""
+    query = db.query(func.max(model.id)).filter(model.status == "success")
+    if user_id is not None:
+        query = query.filter(model.user_id == user_id)
+    return [row[0] for row in query.group_by(model.user_id, model.upload_month).all()]
+
+
+def _parse_month(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid date format. Please use YYYY-MM-DD format (e.g., 2023-05-01)",
+        )
+
+
+def _scope(db: Session, model, current_user, user_id: Optional[int], file_id: Optional[int], include_superseded: bool):
+    """Resolve the (user_id, record_ids) filters a caller is allowed to scan"""
+    if current_user.role != "admin":
+        user_id = current_user.id
+
+    if file_id is not None:
+        record = db.query(model).filter(model.id == file_id).first()
+        if not record or (user_id is not None and record.user_id != user_id):
+            raise HTTPException(status_code=404, detail="File not found")
+        return user_id, [file_id]
+    if include_superseded:
+        return user_id, None
+    return user_id, current_record_ids(db, model, user_id)
+
+
+def search_contributions(
+    db: Session,
+    scheme: str,
+    model,
+    current_user,
+    member_id: Optional[str] = None,
+    from_month: Optional[str] = None,
+    to_month: Optional[str] = None,
+    user_id: Optional[int] = None,
+    file_id: Optional[int] = None,
+    columns: Optional[str] = None,
+    include_superseded: bool = False,
+    limit: int = 1000,
+) -> List[Dict]:
+    scope_user, record_ids = _scope(db, model, current_user, user_id, file_id, include_superseded)
+    return query_contributions(
+        scheme,
+        member_id=member_id,
+        from_month=_parse_month(from_month),
+        to_month=_parse_month(to_month),
+        record_ids=record_ids,
+        user_id=scope_user,
+        columns=[c.strip() for c in columns.split(",") if c.strip()] if columns else None,
+        limit=limit,
+    )
+
+
+def summarize_contributions(
+    db: Session,
+    scheme: str,
+    model,
+    current_user,
+    member_id: Optional[str] = None,
+    from_month: Optional[str] = None,
+    to_month: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> List[Dict]:
+    scope_user, record_ids = _scope(db, model, current_user, user_id, None, False)
+    return contribution_totals(
+        scheme,
+        member_id=member_id,
+        from_month=_parse_month(from_month),
+        to_month=_parse_month(to_month),
+        record_ids=record_ids,
+        user_id=scope_user,
+    )
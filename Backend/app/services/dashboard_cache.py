@@ -0,0 +1,207 @@
+"""Response cache for the dashboard endpoints.
+
+Dashboard figures only change when a payroll folder is processed or a
+remittance is submitted, so each endpoint's result is cached per
+(endpoint, scope, year, params). The scope is "all" for admins, who see every
+user's records, and "user:<id>" for everyone else, matching apply_user_filter.
+A write bumps the generation of the scopes it affects (the record owner's and
+"all"); entries computed under an older generation are never served again.
+DASHBOARD_CACHE_TTL_S and DASHBOARD_CACHE_MAX_ENTRIES (LRU) bound staleness
+and memory.
+
+With DASHBOARD_CACHE_DIR set, generations and computed responses are also
+kept on disk so every worker sees the same invalidations and can reuse what
+another worker computed. Without it each worker caches on its own and only
+sees writes handled by another worker once its entries expire.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from core.config import settings
+from core.responses import dump_validated
+from database.models import UserModel
+from utlis.files_utils import atomic_write_text
+
+ALL_USERS_SCOPE = "all"
+
+_entries: "OrderedDict[tuple, Tuple[str, float, Any]]" = OrderedDict()
+_generations: Dict[str, str] = {}
+_counters: Dict[str, int] = {"hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+_endpoint_counters: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def dashboard_scope(current_user: UserModel) -> str:
+    return ALL_USERS_SCOPE if current_user.role == "admin" else f"user:{current_user.id}"
+
+
+def _shared_dir() -> Optional[Path]:
+    return Path(settings.DASHBOARD_CACHE_DIR) if settings.DASHBOARD_CACHE_DIR else None
+
+
+def _generation_path(shared_dir: Path, scope: str) -> Path:
+    return shared_dir / "generations" / scope.replace(":", "_")
+
+
+def _generation(scope: str) -> str:
+    shared_dir = _shared_dir()
+    if shared_dir is None:
+        return _generations.get(scope, "0")
+    try:
+        return _generation_path(shared_dir, scope).read_text()
+    except FileNotFoundError:
+        return "0"
+
+
+def _entry_path(shared_dir: Path, key: tuple) -> Path:
+    digest = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+    return shared_dir / "entries" / f"{digest}.json"
+
+
+def _read_shared(key: tuple, generation: str, now: float) -> Optional[Tuple[float, Any]]:
+    shared_dir = _shared_dir()
+    if shared_dir is None:
+        return None
+    path = _entry_path(shared_dir, key)
+    try:
+        entry = json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    if entry["generation"] != generation or entry["expires_at"] <= now:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        return None
+    return entry["expires_at"], entry["value"]
+
+
+def _write_shared(key: tuple, generation: str, expires_at: float, value: Any) -> None:
+    shared_dir = _shared_dir()
+    if shared_dir is None:
+        return
+    try:
+        atomic_write_text(
+            _entry_path(shared_dir, key),
+            json.dumps({"generation": generation, "expires_at": expires_at, "value": value}),
+        )
+    except OSError as e:
+        print("Failed to write dashboard cache entry:", e)
+
+
+def _count(endpoint: str, outcome: str) -> None:
+    _counters[outcome] += 1
+    counters = _endpoint_counters.setdefault(endpoint, {"hits": 0, "shared_hits": 0, "misses": 0})
+    counters[outcome] += 1
+
+
+def _json_ready(value: Any, response_model: Any) -> Any:
+    if response_model is not None:
+        return dump_validated(value, response_model)
+    return jsonable_encoder(value)
+
+
+def _store(key: tuple, generation: str, expires_at: float, value: Any) -> None:
+    with _lock:
+        _entries[key] = (generation, expires_at, value)
+        _entries.move_to_end(key)
+        while len(_entries) > settings.DASHBOARD_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _counters["evictions"] += 1
+
+
+async def cached_response(
+    endpoint: str,
+    current_user: UserModel,
+    year: Optional[int],
+    compute: Callable[[], Awaitable[Any]],
+    response_model: Any = None,
+    **params,
+) -> Any:
+    """The JSON-ready result of ``compute()``, served from cache while it is current.
+
+    With ``response_model`` the result is validated against it once, when it is
+    computed, so cached values can be returned with prevalidated_response.
+    """
+    if settings.DASHBOARD_CACHE_TTL_S <= 0:
+        return _json_ready(await compute(), response_model)
+
+    scope = dashboard_scope(current_user)
+    key = (endpoint, scope, year, tuple(sorted(params.items())))
+    # Read before computing: a write that lands meanwhile leaves the new entry stale
+    generation = _generation(scope)
+    now = time.time()
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == generation and entry[1] > now:
+            _entries.move_to_end(key)
+            _count(endpoint, "hits")
+            return entry[2]
+
+    shared = _read_shared(key, generation, now)
+    if shared is not None:
+        expires_at, value = shared
+        _store(key, generation, expires_at, value)
+        with _lock:
+            _count(endpoint, "shared_hits")
+        return value
+
+    value = _json_ready(await compute(), response_model)
+    expires_at = now + settings.DASHBOARD_CACHE_TTL_S
+    _store(key, generation, expires_at, value)
+    _write_shared(key, generation, expires_at, value)
+    with _lock:
+        _count(endpoint, "misses")
+    return value
+
+
+def invalidate_dashboard(user_id: Optional[int]) -> None:
+    """Retire the cached dashboards that can include records of ``user_id``"""
+    scopes = [ALL_USERS_SCOPE] + ([f"user:{user_id}"] if user_id is not None else [])
+    shared_dir = _shared_dir()
+    with _lock:
+        for scope in scopes:
+            generation = uuid.uuid4().hex
+            _generations[scope] = generation
+            if shared_dir is not None:
+                try:
+                    atomic_write_text(_generation_path(shared_dir, scope), generation)
+                except OSError as e:
+                    print("Failed to publish dashboard cache invalidation:", e)
+        for key in [key for key in _entries if key[1] in scopes]:
+            del _entries[key]
+        _counters["invalidations"] += 1
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Counters of this worker's dashboard cache"""
+
+    def hit_rate(counters: Dict[str, int]) -> Optional[float]:
+        lookups = counters["hits"] + counters["shared_hits"] + counters["misses"]
+        return round((counters["hits"] + counters["shared_hits"]) / lookups, 4) if lookups else None
+
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "enabled": settings.DASHBOARD_CACHE_TTL_S > 0,
+            "shared": settings.DASHBOARD_CACHE_DIR or None,
+            "ttl_s": settings.DASHBOARD_CACHE_TTL_S,
+            "entries": len(_entries),
+            "max_entries": settings.DASHBOARD_CACHE_MAX_ENTRIES,
+            **_counters,
+            "hit_rate": hit_rate(_counters),
+            "endpoints": {
+                endpoint: {**counters, "hit_rate": hit_rate(counters)}
+                for endpoint, counters in sorted(_endpoint_counters.items())
+            },
+        }
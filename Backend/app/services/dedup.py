@@ -0,0 +1,126 @@
+"""Duplicate member handling for the combined frame of one folder upload.
+
+Branch workbooks of one folder can overlap, so the same UAN / ESI number may
+appear in more than one file (or sheet) of ``combined_df``. Rows are grouped by
+the normalized member id (a hash index, so the stage is linear in the number
+of rows) and, for members found in more than one source, the configured policy
+decides what reaches the ECR:
+
+* reject    - every row of a duplicated member is left out of the output
+* keep-last - the rows from the last file in upload order are kept
+* sum       - wages and ESI worked days are added up into one row (worked days
+              capped at the days in the month); PF keeps the lowest NCP days
+              and the contribution columns are recomputed
+
+Rows without a member id, and ids repeated within a single source, are left
+alone here: validation reports every one of them. keep-last keeps all rows of
+the last source, so its repeats reach validation; under sum, a member repeated
+within one of its sources is not summed at all (``in_file_repeats``) and all of
+its rows go on to validation.
+"""
+import calendar
+from datetime import date
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from core.config import settings
+from services.frame_dtypes import as_text
+from services.validation import SOURCE_FILE_COLUMN, SOURCE_ROW_COLUMN
+
+DUPLICATE_POLICIES = ("reject", "keep-last", "sum")
+MEMBER_ID = {"pf": "UAN No", "esi": "ESI No"}
+# How each column is combined under the "sum" policy; other columns take the last row's value
+SUM_AGGREGATIONS = {
+    "pf": {"GROSS WAGES": "sum", "EPF Wages": "sum", "NCP DAYS": "min", "REFUND OF ADVANCES": "sum"},
+    "esi": {"ESI GROSS": "sum", "WORKED DAYS": "sum"},
+}
+# Summed day counts that cannot exceed the days in the wage month
+CAPPED_DAY_COLUMNS = {"pf": (), "esi": ("WORKED DAYS",)}
+BLANK_IDS = ("", "nan", "None", "<NA>")
+MAX_REPORTED_CONFLICTS = 500
+
+
+def resolve_policy(policy: Optional[str]) -> str:
+    policy = (policy or settings.DUPLICATE_POLICY).strip().lower()
+    if policy not in DUPLICATE_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid duplicate policy. Use one of: {', '.join(DUPLICATE_POLICIES)}",
+        )
+    return policy
+
+
+def _normalized_ids(frame, scheme: str):
+    return as_text(frame[MEMBER_ID[scheme]]).str.strip().str.replace(r"[\s-]", "", regex=True)
+
+
+def blank_ids(keys):
+    """Rows whose normalized member id is missing"""
+    return keys.isna() | keys.isin(BLANK_IDS)
+
+
+def deduplicate_members(
+    scheme: str, frame, policy: str, recompute: Optional[Callable] = None, wage_month: Optional[date] = None
+) -> Tuple[object, Dict]:
+    """Apply the duplicate policy to the combined frame.
+
+    ``recompute`` rebuilds derived columns (PF contributions) after rows are
+    summed; ``wage_month`` caps summed day counts. Returns the resolved frame
+    and a conflict report.
+    """
+    import pandas as pd
+
+    keys = _normalized_ids(frame, scheme)
+    present = ~blank_ids(keys)
+    # Only members found in more than one file / sheet are duplicates here
+    sources = frame[SOURCE_FILE_COLUMN].groupby(keys.where(present)).transform("nunique")
+    duplicated = present & (sources.fillna(0) > 1)
+    summary = {
+        "policy": policy,
+        "duplicate_members": 0,
+        "removed_rows": 0,
+        "in_file_repeats": 0,
+        "conflicts_by_file": {},
+        "conflicts": [],
+    }
+    if not duplicated.any():
+        return frame, summary
+
+    conflicts = frame.loc[duplicated, [SOURCE_FILE_COLUMN]].assign(_key=keys[duplicated])
+    by_member = conflicts.groupby("_key", sort=False)[SOURCE_FILE_COLUMN]
+    summary["duplicate_members"] = int(by_member.ngroups)
+    summary["conflicts_by_file"] = {
+        name: int(count) for name, count in conflicts[SOURCE_FILE_COLUMN].value_counts().items()
+    }
+    summary["conflicts"] = [
+        {"member_id": key, "rows": len(files), "files": sorted(set(files))}
+        for key, files in by_member.agg(list).head(MAX_REPORTED_CONFLICTS).items()
+    ]
+
+    if policy == "reject":
+        resolved = frame[~duplicated]
+    elif policy == "keep-last":
+        last_source = frame[SOURCE_FILE_COLUMN].groupby(keys.where(duplicated)).transform("last")
+        resolved = frame[~duplicated | (frame[SOURCE_FILE_COLUMN] == last_source)]
+    else:
+        repeated = duplicated & frame.assign(_key=keys).duplicated([SOURCE_FILE_COLUMN, "_key"], keep=False)
+        unsummed = keys[repeated].unique()
+        summary["in_file_repeats"] = len(unsummed)
+        duplicated = duplicated & ~keys.isin(unsummed)
+        aggregations = {column: "last" for column in frame.columns}
+        aggregations.update(SUM_AGGREGATIONS[scheme])
+        aggregations[SOURCE_FILE_COLUMN] = lambda names: "+".join(dict.fromkeys(names))
+        summed = frame[duplicated].groupby(keys[duplicated], sort=False).agg(aggregations)
+        if wage_month is not None:
+            days_in_month = calendar.monthrange(wage_month.year, wage_month.month)[1]
+            for column in CAPPED_DAY_COLUMNS[scheme]:
+                summed[column] = summed[column].clip(upper=days_in_month)
+        if recompute is not None:
+            summed = recompute(summed)
+        # Summed rows no longer map to one Excel row
+        summed[SOURCE_ROW_COLUMN] = None
+        resolved = pd.concat([frame[~duplicated], summed], ignore_index=True)
+
+    summary["removed_rows"] = len(frame) - len(resolved)
+    return resolved.reset_index(drop=True), summary
@@ -0,0 +1,158 @@
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from database.models import (
+    EmployeeContributionESI,
+    EmployeeContributionPF,
+    ProcessedFileESI,
+    ProcessedFilePF,
+    UserModel,
+)
+from services.contribution_store import ARCHIVE_COLUMNS, MEMBER_ID_COLUMN
+from services.artifacts import XLSX, with_artifacts
+from services.retention import resolve_output
+
+INDEX_MODELS = {"pf": EmployeeContributionPF, "esi": EmployeeContributionESI}
+RECORD_MODELS = {"pf": ProcessedFilePF, "esi": ProcessedFileESI}
+# Archive columns that are not stored in the index
+SKIPPED_COLUMNS = {"refund_of_advances"}
+
+
+def normalize_member_id(value: str) -> str:
+    return str(value).strip().replace("-", "").replace(" ", "")
+
+
+def index_columns(scheme: str):
+    return [c for c in ARCHIVE_COLUMNS[scheme].values() if c not in SKIPPED_COLUMNS]
+
+
+def normalized_rows(scheme: str, frame):
+    """Output frame (ECR column names) -> index column names with normalized member ids"""
+    columns = {
+        source: target
+        for source, target in ARCHIVE_COLUMNS[scheme].items()
+        if target not in SKIPPED_COLUMNS
+    }
+    rows = frame[list(columns)].rename(columns=columns)
+    id_column = MEMBER_ID_COLUMN[scheme]
+    rows[id_column] = rows[id_column].astype(str).map(normalize_member_id)
+    rows["member_name"] = rows["member_name"].astype(str)
+    return rows
+
+
+def load_record_rows(db: Session, scheme: str, record_id: int):
+    """Index rows of one processed record as a DataFrame"""
+    import pandas as pd
+
+    index_model = INDEX_MODELS[scheme]
+    columns = [getattr(index_model, c) for c in index_columns(scheme)]
+    statement = db.query(*columns).filter(index_model.record_id == record_id).statement
+    return pd.read_sql(statement, db.bind)
+
+
+def index_contributions(db: Session, scheme: str, record, frame) -> int:
+    """Add the rows of one processed record to the employee index.
+
+    Runs inside the caller's transaction, so the record and its index rows are
+    committed together.
+    """
+    if frame is None or frame.empty:
+        return 0
+    rows = normalized_rows(scheme, frame)
+    rows["record_id"] = record.id
+    rows["user_id"] = record.user_id
+    rows["wage_month"] = record.upload_month
+
+    # object dtype hands the DB driver plain Python ints instead of numpy scalars
+    records = rows.astype(object).to_dict("records")
+    db.execute(insert(INDEX_MODELS[scheme]), records)
+    return len(records)
+
+
+def _current_records_subquery(db: Session, model):
+    return (
+        db.query(func.max(model.id))
+        .filter(model.status == "success")
+        .group_by(model.user_id, model.upload_month)
+        .scalar_subquery()
+    )
+
+
+def get_employee_history(
+    db: Session,
+    scheme: str,
+    member_id: str,
+    current_user: UserModel,
+    user_id: Optional[int] = None,
+    include_superseded: bool = False,
+) -> Dict:
+    index_model = INDEX_MODELS[scheme]
+    record_model = RECORD_MODELS[scheme]
+    id_column = getattr(index_model, MEMBER_ID_COLUMN[scheme])
+    normalized = normalize_member_id(member_id)
+
+    query = db.query(index_model).filter(id_column == normalized)
+    if current_user.role != "admin":
+        query = query.filter(index_model.user_id == current_user.id)
+    elif user_id is not None:
+        query = query.filter(index_model.user_id == user_id)
+    if not include_superseded:
+        query = query.filter(index_model.record_id.in_(_current_records_subquery(db, record_model)))
+
+    rows = query.order_by(index_model.wage_month, index_model.record_id).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No filings found for this employee")
+
+    fields = [c for c in index_columns(scheme) if c != MEMBER_ID_COLUMN[scheme]]
+    months = [
+        {
+            "wage_month": row.wage_month,
+            "file_id": row.record_id,
+            "user_id": row.user_id,
+            **{field: getattr(row, field) for field in fields},
+        }
+        for row in rows
+    ]
+    return {
+        MEMBER_ID_COLUMN[scheme]: normalized,
+        "member_name": rows[-1].member_name,
+        "months_filed": len({row.wage_month for row in rows}),
+        "months": months,
+    }
+
+
+def backfill_employee_index(db: Session, scheme: str) -> Dict[str, int]:
+    """Index successful records processed before the employee index existed,
+    reading their saved output workbooks"""
+    import pandas as pd
+
+    index_model = INDEX_MODELS[scheme]
+    record_model = RECORD_MODELS[scheme]
+    indexed = db.query(index_model.record_id).distinct()
+    pending = with_artifacts(
+        db.query(record_model).filter(record_model.status == "success", record_model.id.notin_(indexed)),
+        scheme,
+        (XLSX,),
+    )
+
+    result = {"indexed_records": 0, "indexed_rows": 0, "skipped_records": 0}
+    id_source = next(iter(ARCHIVE_COLUMNS[scheme]))
+    for record, artifacts in pending:
+        excel = artifacts.get(XLSX)
+        excel_path = resolve_output(excel.key) if excel is not None else None
+        if not record.upload_month or excel_path is None:
+            result["skipped_records"] += 1
+            continue
+        try:
+            frame = pd.read_excel(excel_path, engine="openpyxl", dtype={id_source: str})
+            result["indexed_rows"] += index_contributions(db, scheme, record, frame)
+            db.commit()
+            result["indexed_records"] += 1
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to index {scheme} record {record.id}:", e)
+            result["skipped_records"] += 1
+    return result
@@ -1,29 +1,86 @@
-import pandas as pd
-import math
 import uuid
-import filetype
 from pathlib import Path
-from datetime import datetime
-from typing import List, Dict
+from datetime import date, datetime
+from typing import List, Dict, Optional, Tuple
 
 from fastapi import HTTPException, UploadFile
 from sqlalchemy.orm import Session
 
-from database.models import ProcessedFileESI, UserModel
+from database.models import ProcessedArtifact, ProcessedFileESI, UserModel
 from schemas.response import FileProcessResult
-from utlis.files_utils import sanitize_folder_name
+from utlis.files_utils import sanitize_folder_name, unique_run_folder
+from services.contribution_store import archive_contributions
+from services.employee_index import index_contributions
+from services.reconciliation import record_totals
+from services.dashboard_cache import invalidate_dashboard
+from services.artifacts import CHALLAN, ERRORS, TXT, XLSX, record_artifact
+from services.payroll_diff import diff_against_previous
+from services.column_resolver import DEFAULT_ALIASES, load_registry, resolve_columns
+from services.dedup import deduplicate_members, resolve_policy
+from services.frame_dtypes import delimited_lines, rounded_half_up, text_column, whole_numbers
+from services.payroll_reader import PAYROLL_EXTENSIONS, process_workbook
+from services.storage import get_storage
+from services.validation import ERRORS_FILENAME, validate_contributions
+
+# Built-in header aliases; the live registry is the column_aliases table
+ESI_REQUIRED_COLUMNS = DEFAULT_ALIASES["esi"]
+# Read member ids as text when the header is one of the built-in aliases
+ID_DTYPES = {alias: str for alias in ESI_REQUIRED_COLUMNS["ESI No"]}
+
+def build_esi_frame(registry, df):
+    """ESI return rows of one sheet"""
+    import pandas as pd
+
+    if df.empty:
+        raise ValueError("Excel file is empty")
+
+    df, column_mapping = resolve_columns(registry, "esi", df)
+
+    esi_column = df[column_mapping["ESI No"]]
+    esi_column_gross = df[column_mapping["ESI Gross"]]
+
+    valid_esi_mask = ~(
+        (esi_column == 0)
+        | (esi_column == "0")
+        | (esi_column == "0.0")
+        | (esi_column.isna())
+        | (esi_column.isnull())
+        | (esi_column == "")
+    )
+
+    valid_esi_gross_mask = ~(
+        (esi_column_gross == 0)
+        | (esi_column_gross.isna())
+        | (esi_column_gross.isnull())
+    )
+
+    valid_rows_mask = valid_esi_mask & valid_esi_gross_mask
+    df = df[valid_rows_mask]
+
+    esi_no = text_column(df[column_mapping["ESI No"]]).fillna("").str.replace("-", "", regex=False)
+    member_name = text_column(df[column_mapping["Employee Name"]])
+    esi_gross = whole_numbers(df[column_mapping["ESI Gross"]])
+    worked_days = rounded_half_up(df[column_mapping["Worked Days"]])
+
+    return pd.DataFrame({
+        "ESI No": esi_no,
+        "MEMBER NAME": member_name,
+        "ESI GROSS": esi_gross,
+        "WORKED DAYS": worked_days,
+    })
+
 
 async def process_esi_files(
     files: List[UploadFile],
     folder_name: str,
     upload_month: str,
     current_user: UserModel,
-    db: Session
+    db: Session,
+    duplicate_policy: Optional[str] = None,
 ) -> FileProcessResult:
-    fname = sanitize_folder_name(foldername=folder_name)
+    duplicate_policy = resolve_policy(duplicate_policy)
     try:
         upload_date_obj = datetime.strptime(upload_month, "%Y-%m-%d").date()
-        first_day_of_month = upload_date_obj
     except ValueError:
         raise HTTPException(
             status_code=400,
@@ -33,121 +90,78 @@ async def process_esi_files(
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
 
-    allowed_extensions = (".xls", ".xlsx")
-    excel_files = [file for file in files if file.filename.lower().endswith(allowed_extensions)]
+    excel_files = [file for file in files if file.filename.lower().endswith(PAYROLL_EXTENSIONS)]
     if not excel_files:
-        raise HTTPException(status_code=400, detail="No Excel files found in the upload")
+        raise HTTPException(status_code=400, detail="No Excel or CSV files found in the upload")
+
+    registry = load_registry(db, "esi")
+    workbooks = [
+        process_workbook(excel_file, ID_DTYPES, lambda df: build_esi_frame(registry, df), registry)
+        for excel_file in excel_files
+    ]
+    return save_esi_run(
+        db, current_user, folder_name, upload_month, upload_date_obj, len(excel_files), workbooks, duplicate_policy
+    )
 
-    timestamp_folder = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = Path("processed_esi") / upload_month / timestamp_folder
-    output_dir.mkdir(parents=True, exist_ok=True)
+
+def save_esi_run(
+    db: Session,
+    current_user: UserModel,
+    folder_name: str,
+    upload_month: str,
+    upload_date_obj: date,
+    total_files: int,
+    workbooks: List[Tuple[List[object], List[Dict[str, str]]]],
+    duplicate_policy: str,
+) -> FileProcessResult:
+    """Combine the converted workbooks of one upload, write the outputs and record the run"""
+    # pandas and the Excel readers are loaded on first use to keep API start-up fast
+    import pandas as pd
+
+    fname = sanitize_folder_name(foldername=folder_name)
+    first_day_of_month = upload_date_obj
+    timestamp_folder = unique_run_folder()
+    storage = get_storage()
+    output_key = f"processed_esi/{upload_month}/{timestamp_folder}"
+    output_dir = storage.local_path(output_key)
+    output_dir.mkdir(parents=True, exist_ok=False)
 
     month_for_filename = upload_date_obj.strftime("%Y_%m_%d")
     excel_filename = f"{fname}_{month_for_filename}.xlsx"
     text_filename = f"{fname}_{month_for_filename}.txt"
     excel_file_path = output_dir / excel_filename
     text_file_path = output_dir / text_filename
+    excel_key = f"{output_key}/{excel_filename}"
+    text_key = f"{output_key}/{text_filename}"
 
     combined_df = pd.DataFrame()
     processed_files = []
     overall_status = "success"
     overall_message = "All files processed successfully."
+    outputs_saved = False
 
-    for excel_file in excel_files:
-        try:
-            kind = filetype.guess(excel_file.file)
-            if kind and kind.extension == "xlsx":
-                df = pd.read_excel(excel_file.file, engine="openpyxl", dtype={"ESI N0": str, "ESI": str, "ESI Number": str})
-            elif kind and kind.extension == "xls":
-                df = pd.read_excel(excel_file.file, engine="xlrd", dtype={"ESI N0": str, "ESI": str, "ESI Number": str})
-            else:
-                raise ValueError("Unsupported or unrecognized Excel file format")
-
-            if df.empty:
-                raise ValueError("Excel file is empty")
-
-            required_columns = {
-                "ESI No": ["ESI N0","ESI","ESI Number"],
-                "Employee Name": ["Employee Name","Name"],
-                "ESI Gross": ["ESI Gross","ESI SALARY"],
-                "Worked Days": ["Worked days","PD+EL","Pay Days"],
-            }
-
-            column_mapping = {}
-            missing_columns = []
-            for field, alternatives in required_columns.items():
-                found = False
-                for alt in alternatives:
-                    if alt in df.columns:
-                        column_mapping[field] = alt
-                        found = True
-                        break
-                if not found:
-                    missing_columns.append(field)
-
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
-
-            esi_column = df[column_mapping["ESI No"]]
-            esi_column_gross = df[column_mapping["ESI Gross"]]
-
-            valid_esi_mask = ~(
-                (esi_column == 0)
-                | (esi_column == "0")
-                | (esi_column == "0.0")
-                | (esi_column.isna())
-                | (esi_column.isnull())
-                | (esi_column == "")
-            )
-
-            valid_esi_gross_mask = ~(
-                (esi_column_gross == 0)
-                | (esi_column_gross.isna())
-                | (esi_column_gross.isnull())
-            )
-
-            valid_rows_mask = valid_esi_mask & valid_esi_gross_mask
-            df = df[valid_rows_mask]
-
-            def custom_round(x):
-                if pd.isna(x):
-                    return 0
-                decimal_part = x - int(x)
-                if decimal_part >= 0.5:
-                    return math.ceil(x)
-                else:
-                    return math.floor(x)
-
-            esi_no = df[column_mapping["ESI No"]].astype(str).str.replace("-", "")
-            member_name = df[column_mapping["Employee Name"]]
-            esi_gross = df[column_mapping["ESI Gross"]].fillna(0).round().astype(int)
-            worked_days_raw = df[column_mapping["Worked Days"]]
-            worked_days = worked_days_raw.apply(custom_round)
-
-            output_df = pd.DataFrame({
-                "ESI No": esi_no,
-                "MEMBER NAME": member_name,
-                "ESI GROSS": esi_gross,
-                "WORKED DAYS": worked_days,
-            })
-
-            combined_df = pd.concat([combined_df, output_df], ignore_index=True)
+    for frames, entries in workbooks:
+        processed_files.extend(entries)
+        if frames:
+            combined_df = pd.concat([combined_df, *frames], ignore_index=True)
             combined_df.dropna(inplace=True)
-            processed_files.append({
-                "filename": excel_file.filename,
-                "status": "success",
-                "message": "Processed successfully",
-            })
-
-        except Exception as e:
-            processed_files.append({
-                "filename": excel_file.filename,
-                "status": "error",
-                "message": f"Error processing file: {str(e)}",
-            })
+        if any(entry["status"] == "error" for entry in entries):
             overall_status = "error"
             overall_message = "Some files had errors during processing."
 
+    validation = None
+    duplicates = None
+    if not combined_df.empty:
+        combined_df, duplicates = deduplicate_members(
+            "esi", combined_df, duplicate_policy, wage_month=upload_date_obj,
+        )
+        combined_df, validation = validate_contributions("esi", combined_df, upload_date_obj, output_dir)
+        if validation["rejected_rows"] and overall_status == "success":
+            overall_message = (
+                f"All files processed successfully. {validation['rejected_rows']} rows failed "
+                "validation and were left out of the output."
+            )
+
     if not combined_df.empty and len(combined_df) > 0:
         try:
             with pd.ExcelWriter(excel_file_path, engine="openpyxl") as writer:
@@ -172,12 +186,16 @@ async def process_esi_files(
                     adjusted_width = (max_length + 2) * 1.2
                     worksheet.column_dimensions[column_letter].width = adjusted_width
 
-            output_lines = ["#~#".join(map(str, row)) for row in combined_df.values.tolist()]
+            output_lines = delimited_lines(combined_df, "#~#")
             header_line = "#~#".join(combined_df.columns)
             output_lines.insert(0, header_line)
 
             with open(text_file_path, "w") as f:
                 f.write("\n".join(output_lines))
+            for name in (excel_filename, text_filename, ERRORS_FILENAME):
+                if (output_dir / name).exists():
+                    storage.publish(f"{output_key}/{name}")
+            outputs_saved = True
         except Exception as e:
             overall_status = "error"
             overall_message = f"Error saving combined files: {str(e)}"
@@ -195,38 +213,64 @@ async def process_esi_files(
     db_record = ProcessedFileESI(
         user_id=current_user.id,
         filename=excel_filename,
-        filepath=f"{str(excel_file_path)},{str(text_file_path)}",
         status=overall_status,
         message=overall_message,
         upload_month=first_day_of_month,
         upload_date=first_day_of_month,
         source_folder=folder_name,
-        processed_files_count=len(excel_files),
-        success_files_count=len([f for f in processed_files if f["status"] == "success"]),
+        processed_files_count=total_files,
+        success_files_count=len({f["filename"] for f in processed_files if f["status"] == "success"}),
     )
 
     try:
         db.add(db_record)
+        if outputs_saved:
+            db.flush()
+            index_contributions(db, "esi", db_record, combined_df)
+            record_totals(db, "esi", db_record, combined_df)
+            record_artifact(db, "esi", db_record.id, XLSX, excel_key, excel_file_path)
+            record_artifact(db, "esi", db_record.id, TXT, text_key, text_file_path)
+            errors_path = output_dir / ERRORS_FILENAME
+            if errors_path.exists():
+                record_artifact(db, "esi", db_record.id, ERRORS, f"{output_key}/{ERRORS_FILENAME}", errors_path)
         db.commit()
         db.refresh(db_record)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error saving record to database: {str(e)}")
+    invalidate_dashboard(current_user.id)
+
+    if outputs_saved:
+        try:
+            archive_contributions("esi", db_record, combined_df)
+        except Exception as e:
+            print("Failed to archive contributions:", e)
+
+    diff = None
+    if outputs_saved:
+        try:
+            diff = diff_against_previous(db, "esi", db_record, combined_df)
+        except Exception as e:
+            print("Failed to compare with the previous month:", e)
 
     return FileProcessResult(
         status=overall_status,
         message=overall_message,
         upload_month=upload_month,
-        file_path=str(excel_file_path),
+        file_path=excel_key,
         processed_files=processed_files,
-        total_files=len(excel_files),
-        successful_files=len([f for f in processed_files if f["status"] == "success"]),
+        total_files=total_files,
+        successful_files=len({f["filename"] for f in processed_files if f["status"] == "success"}),
+        file_id=db_record.id,
+        diff=diff,
+        validation=validation,
+        duplicates=duplicates,
     )
 
-def build_esi_response(file: ProcessedFileESI) -> Dict:
-    filepaths = file.filepath.split(",")
-    excel_file_url = filepaths[0] if len(filepaths) > 0 else ""
-    text_file_url = filepaths[1] if len(filepaths) > 1 else ""
+def build_esi_response(file: ProcessedFileESI, artifacts: Dict[str, ProcessedArtifact]) -> Dict:
+    def key(kind: str) -> Optional[str]:
+        artifact = artifacts.get(kind)
+        return artifact.key if artifact is not None else None
 
     return {
         "id": file.id,
@@ -238,7 +282,7 @@ def build_esi_response(file: ProcessedFileESI) -> Dict:
         "upload_date": file.upload_date,
         "remittance_submitted": file.remittance_submitted,
         "remittance_date": file.remittance_date,
-        "remittance_challan_path": file.remittance_challan_path,
+        "remittance_challan_path": key(CHALLAN),
         "remittance_amount": file.remittance_amount,
         "created_at": file.created_at,
         "remittance_month": file.remittance_month,
@@ -246,6 +290,6 @@ def build_esi_response(file: ProcessedFileESI) -> Dict:
         "source_folder": file.source_folder,
         "processed_files_count": file.processed_files_count,
         "success_files_count": file.success_files_count,
-        "excel_file_url": excel_file_url,
-        "text_file_url": text_file_url,
+        "excel_file_url": key(XLSX) or "",
+        "text_file_url": key(TXT) or "",
     }
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""Conditional downloads of processed outputs and challans.
+
+Output workbooks, ECR text files and challans never change once written, so
+the SHA-256 recorded with their processed_artifacts row (computed on first
+download for files recorded by the migration) is served as a strong ETag and
+their original mtime as Last-Modified. A repeat download carrying
+If-None-Match / If-Modified-Since gets a 304 with no body; Range / If-Range
+requests are answered by FileResponse against the same validators. When the
+storage backend serves downloads itself (presigned S3 URLs), the client is
+redirected there instead.
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.models import ProcessedArtifact
+from services.artifacts import ensure_digest
+from services.retention import output_exists, resolve_output
+from services.storage import get_storage
+
+# Challans are replaced on resubmission under the same URL
+REVALIDATE = "private, no-cache"
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses weak comparison, and takes precedence over If-Modified-Since
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return int(mtime) <= since
+    return False
+
+
+def cached_file_response(
+    request: Request,
+    db: Session,
+    artifact: ProcessedArtifact,
+    path,
+    filename: str,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None,
+    cache_control: Optional[str] = None,
+) -> Response:
+    """FileResponse of a local copy of ``artifact`` with a strong ETag,
+    Last-Modified and Cache-Control, or a 304"""
+    sha256, mtime = ensure_digest(db, artifact, path)
+    validators = {
+        "ETag": f'"{sha256}"',
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": cache_control or f"private, max-age={settings.DOWNLOAD_CACHE_MAX_AGE_S}",
+    }
+    if _not_modified(request, validators["ETag"], mtime):
+        return Response(status_code=304, headers=validators)
+    return FileResponse(
+        path=path, filename=filename, media_type=media_type, headers={**(headers or {}), **validators}
+    )
+
+
+def stored_file_response(
+    request: Request,
+    db: Session,
+    artifact: Optional[ProcessedArtifact],
+    filename: str,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None,
+    cache_control: Optional[str] = None,
+) -> Optional[Response]:
+    """Download of a stored artifact, or None when it is missing.
+
+    A redirect to the storage backend when it hands out download URLs (custom
+    headers are not carried over), otherwise cached_file_response on a local copy.
+    """
+    if artifact is None or not output_exists(artifact.key):
+        return None
+    url = get_storage().download_url(artifact.key, filename, media_type)
+    if url is not None:
+        return RedirectResponse(url, status_code=307)
+    local_path = resolve_output(artifact.key)
+    if local_path is None:
+        return None
+    return cached_file_response(request, db, artifact, local_path, filename, media_type, headers, cache_control)
@@ -0,0 +1,87 @@
+"""Column dtypes of the ECR frames built from uploads.
+
+With pyarrow installed (and ARROW_DTYPES on), member ids and names are held as
+``string[pyarrow]`` and wages / days as ``int64[pyarrow]``: one contiguous
+buffer per column instead of a Python object per cell, and the string methods
+used by dedup and validation run as Arrow compute kernels. Without pyarrow the
+frames fall back to object / int64 columns and produce the same output.
+"""
+from core.config import settings
+
+_pyarrow_available = None
+
+
+def arrow_dtypes_enabled() -> bool:
+    global _pyarrow_available
+    if not settings.ARROW_DTYPES:
+        return False
+    if _pyarrow_available is None:
+        try:
+            import pyarrow  # noqa: F401
+
+            _pyarrow_available = True
+        except ImportError:
+            _pyarrow_available = False
+    return _pyarrow_available
+
+
+def text_dtype():
+    return "string[pyarrow]" if arrow_dtypes_enabled() else object
+
+
+def int_dtype():
+    return "int64[pyarrow]" if arrow_dtypes_enabled() else "int64"
+
+
+def text_column(series):
+    """Series as text; missing cells stay missing"""
+    if arrow_dtypes_enabled():
+        return series.astype("string[pyarrow]")
+    return series.where(series.isna(), series.astype(str))
+
+
+def as_text(series):
+    """Series for string matching: Arrow strings pass through, anything else via str"""
+    if arrow_dtypes_enabled() and str(series.dtype) == "string":
+        return series
+    return series.astype(str)
+
+
+def whole_numbers(series):
+    """Numbers rounded half to even (like Series.round), missing as 0"""
+    import pandas as pd
+
+    return pd.to_numeric(series).fillna(0).round().astype(int_dtype())
+
+
+def rounded_half_up(series):
+    """Day counts: .5 and above round up, missing as 0 (negatives round down)"""
+    import numpy as np
+    import pandas as pd
+
+    values = pd.to_numeric(series).astype(float).fillna(0).to_numpy()
+    rounded = np.where(values - np.trunc(values) >= 0.5, np.ceil(values), np.floor(values))
+    return pd.Series(rounded, index=series.index).astype(int_dtype())
+
+
+def delimited_lines(frame, separator: str):
+    """One ``separator``-joined line of text per row (values as str() prints them).
+
+    Arrow frames are cast and joined column-wise by Arrow compute kernels;
+    otherwise each column is converted to Python values on its own, which
+    avoids building the 2-D object array behind ``frame.values``.
+    """
+    if arrow_dtypes_enabled():
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        try:
+            columns = [pc.cast(pa.array(frame[column]), pa.string()) for column in frame.columns]
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # A column of mixed Python objects: fall through to str()
+            pass
+        else:
+            joined = pc.binary_join_element_wise(*columns, separator, null_handling="replace", null_replacement="")
+            return joined.to_pylist()
+    rows = zip(*(frame[column].tolist() for column in frame.columns))
+    return [separator.join(map(str, row)) for row in rows]
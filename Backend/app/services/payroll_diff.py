@@ -0,0 +1,187 @@
+"""Month-over-month comparison of a processed payroll against the previous month.
+
+Both months are keyed by the normalized UAN / ESI number and joined with a
+pandas hash merge, so a 100k row upload is compared in a single pass:
+
+* joiners     - members filed this month but not last month
+* leavers     - members filed last month but not this month
+* wage changes - wage moved by more than DIFF_WAGE_CHANGE_THRESHOLD_PCT
+* anomalies   - NCP / worked days outside the month or jumping sharply
+
+The previous month's rows come from the employee index, the current month's
+rows are the frame the pipeline just produced. Results are cached as JSON per
+(previous record, current record) pair, so re-reading a diff never recomputes it.
+"""
+import calendar
+import json
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from services.contribution_store import MEMBER_ID_COLUMN
+from services.employee_index import RECORD_MODELS, load_record_rows, normalized_rows
+from utlis.files_utils import atomic_write_text
+
+# Wage column compared month over month, per scheme
+WAGE_COLUMN = {"pf": "epf_wages", "esi": "esi_gross"}
+# Day count column checked for anomalies, per scheme
+DAYS_COLUMN = {"pf": "ncp_days", "esi": "worked_days"}
+
+
+def previous_month(month: date) -> date:
+    return (month.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def find_previous_record(db: Session, scheme: str, record):
+    """Current (latest successful) record of the same user for the month before"""
+    model = RECORD_MODELS[scheme]
+    start = previous_month(record.upload_month)
+    end = record.upload_month.replace(day=1)
+    return (
+        db.query(model)
+        .filter(
+            model.user_id == record.user_id,
+            model.status == "success",
+            model.upload_month >= start,
+            model.upload_month < end,
+        )
+        .order_by(model.id.desc())
+        .first()
+    )
+
+
+def _cache_path(scheme: str, previous_id: int, current_id: int) -> Path:
+    return Path(settings.DIFF_CACHE_DIR) / scheme / f"{previous_id}_{current_id}.json"
+
+
+def _read_cache(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _members(frame, columns, limit: int):
+    rows = frame[columns].head(limit).astype(object)
+    # NaN is not valid JSON
+    return rows.where(rows.notna(), None).to_dict("records")
+
+
+def compute_diff(scheme: str, previous, current, wage_month: date) -> Dict:
+    """Compare two frames of index rows (index column names, normalized ids)"""
+    import pandas as pd
+
+    key = MEMBER_ID_COLUMN[scheme]
+    wage = WAGE_COLUMN[scheme]
+    days = DAYS_COLUMN[scheme]
+    limit = settings.DIFF_MAX_ITEMS
+    columns = [key, "member_name", wage, days]
+
+    # A member listed twice in one month is compared on their last row
+    previous = previous[columns].drop_duplicates(subset=key, keep="last")
+    current = current[columns].drop_duplicates(subset=key, keep="last")
+    merged = previous.merge(current, on=key, how="outer", suffixes=("_prev", "_cur"), indicator=True)
+
+    joiners = merged[merged["_merge"] == "right_only"].rename(
+        columns={"member_name_cur": "member_name", f"{wage}_cur": wage}
+    )
+    leavers = merged[merged["_merge"] == "left_only"].rename(
+        columns={"member_name_prev": "member_name", f"{wage}_prev": wage}
+    )
+    both = merged[merged["_merge"] == "both"].rename(columns={"member_name_cur": "member_name"})
+
+    prev_wage = pd.to_numeric(both[f"{wage}_prev"], errors="coerce").fillna(0)
+    cur_wage = pd.to_numeric(both[f"{wage}_cur"], errors="coerce").fillna(0)
+    change_pct = ((cur_wage - prev_wage) / prev_wage.where(prev_wage != 0) * 100).round(2)
+    threshold = settings.DIFF_WAGE_CHANGE_THRESHOLD_PCT
+    # Going from zero to a positive wage has no percentage but is always reported
+    wage_changed = (change_pct.abs() > threshold) | ((prev_wage == 0) & (cur_wage != 0))
+    wage_changes = both[wage_changed].assign(change_pct=change_pct[wage_changed])
+    wage_changes = wage_changes.reindex(
+        wage_changes["change_pct"].abs().sort_values(ascending=False, na_position="first").index
+    ).rename(columns={f"{wage}_prev": "previous", f"{wage}_cur": "current"})
+
+    days_in_month = calendar.monthrange(wage_month.year, wage_month.month)[1]
+    prev_days = pd.to_numeric(both[f"{days}_prev"], errors="coerce").fillna(0)
+    cur_days = pd.to_numeric(both[f"{days}_cur"], errors="coerce").fillna(0)
+    cur_wages_all = pd.to_numeric(current[wage], errors="coerce").fillna(0)
+    cur_days_all = pd.to_numeric(current[days], errors="coerce").fillna(0)
+
+    reasons = pd.Series("", index=current.index)
+    reasons[(cur_days_all < 0) | (cur_days_all > days_in_month)] = f"{days} outside 0-{days_in_month}"
+    if scheme == "esi":
+        reasons[(cur_days_all == 0) & (cur_wages_all > 0) & (reasons == "")] = "wages paid with zero worked days"
+    else:
+        reasons[(cur_days_all >= days_in_month) & (cur_wages_all > 0) & (reasons == "")] = "wages paid for a fully NCP month"
+    jump = (cur_days - prev_days).abs() >= settings.DIFF_DAYS_JUMP
+    reasons[current[key].isin(both.loc[jump, key]) & (reasons == "")] = (
+        f"{days} changed by {settings.DIFF_DAYS_JUMP}+ days"
+    )
+    previous_days = both.set_index(key)[f"{days}_prev"]
+    anomalies = current[reasons != ""].assign(reason=reasons[reasons != ""])
+    anomalies = anomalies.assign(previous_days=anomalies[key].map(previous_days))
+    anomalies = anomalies.rename(columns={days: "days"})
+
+    return {
+        "scheme": scheme,
+        "wage_month": wage_month.isoformat(),
+        "previous_month": previous_month(wage_month).isoformat(),
+        "wage_column": wage,
+        "wage_change_threshold_pct": threshold,
+        "previous_members": len(previous),
+        "current_members": len(current),
+        "joiner_count": len(joiners),
+        "leaver_count": len(leavers),
+        "wage_change_count": len(wage_changes),
+        "anomaly_count": len(anomalies),
+        "joiners": _members(joiners, [key, "member_name", wage], limit),
+        "leavers": _members(leavers, [key, "member_name", wage], limit),
+        "wage_changes": _members(wage_changes, [key, "member_name", "previous", "current", "change_pct"], limit),
+        "anomalies": _members(anomalies, [key, "member_name", "days", "previous_days", "reason"], limit),
+        "truncated_to": limit,
+    }
+
+
+def diff_against_previous(db: Session, scheme: str, record, current=None) -> Optional[Dict]:
+    """Diff of a processed record against the user's previous month, or None
+    when there is nothing to compare with.
+
+    ``current`` is the output frame the pipeline just built; without it the
+    record's rows are read back from the employee index.
+    """
+    if record.status != "success" or not record.upload_month:
+        return None
+    previous_record = find_previous_record(db, scheme, record)
+    if previous_record is None:
+        return None
+
+    path = _cache_path(scheme, previous_record.id, record.id)
+    cached = _read_cache(path)
+    if cached is not None:
+        return cached
+
+    previous = load_record_rows(db, scheme, previous_record.id)
+    if previous.empty:
+        return None
+    current = normalized_rows(scheme, current) if current is not None else load_record_rows(db, scheme, record.id)
+
+    diff = compute_diff(scheme, previous, current, record.upload_month)
+    diff["previous_file_id"] = previous_record.id
+    diff["file_id"] = record.id
+    atomic_write_text(path, json.dumps(diff, default=str))
+    return diff
+
+
+def get_record_diff(db: Session, scheme: str, file_id: int, current_user) -> Dict:
+    model = RECORD_MODELS[scheme]
+    record = db.query(model).filter(model.id == file_id).first()
+    if not record or (current_user.role != "admin" and record.user_id != current_user.id):
+        raise HTTPException(status_code=404, detail="File not found")
+    diff = diff_against_previous(db, scheme, record)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="No processed file for the previous month to compare with")
+    return diff
@@ -0,0 +1,286 @@
+"""Reads an uploaded payroll workbook and turns each of its sheets into ECR rows.
+
+A workbook is opened once and every sheet is loaded in that single pass
+(``sheet_name=None``), so branch-per-sheet workbooks are never re-opened per
+sheet. Sheets are then resolved and converted in a thread pool. Sheets whose
+headers do not match the alias registry (summaries, notes) are skipped, and
+every sheet gets its own entry in ``processed_files``.
+
+Legacy .xls files skip pandas' cell-by-cell parser: xlrd loads sheets on
+demand, the header row is located and resolved against the alias registry,
+and only the matched columns are pulled with ``col_values`` (see
+read_xls_projected).
+
+CSV / TSV exports are streamed: the encoding and delimiter are sniffed from the
+first block, the header row is resolved the same way, and pd.read_csv reads
+only the matched columns in CSV_CHUNK_ROWS chunks, each converted as it arrives.
+"""
+import codecs
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.column_resolver import MissingColumnsError, match_headers
+from services.frame_dtypes import arrow_dtypes_enabled, text_dtype
+from services.validation import SOURCE_FILE_COLUMN, SOURCE_ROW_COLUMN
+
+DELIMITED_EXTENSIONS = (".csv", ".tsv")
+PAYROLL_EXTENSIONS = (".xls", ".xlsx") + DELIMITED_EXTENSIONS
+# Tried in order when the file has no byte order mark; cp1252 covers most
+# Windows payroll exports, latin-1 accepts any byte sequence
+FALLBACK_ENCODINGS = ("utf-8", "cp1252", "latin-1")
+SNIFF_BYTES = 64 * 1024
+DELIMITERS = ",\t;|"
+
+
+def _locate_header(sheet, registry: Dict[str, List[str]]) -> Tuple[int, Dict[str, object]]:
+    """(row index, mapping) of the row that satisfies most required fields"""
+    best_row, best_mapping = 0, {}
+    for rowx in range(min(settings.HEADER_SCAN_ROWS + 1, sheet.nrows)):
+        mapping = match_headers(sheet.row_values(rowx), registry)
+        if len(mapping) > len(best_mapping):
+            best_row, best_mapping = rowx, mapping
+            if len(mapping) == len(registry):
+                break
+    return best_row, best_mapping
+
+
+def read_xls_projected(content: bytes, registry: Dict[str, List[str]]) -> Dict[str, object]:
+    """{sheet name: frame} holding only the registry-matched columns of each sheet.
+
+    The frames carry the header texts as columns and are indexed so that
+    ``index + 2`` is the Excel row number, like frames from pd.read_excel.
+    """
+    import pandas as pd
+    import xlrd
+
+    book = xlrd.open_workbook(file_contents=content, on_demand=True)
+    sheets = {}
+    try:
+        for name in book.sheet_names():
+            sheet = book.sheet_by_name(name)
+            header_row, mapping = _locate_header(sheet, registry)
+            if len(mapping) < len(registry):
+                # Keep the header so the resolver reports what is missing
+                headers = sheet.row_values(0) if sheet.nrows else []
+                sheets[name] = pd.DataFrame(columns=headers, index=range(max(sheet.nrows - 1, 0)))
+            else:
+                headers = sheet.row_values(header_row)
+                columns = {}
+                for header in mapping.values():
+                    values = sheet.col_values(headers.index(header), start_rowx=header_row + 1)
+                    columns[header] = pd.Series(values, dtype=object).replace("", None)
+                frame = pd.DataFrame(columns).infer_objects()
+                frame.index = range(header_row, header_row + len(frame))
+                sheets[name] = frame
+            book.unload_sheet(name)
+    finally:
+        book.release_resources()
+    return sheets
+
+
+def read_workbook(upload_file, dtype: Dict, registry=None) -> Dict[str, object]:
+    """{sheet name: frame} for every sheet of an uploaded .xls / .xlsx file"""
+    import pandas as pd
+    import filetype
+
+    kind = filetype.guess(upload_file.file)
+    if kind and kind.extension == "xlsx":
+        engine = "openpyxl"
+    elif kind and kind.extension == "xls":
+        if registry is not None and settings.XLS_FAST_PATH:
+            upload_file.file.seek(0)
+            return read_xls_projected(upload_file.file.read(), registry[1])
+        engine = "xlrd"
+    else:
+        raise ValueError("Unsupported or unrecognized Excel file format")
+    return pd.read_excel(upload_file.file, engine=engine, dtype=dtype, sheet_name=None)
+
+
+def detect_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            # The sample may end inside a multi-byte character
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def _sniffed_delimiter(lines: List[str]) -> Optional[str]:
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return None
+
+
+def locate_delimited_header(lines: List[str], filename: str, registry: Dict[str, List[str]]):
+    """(delimiter, header line, mapping) that satisfies the most required fields.
+
+    Title lines above the header can fool csv.Sniffer, so every candidate
+    delimiter is tried against the registry; the sniffed one wins ties.
+    """
+    candidates = ["\t" if filename.lower().endswith(".tsv") else ","]
+    sniffed = _sniffed_delimiter(lines)
+    if sniffed:
+        candidates.insert(0, sniffed)
+    candidates += [d for d in DELIMITERS if d not in candidates]
+
+    best = (candidates[0], 0, {})
+    for delimiter in candidates:
+        for position, row in enumerate(csv.reader(lines, delimiter=delimiter)):
+            mapping = match_headers([value.strip() for value in row], registry)
+            if len(mapping) > len(best[2]):
+                best = (delimiter, position, mapping)
+                if len(mapping) == len(registry):
+                    return best
+    return best
+
+
+def iter_delimited_chunks(upload_file, registry: Dict[str, List[str]], id_field: str):
+    """Yield frames of the matched columns of a CSV / TSV upload, CSV_CHUNK_ROWS rows at a time.
+
+    Chunks are indexed so that ``index + 2`` is the line number in the file.
+    """
+    import pandas as pd
+
+    stream = upload_file.file
+    stream.seek(0)
+    sample = stream.read(SNIFF_BYTES)
+    stream.seek(0)
+    encoding = detect_encoding(sample)
+    text = sample.decode(encoding, errors="ignore")
+    lines = text.splitlines()[: settings.HEADER_SCAN_ROWS + 1]
+    delimiter, header_row, mapping = locate_delimited_header(lines, upload_file.filename, registry)
+    missing = [field for field in registry if field not in mapping]
+    if missing:
+        raise MissingColumnsError(f"Missing required columns: {', '.join(missing)}")
+
+    headers = [value.strip() for value in next(csv.reader(lines[header_row:], delimiter=delimiter))]
+    # Columns are addressed by position: exports often repeat or leave headers blank
+    positions = {headers.index(header): header for header in mapping.values()}
+    id_position = headers.index(mapping[id_field])
+    reader = pd.read_csv(
+        stream,
+        sep=delimiter,
+        encoding=encoding,
+        skiprows=header_row + 1,
+        header=None,
+        usecols=list(positions),
+        dtype={id_position: text_dtype()},
+        skipinitialspace=True,
+        chunksize=settings.CSV_CHUNK_ROWS,
+        **({"dtype_backend": "pyarrow"} if arrow_dtypes_enabled() else {}),
+    )
+    for chunk in reader:
+        chunk = chunk.rename(columns=positions)
+        chunk.index = chunk.index + header_row
+        yield chunk
+
+
+def _convert_sheet(build: Callable, source: str, df):
+    """Output frame of one sheet, or the exception that stopped it"""
+    try:
+        output_df = build(df)
+    except Exception as e:
+        return e
+    output_df[SOURCE_FILE_COLUMN] = source
+    # Excel row number: header is row 1
+    output_df[SOURCE_ROW_COLUMN] = output_df.index + 2
+    return output_df
+
+
+def process_delimited(
+    upload_file, build: Callable, registry, id_field: str, optional: bool = False
+) -> Tuple[List[object], List[Dict[str, str]]]:
+    """Stream a CSV / TSV upload through ``build`` chunk by chunk"""
+    filename = upload_file.filename
+    frames = []
+    try:
+        for chunk in iter_delimited_chunks(upload_file, registry[1], id_field):
+            outcome = _convert_sheet(build, filename, chunk)
+            if isinstance(outcome, Exception):
+                raise outcome
+            frames.append(outcome)
+        if not frames:
+            raise ValueError("File has no data rows")
+    except Exception as e:
+        if optional and isinstance(e, MissingColumnsError):
+            return [], [{"filename": filename, "status": "skipped", "message": f"File skipped: {str(e)}"}]
+        return [], [{"filename": filename, "status": "error", "message": f"Error processing file: {str(e)}"}]
+    return frames, [{"filename": filename, "status": "success", "message": "Processed successfully"}]
+
+
+def process_workbook(
+    upload_file, dtype: Dict, build: Callable, registry=None
+) -> Tuple[List[object], List[Dict[str, str]]]:
+    """Convert every matching sheet of a workbook with ``build(frame) -> output frame``.
+
+    ``registry`` (from load_registry) enables column projection for .xls files
+    and is required for CSV / TSV files. Returns the output frames and the
+    processed_files entries for the workbook.
+    """
+    filename = upload_file.filename
+    if filename.lower().endswith(DELIMITED_EXTENSIONS):
+        # The first registry field is the member id in every scheme
+        return process_delimited(upload_file, build, registry, next(iter(registry[1])))
+    try:
+        sheets = read_workbook(upload_file, dtype, registry)
+    except Exception as e:
+        return [], [{"filename": filename, "status": "error", "message": f"Error processing file: {str(e)}"}]
+    return convert_sheets(filename, sheets, build)
+
+
+def convert_sheets(
+    filename: str, sheets: Dict[str, object], build: Callable, optional: bool = False
+) -> Tuple[List[object], List[Dict[str, str]]]:
+    """Convert the sheets read from one workbook (see process_workbook).
+
+    With ``optional``, a workbook whose sheets all lack the scheme's columns is
+    reported as skipped rather than failed: the combined PF + ESI run reads each
+    workbook once and builds both schemes from it.
+    """
+    multi_sheet = len(sheets) > 1
+    outcomes = {}
+    jobs = []
+    for name, df in sheets.items():
+        if multi_sheet and df.empty:
+            outcomes[name] = MissingColumnsError("Sheet is empty")
+        else:
+            jobs.append((name, f"{filename}:{name}" if multi_sheet else filename, df))
+
+    workers = min(settings.SHEET_WORKERS, len(jobs))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(lambda job: _convert_sheet(build, job[1], job[2]), jobs)
+            outcomes.update(zip([job[0] for job in jobs], results))
+    else:
+        outcomes.update((name, _convert_sheet(build, source, df)) for name, source, df in jobs)
+    # Report sheets in workbook order
+    outcomes = {name: outcomes[name] for name in sheets}
+
+    frames = [outcome for outcome in outcomes.values() if not isinstance(outcome, Exception)]
+    entries = []
+    for name, outcome in outcomes.items():
+        entry = {"filename": filename}
+        if multi_sheet:
+            entry["sheet"] = str(name)
+        if not isinstance(outcome, Exception):
+            entry.update(status="success", message="Processed successfully")
+        elif (multi_sheet or optional) and isinstance(outcome, MissingColumnsError):
+            entry.update(status="skipped", message=f"{'Sheet' if multi_sheet else 'File'} skipped: {str(outcome)}")
+        else:
+            entry.update(status="error", message=f"Error processing file: {str(outcome)}")
+        entries.append(entry)
+
+    if multi_sheet and not optional and not frames and all(entry["status"] == "skipped" for entry in entries):
+        # No sheet looks like payroll data: report the workbook itself as failed
+        first_error = next(iter(outcomes.values()))
+        entries = [{"filename": filename, "status": "error", "message": f"Error processing file: {str(first_error)}"}]
+    return frames, entries
@@ -1,33 +1,85 @@
-import pandas as pd
-import math
 import uuid
-import filetype
-import shutil
-import zipfile
 from pathlib import Path
 from datetime import datetime, timedelta
 from io import BytesIO
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 from fastapi import HTTPException, UploadFile
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime, date, timedelta
-from database.models import ProcessedFilePF, UserModel
+from database.models import ProcessedArtifact, ProcessedFilePF, UserModel
 from schemas.response import FileProcessResult, ProcessedFileResponse
-from utlis.files_utils import sanitize_folder_name
+from utlis.files_utils import sanitize_folder_name, unique_run_folder
+from services.contribution_store import archive_contributions
+from services.employee_index import index_contributions
+from services.reconciliation import record_totals
+from services.dashboard_cache import invalidate_dashboard
+from services.artifacts import CHALLAN, ERRORS, TXT, XLSX, record_artifact
+from services.payroll_diff import diff_against_previous
+from services.column_resolver import DEFAULT_ALIASES, load_registry, resolve_columns
+from services.dedup import deduplicate_members, resolve_policy
+from services.frame_dtypes import delimited_lines, int_dtype, rounded_half_up, text_column, whole_numbers
+from services.payroll_reader import PAYROLL_EXTENSIONS, process_workbook
+from services.storage import get_storage
+from services.validation import ERRORS_FILENAME, validate_contributions
+
+# Built-in header aliases; the live registry is the column_aliases table
+PF_REQUIRED_COLUMNS = DEFAULT_ALIASES["pf"]
+# Read member ids as text when the header is one of the built-in aliases
+ID_DTYPES = {alias: str for alias in PF_REQUIRED_COLUMNS["UAN No"]}
+
+def pf_contribution_columns(epf_wages) -> Dict:
+    """EPS / EDLI wages and the remitted contributions derived from EPF wages"""
+    eps_wages = epf_wages.clip(upper=15000).where(epf_wages > 0, 0)
+    edli_wages = eps_wages.copy()
+    epf_contrib_remitted = (epf_wages * 0.12).round().astype(int_dtype())
+    eps_contrib_remitted = (eps_wages * 0.0833).round().astype(int_dtype())
+    epf_eps_diff_remitted = epf_contrib_remitted - eps_contrib_remitted
+    return {
+        "EPS Wages": eps_wages,
+        "EDLI WAGES": edli_wages,
+        "EPF CONTRI REMITTED": epf_contrib_remitted,
+        "EPS CONTRI REMITTED": eps_contrib_remitted,
+        "EPF EPS DIFF REMITTED": epf_eps_diff_remitted,
+    }
+
+
+def build_pf_frame(registry, df):
+    """ECR rows of one sheet"""
+    import pandas as pd
+
+    df, column_mapping = resolve_columns(registry, "pf", df)
+
+    uan_no = text_column(df[column_mapping["UAN No"]]).fillna("").str.replace("-", "", regex=False)
+    member_name = text_column(df[column_mapping["Employee Name"]])
+    gross_wages = whole_numbers(df[column_mapping["Gross Wages"]])
+    epf_wages = whole_numbers(df[column_mapping["EPF Wages"]])
+    ncp_days = rounded_half_up(df[column_mapping["LOP Days"]])
+    refund_of_advances = pd.Series(0, index=df.index, dtype=int_dtype())
+
+    return pd.DataFrame({
+        "UAN No": uan_no,
+        "MEMBER NAME": member_name,
+        "GROSS WAGES": gross_wages,
+        "EPF Wages": epf_wages,
+        **pf_contribution_columns(epf_wages),
+        "NCP DAYS": ncp_days,
+        "REFUND OF ADVANCES": refund_of_advances,
+    })
+
 
 async def process_pf_files(
     files: List[UploadFile],
     folder_name: str,
     current_user: UserModel,
     upload_month: str,
-    db: Session
+    db: Session,
+    duplicate_policy: Optional[str] = None,
 ) -> FileProcessResult:
-    fname = sanitize_folder_name(foldername=folder_name)
+    duplicate_policy = resolve_policy(duplicate_policy)
     try:
         upload_date_obj = datetime.strptime(upload_month, "%Y-%m-%d").date()
-        first_day_of_month = upload_date_obj
     except ValueError:
         raise HTTPException(
             status_code=400,
@@ -38,113 +90,81 @@ async def process_pf_files(
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
 
-    excel_files = [file for file in files if file.filename.lower().endswith((".xls", ".xlsx"))]
+    excel_files = [file for file in files if file.filename.lower().endswith(PAYROLL_EXTENSIONS)]
     if not excel_files:
-        raise HTTPException(status_code=400, detail="No Excel files found in the upload")
+        raise HTTPException(status_code=400, detail="No Excel or CSV files found in the upload")
+
+    registry = load_registry(db, "pf")
+    workbooks = [
+        process_workbook(excel_file, ID_DTYPES, lambda df: build_pf_frame(registry, df), registry)
+        for excel_file in excel_files
+    ]
+    return save_pf_run(
+        db, current_user, folder_name, upload_month, upload_date_obj, len(excel_files), workbooks, duplicate_policy
+    )
+
+
+def save_pf_run(
+    db: Session,
+    current_user: UserModel,
+    folder_name: str,
+    upload_month: str,
+    upload_date_obj: date,
+    total_files: int,
+    workbooks: List[Tuple[List[object], List[Dict[str, str]]]],
+    duplicate_policy: str,
+) -> FileProcessResult:
+    """Combine the converted workbooks of one upload, write the outputs and record the run"""
+    # pandas and the Excel readers are loaded on first use to keep API start-up fast
+    import pandas as pd
 
-    timestamp_folder = datetime.now().strftime("%Y%m%d_%H%M%S")
+    fname = sanitize_folder_name(foldername=folder_name)
+    first_day_of_month = upload_date_obj
+    timestamp_folder = unique_run_folder()
     upload_month_str = upload_date_obj.strftime("%Y-%m-%d")
-    output_dir = Path("processed_pf") / upload_month_str / timestamp_folder
-    output_dir.mkdir(parents=True, exist_ok=True)
+    storage = get_storage()
+    output_key = f"processed_pf/{upload_month_str}/{timestamp_folder}"
+    output_dir = storage.local_path(output_key)
+    output_dir.mkdir(parents=True, exist_ok=False)
 
     month_for_filename = upload_date_obj.strftime("%Y_%m_%d")
     excel_filename = f"{fname}_{month_for_filename}.xlsx"
     text_filename = f"{fname}_{month_for_filename}.txt"
     excel_file_path = output_dir / excel_filename
     text_file_path = output_dir / text_filename
+    excel_key = f"{output_key}/{excel_filename}"
+    text_key = f"{output_key}/{text_filename}"
 
     combined_df = pd.DataFrame()
     processed_files = []
     overall_status = "success"
     overall_message = "All files processed successfully."
+    outputs_saved = False
 
-    for excel_file in excel_files:
-        try:
-            kind = filetype.guess(excel_file.file)
-            if kind and kind.extension == "xlsx":
-                df = pd.read_excel(excel_file.file, engine="openpyxl", dtype={"UAN No": str, "UAN": str, "UAN Number": str})
-            elif kind and kind.extension == "xls":
-                df = pd.read_excel(excel_file.file, engine="xlrd", dtype={"UAN No": str, "UAN": str, "UAN Number": str})
-            else:
-                raise ValueError("Unsupported or unrecognized Excel file format")
-
-            required_columns = {
-                "UAN No": ["UAN No","UAN","UAN Number"],
-                "Employee Name": ["Employee Name","Name"],
-                "Gross Wages": ["Total Salary", "Gross Salary","Total Earnings","T GROSS"],
-                "EPF Wages": ["PF Gross", "EPF Gross","EPF WAGES"],
-                "LOP Days": ["LOP", "LOP Days","Lop Days"],
-            }
-
-            column_mapping = {}
-            missing_columns = []
-            for field, alternatives in required_columns.items():
-                found = False
-                for alt in alternatives:
-                    if alt in df.columns:
-                        column_mapping[field] = alt
-                        found = True
-                        break
-                if not found:
-                    missing_columns.append(field)
-
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
-
-            def custom_round(x):
-                if pd.isna(x):
-                    return 0
-                decimal_part = x - int(x)
-                if decimal_part >= 0.5:
-                    return math.ceil(x)
-                else:
-                    return math.floor(x)
-
-            uan_no = df[column_mapping["UAN No"]].astype(str).str.replace("-", "")
-            member_name = df[column_mapping["Employee Name"]]
-            gross_wages = df[column_mapping["Gross Wages"]].fillna(0).round().astype(int)
-            epf_wages = df[column_mapping["EPF Wages"]].fillna(0).round().astype(int)
-            lop_days_raw = df[column_mapping["LOP Days"]]
-            lop_days = lop_days_raw.apply(custom_round)
-            eps_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-            edli_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-            epf_contrib_remitted = (epf_wages * 0.12).round().astype(int)
-            eps_contrib_remitted = (eps_wages * 0.0833).round().astype(int)
-            epf_eps_diff_remitted = (epf_contrib_remitted - eps_contrib_remitted).astype(int)
-            ncp_days = lop_days
-            refund_of_advances = 0
-
-            output_df = pd.DataFrame({
-                "UAN No": uan_no,
-                "MEMBER NAME": member_name,
-                "GROSS WAGES": gross_wages,
-                "EPF Wages": epf_wages,
-                "EPS Wages": eps_wages,
-                "EDLI WAGES": edli_wages,
-                "EPF CONTRI REMITTED": epf_contrib_remitted,
-                "EPS CONTRI REMITTED": eps_contrib_remitted,
-                "EPF EPS DIFF REMITTED": epf_eps_diff_remitted,
-                "NCP DAYS": ncp_days,
-                "REFUND OF ADVANCES": refund_of_advances,
-            })
-
-            combined_df = pd.concat([combined_df, output_df], ignore_index=True)
+    for frames, entries in workbooks:
+        processed_files.extend(entries)
+        if frames:
+            combined_df = pd.concat([combined_df, *frames], ignore_index=True)
             combined_df.dropna(inplace=True)
-            processed_files.append({
-                "filename": excel_file.filename,
-                "status": "success",
-                "message": "Processed successfully",
-            })
-
-        except Exception as e:
-            processed_files.append({
-                "filename": excel_file.filename,
-                "status": "error",
-                "message": f"Error processing file: {str(e)}",
-            })
+        if any(entry["status"] == "error" for entry in entries):
             overall_status = "error"
             overall_message = "Some files had errors during processing."
 
+    validation = None
+    duplicates = None
+    if not combined_df.empty:
+        combined_df, duplicates = deduplicate_members(
+            "pf", combined_df, duplicate_policy,
+            recompute=lambda frame: frame.assign(**pf_contribution_columns(frame["EPF Wages"])),
+            wage_month=upload_date_obj,
+        )
+        combined_df, validation = validate_contributions("pf", combined_df, upload_date_obj, output_dir)
+        if validation["rejected_rows"] and overall_status == "success":
+            overall_message = (
+                f"All files processed successfully. {validation['rejected_rows']} rows failed "
+                "validation and were left out of the output."
+            )
+
     if not combined_df.empty and len(combined_df) > 0:
         try:
             with pd.ExcelWriter(excel_file_path, engine="openpyxl") as writer:
@@ -169,12 +189,16 @@ async def process_pf_files(
                     adjusted_width = (max_length + 2) * 1.2
                     worksheet.column_dimensions[column_letter].width = adjusted_width
 
-            output_lines = ["#~#".join(map(str, row)) for row in combined_df.values.tolist()]
+            output_lines = delimited_lines(combined_df, "#~#")
             header_line = "#~#".join(combined_df.columns)
             output_lines.insert(0, header_line)
 
             with open(text_file_path, "w") as f:
                 f.write("\n".join(output_lines))
+            for name in (excel_filename, text_filename, ERRORS_FILENAME):
+                if (output_dir / name).exists():
+                    storage.publish(f"{output_key}/{name}")
+            outputs_saved = True
         except Exception as e:
             overall_status = "error"
             overall_message = f"Error saving combined files: {str(e)}"
@@ -192,7 +216,6 @@ async def process_pf_files(
     db_record = ProcessedFilePF(
         user_id=current_user.id,
         filename=excel_filename,
-        filepath=f"{str(excel_file_path)},{str(text_file_path)}",
         status=overall_status,
         message=overall_message,
         upload_month=first_day_of_month,
@@ -201,26 +224,53 @@ async def process_pf_files(
 
     try:
         db.add(db_record)
+        if outputs_saved:
+            db.flush()
+            index_contributions(db, "pf", db_record, combined_df)
+            record_totals(db, "pf", db_record, combined_df)
+            record_artifact(db, "pf", db_record.id, XLSX, excel_key, excel_file_path)
+            record_artifact(db, "pf", db_record.id, TXT, text_key, text_file_path)
+            errors_path = output_dir / ERRORS_FILENAME
+            if errors_path.exists():
+                record_artifact(db, "pf", db_record.id, ERRORS, f"{output_key}/{ERRORS_FILENAME}", errors_path)
         db.commit()
         db.refresh(db_record)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error saving record to database: {str(e)}")
+    invalidate_dashboard(current_user.id)
+
+    if outputs_saved:
+        try:
+            archive_contributions("pf", db_record, combined_df)
+        except Exception as e:
+            print("Failed to archive contributions:", e)
+
+    diff = None
+    if outputs_saved:
+        try:
+            diff = diff_against_previous(db, "pf", db_record, combined_df)
+        except Exception as e:
+            print("Failed to compare with the previous month:", e)
 
     return FileProcessResult(
         status=overall_status,
         message=overall_message,
         upload_month=upload_month,
-        file_path=str(excel_file_path),
+        file_path=excel_key,
         processed_files=processed_files,
-        total_files=len(excel_files),
-        successful_files=len([f for f in processed_files if f["status"] == "success"]),
+        total_files=total_files,
+        successful_files=len({f["filename"] for f in processed_files if f["status"] == "success"}),
+        file_id=db_record.id,
+        diff=diff,
+        validation=validation,
+        duplicates=duplicates,
     )
 
-def build_pf_response(file: ProcessedFilePF) -> Dict:
-    filepaths = file.filepath.split(",")
-    excel_file_url = filepaths[0] if len(filepaths) > 0 else ""
-    text_file_url = filepaths[1] if len(filepaths) > 1 else ""
+def build_pf_response(file: ProcessedFilePF, artifacts: Dict[str, ProcessedArtifact]) -> Dict:
+    def key(kind: str) -> Optional[str]:
+        artifact = artifacts.get(kind)
+        return artifact.key if artifact is not None else None
 
     return {
         "id": file.id,
@@ -232,7 +282,7 @@ def build_pf_response(file: ProcessedFilePF) -> Dict:
         "upload_date": file.upload_date,
         "remittance_submitted": file.remittance_submitted,
         "remittance_date": file.remittance_date,
-        "remittance_challan_path": file.remittance_challan_path,
+        "remittance_challan_path": key(CHALLAN),
         "remittance_amount": file.remittance_amount,
         "created_at": file.created_at,
         "remittance_month": file.remittance_month,
@@ -240,6 +290,6 @@ def build_pf_response(file: ProcessedFilePF) -> Dict:
         "source_folder": file.source_folder,
         "processed_files_count": file.processed_files_count,
         "success_files_count": file.success_files_count,
-        "excel_file_url": excel_file_url,
-        "text_file_url": text_file_url,
+        "excel_file_url": key(XLSX) or "",
+        "text_file_url": key(TXT) or "",
     }
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""Reconciliation of submitted remittances against computed contributions.
+
+Every processed record gets a contribution_totals row, written in the same
+transaction as the record from its output frame: member count, gross wages and
+the employee / employer shares. For PF these are the EPF, EPS and EPF-EPS
+difference columns of the ECR; for ESI they are 0.75% and 3.25% of ESI gross,
+rounded up to the rupee per employee as ESIC does. When a remittance is
+submitted its amount is compared with the expected total (the sum of the
+shares) and the row is flagged matched, short or excess, within
+RECONCILIATION_TOLERANCE rupees or RECONCILIATION_TOLERANCE_PCT percent.
+
+Yearly reports are grouped per month in SQL from these rows alone and never
+re-read workbooks. Records processed before the table existed are totalled from
+the employee index by backfill_totals(), which runs with the schema set-up.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.models import ContributionTotals, UserModel
+from services.artifacts import RECORD_MODELS
+from services.dashboard import get_financial_year_dates
+from services.employee_index import INDEX_MODELS
+
+ESI_EMPLOYEE_RATE = 0.0075
+ESI_EMPLOYER_RATE = 0.0325
+MISMATCH_STATUSES = ("short", "excess")
+
+
+def _esi_share(gross: float, rate: float) -> int:
+    # Rounded first so that float error does not push an exact amount up a rupee
+    return math.ceil(round(gross * rate, 6))
+
+
+def _totals(members: int, gross: int, employee: int, employer: int, eps: Optional[int] = None, diff: Optional[int] = None) -> Dict:
+    return {
+        "members": members,
+        "gross_wages": gross,
+        "employee_share": employee,
+        "employer_share": employer,
+        "eps_share": eps,
+        "diff_share": diff,
+        "expected_amount": employee + employer,
+    }
+
+
+def _esi_totals(gross: List[float]) -> Dict:
+    return _totals(
+        len(gross),
+        int(sum(gross)),
+        sum(_esi_share(value, ESI_EMPLOYEE_RATE) for value in gross),
+        sum(_esi_share(value, ESI_EMPLOYER_RATE) for value in gross),
+    )
+
+
+def frame_totals(scheme: str, frame) -> Dict:
+    """Totals of the output frame of one processed record"""
+    if scheme == "pf":
+        epf = int(frame["EPF CONTRI REMITTED"].sum())
+        eps = int(frame["EPS CONTRI REMITTED"].sum())
+        diff = int(frame["EPF EPS DIFF REMITTED"].sum())
+        return _totals(len(frame), int(frame["GROSS WAGES"].sum()), epf, eps + diff, eps, diff)
+    return _esi_totals([float(value) for value in frame["ESI GROSS"]])
+
+
+def record_totals(db: Session, scheme: str, record, frame) -> ContributionTotals:
+    """Store the totals of a new processed record. The caller commits."""
+    row = ContributionTotals(
+        scheme=scheme,
+        record_id=record.id,
+        user_id=record.user_id,
+        wage_month=record.upload_month,
+        status="pending",
+        **frame_totals(scheme, frame),
+    )
+    db.add(row)
+    return row
+
+
+def get_totals(db: Session, scheme: str, record_id: int) -> Optional[ContributionTotals]:
+    return (
+        db.query(ContributionTotals)
+        .filter(ContributionTotals.scheme == scheme, ContributionTotals.record_id == record_id)
+        .first()
+    )
+
+
+def reconciliation_summary(row: ContributionTotals) -> Dict:
+    return {
+        "status": row.status,
+        "expected_amount": row.expected_amount,
+        "remitted_amount": row.remitted_amount,
+        "difference": row.difference,
+        "employee_share": row.employee_share,
+        "employer_share": row.employer_share,
+    }
+
+
+def _reconcile_row(row: ContributionTotals, remitted_amount: float) -> None:
+    difference = round(remitted_amount - row.expected_amount, 2)
+    tolerance = max(settings.RECONCILIATION_TOLERANCE, row.expected_amount * settings.RECONCILIATION_TOLERANCE_PCT / 100)
+    row.remitted_amount = remitted_amount
+    row.difference = difference
+    if abs(difference) <= tolerance:
+        row.status = "matched"
+    else:
+        row.status = "short" if difference < 0 else "excess"
+    row.reconciled_at = datetime.now()
+
+
+def reconcile(db: Session, scheme: str, record) -> Optional[Dict]:
+    """Compare the submitted remittance of a record with its totals. The caller commits."""
+    row = get_totals(db, scheme, record.id)
+    if row is None or record.remittance_amount is None:
+        return None
+    _reconcile_row(row, record.remittance_amount)
+    return reconciliation_summary(row)
+
+
+def backfill_totals(db: Session) -> Dict[str, int]:
+    """Total the successful records written before contribution_totals existed,
+    from their employee index rows"""
+    created = {"pf": 0, "esi": 0}
+    for scheme, model in RECORD_MODELS.items():
+        index_model = INDEX_MODELS[scheme]
+        totalled = db.query(ContributionTotals.record_id).filter(ContributionTotals.scheme == scheme)
+        pending = (
+            db.query(model)
+            .filter(model.status == "success", model.upload_month.isnot(None), model.id.notin_(totalled))
+            .filter(model.id.in_(db.query(index_model.record_id)))
+            .all()
+        )
+        if not pending:
+            continue
+        ids = [record.id for record in pending]
+        if scheme == "pf":
+            sums = db.query(
+                index_model.record_id,
+                func.count(),
+                func.sum(index_model.gross_wages),
+                func.sum(index_model.epf_contri_remitted),
+                func.sum(index_model.eps_contri_remitted),
+                func.sum(index_model.epf_eps_diff_remitted),
+            ).filter(index_model.record_id.in_(ids)).group_by(index_model.record_id)
+            totals = {
+                record_id: _totals(members, gross or 0, epf or 0, (eps or 0) + (diff or 0), eps or 0, diff or 0)
+                for record_id, members, gross, epf, eps, diff in sums
+            }
+        else:
+            # ESI shares are rounded per employee, so they are summed here
+            gross_by_record = defaultdict(list)
+            rows = db.query(index_model.record_id, index_model.esi_gross).filter(index_model.record_id.in_(ids))
+            for record_id, gross in rows:
+                gross_by_record[record_id].append(float(gross or 0))
+            totals = {record_id: _esi_totals(gross) for record_id, gross in gross_by_record.items()}
+        for record in pending:
+            row = ContributionTotals(
+                scheme=scheme,
+                record_id=record.id,
+                user_id=record.user_id,
+                wage_month=record.upload_month,
+                status="pending",
+                **totals[record.id],
+            )
+            if record.remittance_submitted and record.remittance_amount is not None:
+                _reconcile_row(row, record.remittance_amount)
+            db.add(row)
+            created[scheme] += 1
+        db.commit()
+    return created
+
+
+def _current_records(db: Session, model):
+    return (
+        db.query(func.max(model.id))
+        .filter(model.status == "success")
+        .group_by(model.user_id, model.upload_month)
+        .scalar_subquery()
+    )
+
+
+def reconciliation_report(
+    db: Session, scheme: str, year: int, current_user: UserModel, user_id: Optional[int] = None
+) -> Dict:
+    """Expected against remitted amounts per month of a financial year"""
+    start_date, end_date = get_financial_year_dates(year)
+    query = db.query(ContributionTotals).filter(
+        ContributionTotals.scheme == scheme,
+        ContributionTotals.wage_month >= start_date,
+        ContributionTotals.wage_month <= end_date,
+        ContributionTotals.record_id.in_(_current_records(db, RECORD_MODELS[scheme])),
+    )
+    if current_user.role != "admin":
+        query = query.filter(ContributionTotals.user_id == current_user.id)
+    elif user_id is not None:
+        query = query.filter(ContributionTotals.user_id == user_id)
+
+    def count(status: str):
+        return func.sum(case((ContributionTotals.status == status, 1), else_=0))
+
+    rows = (
+        query.with_entities(
+            ContributionTotals.wage_month,
+            func.count(),
+            func.sum(ContributionTotals.members),
+            func.sum(ContributionTotals.expected_amount),
+            func.sum(ContributionTotals.remitted_amount),
+            func.sum(ContributionTotals.difference),
+            count("matched"),
+            count("short"),
+            count("excess"),
+            count("pending"),
+        )
+        .group_by(ContributionTotals.wage_month)
+        .order_by(ContributionTotals.wage_month)
+        .all()
+    )
+    fields = ("records", "members", "expected_amount", "remitted_amount", "difference", "matched", "short", "excess", "pending")
+    months = [
+        {"wage_month": wage_month, **{field: value or 0 for field, value in zip(fields, values)}}
+        for wage_month, *values in rows
+    ]
+    totals = {field: sum(month[field] for month in months) for field in fields}
+    mismatches = [
+        {
+            "file_id": row.record_id,
+            "user_id": row.user_id,
+            "wage_month": row.wage_month,
+            **reconciliation_summary(row),
+        }
+        for row in query.filter(ContributionTotals.status.in_(MISMATCH_STATUSES))
+        .order_by(ContributionTotals.wage_month, ContributionTotals.record_id)
+        .all()
+    ]
+    return {"scheme": scheme, "year": year, "months": months, "totals": totals, "mismatches": mismatches}
@@ -0,0 +1,336 @@
+"""Remittance submission for many processed records in one request.
+
+A bulk request carries a manifest (JSON list, or CSV with a header row) of
+``file_id, challan, remittance_amount, remittance_date`` items and the challan
+PDFs it names, either as multipart files or inside one zip archive (which may
+hold the manifest itself as manifest.json / manifest.csv). Amount and date may
+be left out per item and are then read from the challan, as for a single
+submission.
+
+Every item is validated before anything is written, with the records loaded by
+one query. The uploaded challans are spooled to a temporary folder and hashed,
+and the amounts and dates left out are read from them at that point, so an item
+whose challan cannot be read fails before any file is stored. The challans of
+the valid items are then stored concurrently, and all record updates are
+committed in one transaction: if the commit fails, the stored challans are
+deleted again and no record changes. Each item gets its own result, so a bad
+row does not hold back the rest unless ``atomic`` is set.
+"""
+import csv
+import hashlib
+import io
+import json
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from fastapi import BackgroundTasks, HTTPException, UploadFile
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from services.artifacts import CHALLAN, HASH_CHUNK_BYTES, RECORD_MODELS, record_artifact
+from services.challan_parser import cross_check, extract_stored_challan, resolve_remittance_values
+from services.dashboard_cache import invalidate_dashboard
+from services.reconciliation import reconcile
+from services.storage import get_storage
+from utlis.files_utils import unique_run_folder
+
+MANIFEST_NAMES = ("manifest.json", "manifest.csv")
+CHALLAN_PREFIX = {"pf": "PF", "esi": "ESI"}
+
+
+def _month_str(record) -> str:
+    month = record.upload_month
+    return month.strftime("%Y-%m-%d") if isinstance(month, date) else str(month)
+
+
+def challan_key(scheme: str, record) -> str:
+    month_str = _month_str(record)
+    filename = f"{CHALLAN_PREFIX[scheme]}_Remittance_{month_str.replace('-', '_')}_{record.id}_{unique_run_folder()}.pdf"
+    return f"remittance_challans/{month_str}/{filename}"
+
+
+def _parse_manifest(content: str) -> List[Dict]:
+    content = content.strip()
+    if not content:
+        raise HTTPException(status_code=400, detail="The manifest is empty")
+    if content[0] in "[{":
+        try:
+            items = json.loads(content)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid manifest JSON: {e}")
+        if isinstance(items, dict):
+            items = items.get("items")
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise HTTPException(status_code=400, detail="The manifest must be a list of items")
+        return items
+    reader = csv.DictReader(io.StringIO(content))
+    return [{(key or "").strip(): (value or "").strip() for key, value in row.items()} for row in reader]
+
+
+def _challan_sources(
+    challan_files: Optional[List[UploadFile]], archive: Optional[zipfile.ZipFile]
+) -> Dict[str, Callable[[], BinaryIO]]:
+    """Openers of the uploaded challans by file name"""
+    sources: Dict[str, Callable[[], BinaryIO]] = {}
+    if archive is not None:
+        for info in archive.infolist():
+            name = PurePosixPath(info.filename).name
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or name.lower() in MANIFEST_NAMES:
+                continue
+            sources[name] = lambda info=info: archive.open(info)
+    for upload in challan_files or []:
+        if upload.filename:
+            upload.file.seek(0)
+            sources[PurePosixPath(upload.filename).name] = lambda upload=upload: upload.file
+    return sources
+
+
+def _validate_item(raw: Dict, sources: Dict[str, Callable], seen_ids: set, seen_challans: set) -> Tuple[Dict, Optional[str]]:
+    """(normalized item, error) of one manifest item"""
+    item = {
+        "file_id": raw.get("file_id"),
+        "challan": str(raw.get("challan") or "").strip(),
+        "remittance_amount": None,
+        "remittance_date": None,
+    }
+    try:
+        item["file_id"] = int(item["file_id"])
+    except (TypeError, ValueError):
+        return item, "file_id must be a number"
+    if item["file_id"] in seen_ids:
+        return item, "file_id appears more than once in the manifest"
+    seen_ids.add(item["file_id"])
+
+    if not item["challan"]:
+        return item, "No challan file named"
+    if not item["challan"].lower().endswith(".pdf"):
+        return item, "Only PDF files are accepted"
+    if item["challan"] not in sources:
+        return item, f"Challan file not uploaded: {item['challan']}"
+    if item["challan"] in seen_challans:
+        return item, "The same challan file is named by more than one item"
+    seen_challans.add(item["challan"])
+
+    amount = raw.get("remittance_amount")
+    if amount not in (None, ""):
+        try:
+            item["remittance_amount"] = float(amount)
+        except (TypeError, ValueError):
+            return item, "remittance_amount must be a number"
+        if item["remittance_amount"] <= 0:
+            return item, "Remittance amount must be positive"
+
+    remittance_date = raw.get("remittance_date")
+    if remittance_date not in (None, ""):
+        try:
+            item["remittance_date"] = datetime.strptime(str(remittance_date), "%Y-%m-%d").date()
+        except ValueError:
+            return item, "Invalid date format. Please use YYYY-MM-DD format (e.g., 2023-05-01)"
+    return item, None
+
+
+def _spool_challan(opener: Callable[[], BinaryIO], target: Path) -> str:
+    """Copy an uploaded challan to ``target``, returning its SHA-256"""
+    digest = hashlib.sha256()
+    stream = opener()
+    try:
+        with open(target, "wb") as f:
+            for chunk in iter(lambda: stream.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+                f.write(chunk)
+    finally:
+        if isinstance(stream, zipfile.ZipExtFile):
+            stream.close()
+    return digest.hexdigest()
+
+
+def _store_challan(key: str, spooled: Path) -> Path:
+    with open(spooled, "rb") as stream:
+        return get_storage().put_stream(key, stream)
+
+
+def submit_remittances(
+    db: Session,
+    scheme: str,
+    current_user,
+    background_tasks: BackgroundTasks,
+    manifest: Optional[str] = None,
+    challan_files: Optional[List[UploadFile]] = None,
+    archive: Optional[UploadFile] = None,
+    atomic: bool = False,
+) -> Dict:
+    model = RECORD_MODELS[scheme]
+    zip_file = None
+    if archive is not None:
+        try:
+            zip_file = zipfile.ZipFile(archive.file)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="The archive is not a valid zip file")
+    try:
+        if manifest is None and zip_file is not None:
+            members = {PurePosixPath(name).name.lower(): name for name in zip_file.namelist()}
+            for name in MANIFEST_NAMES:
+                if name in members:
+                    manifest = zip_file.read(members[name]).decode("utf-8-sig")
+                    break
+        if manifest is None:
+            raise HTTPException(status_code=400, detail="A manifest is required (form field or manifest.json / manifest.csv in the archive)")
+
+        raw_items = _parse_manifest(manifest)
+        if not raw_items:
+            raise HTTPException(status_code=400, detail="The manifest lists no items")
+        if len(raw_items) > settings.REMITTANCE_BULK_MAX_ITEMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {settings.REMITTANCE_BULK_MAX_ITEMS} items can be submitted at once",
+            )
+        with tempfile.TemporaryDirectory(prefix="challans_") as spool_dir:
+            return _submit(
+                db, scheme, model, current_user, background_tasks, raw_items,
+                _challan_sources(challan_files, zip_file), atomic, Path(spool_dir),
+            )
+    finally:
+        if zip_file is not None:
+            zip_file.close()
+
+
+def _submit(db, scheme, model, current_user, background_tasks, raw_items, sources, atomic, spool_dir: Path) -> Dict:
+    seen_ids: set = set()
+    seen_challans: set = set()
+    results = []
+    for raw in raw_items:
+        item, error = _validate_item(raw, sources, seen_ids, seen_challans)
+        results.append({**item, "status": "error" if error else "pending", "detail": error})
+
+    ids = [result["file_id"] for result in results if result["status"] == "pending"]
+    records = {record.id: record for record in db.query(model).filter(model.id.in_(ids)).all()} if ids else {}
+    for result in results:
+        if result["status"] != "pending":
+            continue
+        record = records.get(result["file_id"])
+        if record is None:
+            result.update(status="error", detail="File not found")
+        elif not record.upload_month:
+            result.update(status="error", detail="File missing upload month information")
+
+    pending = [result for result in results if result["status"] == "pending"]
+    if atomic and len(pending) != len(results):
+        for result in pending:
+            result.update(status="skipped", detail="Not submitted because other items failed validation")
+        return _summary(results)
+
+    # Spool and hash the challans concurrently; the session stays on this thread
+    spooled = {}
+    with ThreadPoolExecutor(max_workers=max(settings.REMITTANCE_BULK_WORKERS, 1)) as pool:
+        futures = {
+            result["file_id"]: pool.submit(
+                _spool_challan, sources[result["challan"]], spool_dir / f"{result['file_id']}.pdf"
+            )
+            for result in pending
+        }
+        for result in pending:
+            try:
+                spooled[result["file_id"]] = futures[result["file_id"]].result()
+            except Exception as e:
+                result.update(status="error", detail=f"Failed to read remittance file: {str(e)}")
+
+    extractions = {}
+    for result in pending:
+        if result["status"] != "pending":
+            continue
+        amount, paid_on, extraction = resolve_remittance_values(
+            db, spooled[result["file_id"]], spool_dir / f"{result['file_id']}.pdf",
+            result["remittance_amount"], result["remittance_date"],
+        )
+        if amount is None or paid_on is None or amount <= 0:
+            result.update(status="error", detail="Could not read the remittance amount and date from the challan, please enter them")
+            continue
+        result.update(remittance_amount=amount, remittance_date=paid_on)
+        extractions[result["file_id"]] = extraction
+
+    ready = [result for result in results if result["status"] == "pending"]
+    if atomic and len(ready) != len(results):
+        for result in ready:
+            result.update(status="skipped", detail="Not submitted because other items failed")
+        return _summary(results)
+
+    # Store the challans concurrently
+    for result in ready:
+        result["challan_path"] = challan_key(scheme, records[result["file_id"]])
+    stored = {}
+    with ThreadPoolExecutor(max_workers=max(settings.REMITTANCE_BULK_WORKERS, 1)) as pool:
+        futures = {
+            result["file_id"]: pool.submit(_store_challan, result["challan_path"], spool_dir / f"{result['file_id']}.pdf")
+            for result in ready
+        }
+        for result in ready:
+            try:
+                stored[result["file_id"]] = futures[result["file_id"]].result()
+            except Exception as e:
+                result.update(status="error", detail=f"Failed to save remittance file: {str(e)}")
+
+    stored_ready = [result for result in ready if result["status"] == "pending"]
+    if atomic and len(stored_ready) != len(ready):
+        # Only a storage failure gets here; nothing else has been written
+        for result in stored_ready:
+            get_storage().delete(result["challan_path"])
+            result.update(status="skipped", detail="Not submitted because other items failed")
+        return _summary(results)
+    ready = stored_ready
+    if not ready:
+        return _summary(results)
+
+    submitted_at = datetime.now()
+    try:
+        for result in ready:
+            record = records[result["file_id"]]
+            path, sha256 = stored[record.id], spooled[record.id]
+            record.remittance_submitted = True
+            record.remittance_month = record.upload_month
+            record.remittance_date = result["remittance_date"]
+            record.remittance_amount = result["remittance_amount"]
+            record.remittance_challan_path = result["challan_path"]
+            record.remittance_submitted_at = submitted_at
+            record.remittance_submitted_by = current_user.id
+            record_artifact(db, scheme, record.id, CHALLAN, result["challan_path"], path, sha256)
+            result["reconciliation"] = reconcile(db, scheme, record)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        for result in ready:
+            get_storage().delete(result["challan_path"])
+        raise HTTPException(status_code=500, detail=f"Failed to update database: {str(e)}")
+
+    for user_id in {records[result["file_id"]].user_id for result in ready}:
+        invalidate_dashboard(user_id)
+    for result in ready:
+        record = records[result["file_id"]]
+        extraction = extractions[record.id]
+        if extraction is None and settings.CHALLAN_PARSING:
+            background_tasks.add_task(extract_stored_challan, result["challan_path"], spooled[record.id])
+        result.update(
+            status="submitted",
+            remittance_month=_month_str(record),
+            submitted_at=submitted_at.isoformat(),
+            challan_check=cross_check(extraction, result["remittance_amount"], result["remittance_date"]),
+        )
+    return _summary(results)
+
+
+def _summary(results: List[Dict]) -> Dict:
+    submitted = sum(1 for result in results if result["status"] == "submitted")
+    for result in results:
+        if result["status"] != "submitted":
+            result.pop("challan_path", None)
+        if isinstance(result.get("remittance_date"), date):
+            result["remittance_date"] = result["remittance_date"].isoformat()
+    return {
+        "status": "success" if submitted == len(results) else ("partial" if submitted else "failed"),
+        "submitted": submitted,
+        "failed": len(results) - submitted,
+        "results": results,
+    }
@@ -0,0 +1,341 @@
+"""Retention for the processed_pf / processed_esi output trees.
+
+Outputs live in ``processed_<scheme>/<month>/<run>/`` and used to accumulate
+forever. A retention pass (POST /admin/retention/run) does two things:
+
+1. Superseded runs are garbage-collected. A run is kept while it belongs to
+   the current record of its (user, month) (the latest successful one), has a
+   submitted remittance, or is younger than RETENTION_SUPERSEDED_GRACE_DAYS.
+   Other run folders are deleted and their records are marked "superseded".
+2. Months older than RETENTION_ARCHIVE_AFTER_MONTHS are packed into per-month
+   zip archives next to the month folders (``<month>.zip``; runs added to an
+   already archived month later go into ``<month>.2.zip`` and so on). A JSON
+   index (``<month>.index.json``) maps every member to its archive, so single
+   files are still read by random access without touching the rest of the
+   archive. Archives are written to a temp name and renamed, the index is
+   updated, and only then are the folders removed, so every file is always
+   either on disk or in an indexed archive.
+
+Readers resolve a stored output path with resolve_output(): a local copy from
+the storage backend when the key is still stored, otherwise the archive member
+is extracted once into RETENTION_RESTORE_DIR (keeping its original mtime, so
+ETags and Last-Modified stay the same) and that copy is returned. Restored
+copies older than RETENTION_RESTORE_TTL_HOURS are removed by the next pass.
+
+Archiving only applies to the local backend; object stores tier old objects
+with their own lifecycle rules. Superseded runs are collected on every backend.
+
+Passes take an exclusive lock on a file under the storage root, so with
+several workers (or nodes sharing that root) only one pass runs at a time.
+Run folders written to within RETENTION_SUPERSEDED_GRACE_DAYS are not archived,
+so an upload still being written into an old month is left alone.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.models import ProcessedArtifact, ProcessedFileESI, ProcessedFilePF
+from services.artifacts import XLSX, delete_run_artifacts, run_key
+from services.storage import get_storage, storage_key
+from utlis.files_utils import atomic_write_text
+
+OUTPUT_ROOTS = {"pf": "processed_pf", "esi": "processed_esi"}
+RECORD_MODELS = {"pf": ProcessedFilePF, "esi": ProcessedFileESI}
+INDEX_SUFFIX = ".index.json"
+SUPERSEDED_STATUS = "superseded"
+SUPERSEDED_MESSAGE = "Superseded by a later run; outputs removed by the retention policy"
+LOCK_FILENAME = ".retention.lock"
+
+_index_cache: Dict[str, Tuple[float, Dict]] = {}
+_restore_lock = threading.Lock()
+
+
+def _parse_month(name: str) -> Optional[date]:
+    try:
+        return datetime.strptime(name, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _index_path(month_dir: Path) -> Path:
+    return month_dir.parent / f"{month_dir.name}{INDEX_SUFFIX}"
+
+
+def load_index(month_dir: Path) -> Dict:
+    """{"archives": [...], "files": {"<run>/<name>": {...}}} of an archived month"""
+    path = _index_path(month_dir)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return {"archives": [], "files": {}}
+    cached = _index_cache.get(str(path))
+    if cached and cached[0] == mtime:
+        return cached[1]
+    index = json.loads(path.read_text())
+    _index_cache[str(path)] = (mtime, index)
+    return index
+
+
+def _split_output_key(key: str) -> Optional[Tuple[str, str]]:
+    """(month key, member name) of ``processed_<scheme>/<month>/<run>/<file>``"""
+    parts = key.split("/")
+    if len(parts) < 4:
+        return None
+    return "/".join(parts[:-2]), "/".join(parts[-2:])
+
+
+def _archived_entry(key: str) -> Optional[Tuple[Path, str, str, Dict]]:
+    storage = get_storage()
+    split = _split_output_key(key)
+    if not storage.is_local or split is None:
+        return None
+    month_key, member = split
+    month_dir = storage.local_path(month_key)
+    entry = load_index(month_dir)["files"].get(member)
+    if entry is None:
+        return None
+    return month_dir, month_key, member, entry
+
+
+def output_exists(path) -> bool:
+    key = storage_key(path)
+    return get_storage().exists(key) or _archived_entry(key) is not None
+
+
+def resolve_output(path) -> Optional[Path]:
+    """A local path holding the content of a stored output path, or None"""
+    key = storage_key(path)
+    local_path = get_storage().fetch(key)
+    if local_path is not None:
+        return local_path
+    archived = _archived_entry(key)
+    if archived is None:
+        return None
+    month_dir, month_key, member, entry = archived
+    restored = Path(settings.RETENTION_RESTORE_DIR) / month_key / member
+    with _restore_lock:
+        if not restored.exists():
+            restored.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = restored.with_name(f".{restored.name}.{uuid.uuid4().hex[:8]}.tmp")
+            with zipfile.ZipFile(month_dir.parent / entry["archive"]) as archive:
+                with archive.open(member) as source, open(tmp_path, "wb") as target:
+                    shutil.copyfileobj(source, target)
+            os.replace(tmp_path, restored)
+        # atime marks the last use for the restore TTL; mtime stays the original
+        os.utime(restored, (time.time(), entry["mtime"]))
+    return restored
+
+
+def collect_superseded(db: Session, scheme: str, now: datetime) -> Tuple[Dict[str, int], List[int]]:
+    """({run key to delete: stored bytes}, ids of successful records they belong to)"""
+    model = RECORD_MODELS[scheme]
+    grace = now - timedelta(days=settings.RETENTION_SUPERSEDED_GRACE_DAYS)
+    records = (
+        db.query(
+            model.id, model.user_id, model.upload_month, model.status,
+            model.remittance_submitted, model.created_at, ProcessedArtifact.key,
+        )
+        .outerjoin(
+            ProcessedArtifact,
+            (ProcessedArtifact.scheme == scheme)
+            & (ProcessedArtifact.record_id == model.id)
+            & (ProcessedArtifact.kind == XLSX),
+        )
+        .all()
+    )
+
+    current: Dict[tuple, int] = {}
+    for record in records:
+        if record.status == "success":
+            key = (record.user_id, record.upload_month)
+            current[key] = max(current.get(key, 0), record.id)
+
+    keep, owners = set(), {}
+    for record in records:
+        if record.key is None:
+            continue
+        folder = run_key(record.key)
+        owners.setdefault(folder, []).append(record)
+        if (
+            current.get((record.user_id, record.upload_month)) == record.id
+            or record.remittance_submitted
+            or (record.created_at is not None and record.created_at > grace)
+        ):
+            keep.add(folder)
+
+    runs: Dict[str, List] = {}
+    for stored in get_storage().list(OUTPUT_ROOTS[scheme]):
+        parts = stored.key.split("/")
+        if len(parts) == 4 and _parse_month(parts[1]) is not None:
+            runs.setdefault("/".join(parts[:3]), []).append(stored)
+
+    doomed, superseded_ids = {}, []
+    for run, objects in sorted(runs.items()):
+        if run in keep:
+            continue
+        # Runs no record points at (crashed runs) get the same grace period
+        if run not in owners and datetime.fromtimestamp(max(o.mtime for o in objects)) > grace:
+            continue
+        doomed[run] = sum(o.size for o in objects)
+        superseded_ids += [r.id for r in owners.get(run, []) if r.status == "success"]
+    return doomed, superseded_ids
+
+
+def _newest_mtime(run: Path) -> float:
+    return max([run.stat().st_mtime] + [f.stat().st_mtime for f in run.rglob("*")])
+
+
+def _archive_month(month_dir: Path, dry_run: bool, settled_before: float) -> Dict:
+    """Move the settled run folders of one month into a new archive of that month"""
+    runs = [
+        run for run in sorted(month_dir.iterdir())
+        if run.is_dir() and _newest_mtime(run) < settled_before
+    ]
+    files = [f for run in runs for f in sorted(run.iterdir()) if f.is_file()]
+    source_bytes = sum(f.stat().st_size for f in files)
+    result = {"month": month_dir.name, "runs": len(runs), "files": len(files), "source_bytes": source_bytes}
+    if dry_run or not files:
+        return result
+
+    index = load_index(month_dir)
+    name = f"{month_dir.name}.zip" if not index["archives"] else f"{month_dir.name}.{len(index['archives']) + 1}.zip"
+    archive_path = month_dir.parent / name
+    tmp_path = archive_path.with_name(f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+    entries = {}
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=settings.RETENTION_COMPRESS_LEVEL) as archive:
+        for f in files:
+            member = f"{f.parent.name}/{f.name}"
+            archive.write(f, member)
+            stat = f.stat()
+            entries[member] = {"archive": name, "size": stat.st_size, "mtime": stat.st_mtime}
+    with zipfile.ZipFile(tmp_path) as archive:
+        if archive.testzip() is not None:
+            tmp_path.unlink()
+            raise RuntimeError(f"Archive check failed for {month_dir}")
+    os.replace(tmp_path, archive_path)
+
+    updated = {
+        "archives": index["archives"] + [name],
+        "files": {**index["files"], **entries},
+        "updated_at": datetime.now().isoformat(),
+    }
+    atomic_write_text(_index_path(month_dir), json.dumps(updated))
+    for run in runs:
+        shutil.rmtree(run, ignore_errors=True)
+    try:
+        month_dir.rmdir()
+    except OSError:
+        pass
+    result["archive"] = str(archive_path)
+    result["archive_bytes"] = archive_path.stat().st_size
+    return result
+
+
+def _prune_local_copies(directory: Path, ttl_hours: int, now: float) -> int:
+    """Remove copies in ``directory`` that were not used for ``ttl_hours``"""
+    if not directory.exists():
+        return 0
+    cutoff = now - ttl_hours * 3600
+    removed = 0
+    for f in directory.rglob("*"):
+        if f.is_file() and f.stat().st_atime < cutoff:
+            f.unlink()
+            removed += 1
+    return removed
+
+
+@contextmanager
+def _pass_lock(path: Path) -> Iterator[None]:
+    """Exclusive across processes; raises RuntimeError when another pass holds it"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        try:
+            import fcntl
+
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError("A retention pass is already running")
+            unlock = lambda: fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        except ImportError:
+            import msvcrt
+
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                raise RuntimeError("A retention pass is already running")
+            unlock = lambda: msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        try:
+            yield
+        finally:
+            unlock()
+
+
+def run_retention(db: Session, dry_run: bool = False) -> Dict:
+    """Apply the retention policy to both output trees and return what was done"""
+    with _pass_lock(get_storage().local_path(LOCK_FILENAME)):
+        return _run_retention(db, dry_run)
+
+
+def _run_retention(db: Session, dry_run: bool) -> Dict:
+    now = datetime.now()
+    first_of_month = now.date().replace(day=1)
+    cutoff_month = first_of_month
+    for _ in range(settings.RETENTION_ARCHIVE_AFTER_MONTHS):
+        cutoff_month = (cutoff_month - timedelta(days=1)).replace(day=1)
+
+    settled_before = (now - timedelta(days=settings.RETENTION_SUPERSEDED_GRACE_DAYS)).timestamp()
+    storage = get_storage()
+    report = {"dry_run": dry_run, "storage": "local" if storage.is_local else "s3", "schemes": {}}
+    for scheme, prefix in OUTPUT_ROOTS.items():
+        doomed, superseded_ids = collect_superseded(db, scheme, now)
+        if not dry_run and doomed:
+            for doomed_run in doomed:
+                storage.delete_prefix(doomed_run)
+                delete_run_artifacts(db, doomed_run)
+            if superseded_ids:
+                model = RECORD_MODELS[scheme]
+                db.query(model).filter(model.id.in_(superseded_ids)).update(
+                    {model.status: SUPERSEDED_STATUS, model.message: SUPERSEDED_MESSAGE},
+                    synchronize_session=False,
+                )
+            db.commit()
+
+        archived = []
+        root = storage.local_path(prefix)
+        if storage.is_local and settings.RETENTION_ARCHIVE_AFTER_MONTHS > 0 and root.exists():
+            for month_dir in sorted(root.iterdir()):
+                month = _parse_month(month_dir.name)
+                if month_dir.is_dir() and month is not None and month < cutoff_month:
+                    try:
+                        archived.append(_archive_month(month_dir, dry_run, settled_before))
+                    except Exception as e:
+                        print(f"Failed to archive {month_dir}:", e)
+                        archived.append({"month": month_dir.name, "error": str(e)})
+
+        report["schemes"][scheme] = {
+            "superseded_runs_removed": len(doomed),
+            "records_marked_superseded": len(superseded_ids),
+            "bytes_freed": sum(doomed.values()),
+            "archived_months": archived,
+        }
+    if not dry_run:
+        report["restored_copies_removed"] = _prune_local_copies(
+            Path(settings.RETENTION_RESTORE_DIR), settings.RETENTION_RESTORE_TTL_HOURS, time.time()
+        )
+        if not storage.is_local:
+            report["cached_copies_removed"] = _prune_local_copies(
+                Path(settings.STORAGE_CACHE_DIR), settings.STORAGE_CACHE_TTL_HOURS, time.time()
+            )
+    return report
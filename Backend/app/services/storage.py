@@ -0,0 +1,265 @@
+"""Where processed outputs and remittance challans are kept.
+
+Stored paths (processed_artifacts.key, remittance_challan_path) are storage
+keys: "/"-separated relative paths such as
+``processed_pf/2024-05-01/<run>/<file>.xlsx``. STORAGE_BACKEND selects where
+the keys live:
+
+* local - files under STORAGE_LOCAL_ROOT (the working directory by default,
+          which is where keys stored before this module existed point)
+* s3    - objects in S3_BUCKET of an S3-compatible service (AWS, or MinIO and
+          the like through S3_ENDPOINT_URL), so every API node serves the same
+          data. Needs boto3. Files are staged in STORAGE_CACHE_DIR and uploaded
+          in parts above S3_MULTIPART_THRESHOLD_MB; reads download into the same
+          cache, and downloads are answered with a redirect to a presigned URL.
+
+Writers produce a file at local_path(key) and publish(key) it, or hand a stream
+to put_stream(). Readers get a local copy from fetch(key), or a URL to redirect
+the client to from download_url().
+"""
+import os
+import shutil
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+from core.config import settings
+
+STREAM_CHUNK_BYTES = 1024 * 1024
+MB = 1024 * 1024
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    mtime: float
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+class Storage(ABC):
+    is_local = True
+
+    @abstractmethod
+    def local_path(self, key: str) -> Path:
+        """Where the content of ``key`` is written / read on this node"""
+
+    @abstractmethod
+    def publish(self, key: str) -> None:
+        """Store the file written at local_path(key) under ``key``"""
+
+    def put_stream(self, key: str, stream: BinaryIO) -> Path:
+        """Store ``stream`` under ``key`` without holding it in memory"""
+        path = self.local_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _tmp_path(path)
+        try:
+            with open(tmp_path, "wb") as target:
+                shutil.copyfileobj(stream, target, STREAM_CHUNK_BYTES)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        self.publish(key)
+        return path
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def fetch(self, key: str) -> Optional[Path]:
+        """A local file holding the content of ``key``, or None when it is missing"""
+
+    @abstractmethod
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        ...
+
+    def download_url(self, key: str, filename: str, media_type: str) -> Optional[str]:
+        """A URL the client can download ``key`` from directly, if the backend has one"""
+        return None
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def local_path(self, key: str) -> Path:
+        return self.root / key
+
+    def publish(self, key: str) -> None:
+        pass
+
+    def exists(self, key: str) -> bool:
+        return self.local_path(key).is_file()
+
+    def fetch(self, key: str) -> Optional[Path]:
+        path = self.local_path(key)
+        return path if path.is_file() else None
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        base = self.local_path(prefix)
+        if not base.is_dir():
+            return
+        for path in base.rglob("*"):
+            if path.is_file():
+                stat = path.stat()
+                yield StoredObject(path.relative_to(self.root).as_posix(), stat.st_size, stat.st_mtime)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.local_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def delete_prefix(self, prefix: str) -> None:
+        shutil.rmtree(self.local_path(prefix), ignore_errors=True)
+
+
+class S3Storage(Storage):
+    is_local = False
+
+    def __init__(self):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        if not settings.S3_BUCKET:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        self.bucket = settings.S3_BUCKET
+        self.prefix = settings.S3_PREFIX.strip("/")
+        self.cache_dir = Path(settings.STORAGE_CACHE_DIR)
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL or None,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+            config=Config(signature_version="s3v4", s3={"addressing_style": settings.S3_ADDRESSING_STYLE}),
+        )
+        self.transfer = TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * MB,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNK_MB * MB,
+            max_concurrency=settings.S3_MAX_CONCURRENCY,
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _is_missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def local_path(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def publish(self, key: str) -> None:
+        self.client.upload_file(str(self.local_path(key)), self.bucket, self._object_key(key), Config=self.transfer)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        # Asked every time: another node may have deleted the key
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    def fetch(self, key: str) -> Optional[Path]:
+        from botocore.exceptions import ClientError
+
+        path = self.local_path(key)
+        if path.is_file():
+            # atime marks the last use for STORAGE_CACHE_TTL_HOURS
+            os.utime(path, (time.time(), path.stat().st_mtime))
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _tmp_path(path)
+        try:
+            self.client.download_file(self.bucket, self._object_key(key), str(tmp_path), Config=self.transfer)
+            os.replace(tmp_path, path)
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return path
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix.rstrip("/") + "/")):
+            for item in page.get("Contents", []):
+                yield StoredObject(item["Key"][strip:], item["Size"], item["LastModified"].timestamp())
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        try:
+            self.local_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = [item.key for item in self.list(prefix)]
+        # DeleteObjects takes at most 1000 keys per request
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": self._object_key(key)} for key in batch], "Quiet": True},
+            )
+        shutil.rmtree(self.local_path(prefix), ignore_errors=True)
+
+    def download_url(self, key: str, filename: str, media_type: str) -> Optional[str]:
+        if settings.S3_PRESIGN_EXPIRES_S <= 0:
+            return None
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._object_key(key),
+                "ResponseContentDisposition": f"attachment; filename={filename}",
+                "ResponseContentType": media_type,
+            },
+            ExpiresIn=settings.S3_PRESIGN_EXPIRES_S,
+        )
+
+
+def get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = settings.STORAGE_BACKEND.strip().lower()
+                if backend == "s3":
+                    _storage = S3Storage()
+                elif backend == "local":
+                    _storage = LocalStorage(settings.STORAGE_LOCAL_ROOT)
+                else:
+                    raise RuntimeError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return _storage
+
+
+def storage_key(path) -> str:
+    """The key of a stored path, which may be a str or a Path"""
+    return Path(path).as_posix()
@@ -0,0 +1,146 @@
+"""Row level validation of the combined PF / ESI frame before the ECR is written.
+
+Rules are declared per scheme in VALIDATION_RULES. Each rule's check returns a
+boolean mask of the failing rows, computed with vectorized pandas operations,
+so the whole catalog runs in one pass over the frame. Rows failing an "error"
+rule are left out of the ECR outputs; "warning" rules are only reported. Every
+flagged row is written to validation_errors.csv in the run folder together with
+its source file and Excel row number.
+"""
+import calendar
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from services.frame_dtypes import as_text
+
+# Bookkeeping columns added per row while reading the uploaded workbooks
+SOURCE_FILE_COLUMN = "_source_file"
+SOURCE_ROW_COLUMN = "_source_row"
+SOURCE_COLUMNS = [SOURCE_FILE_COLUMN, SOURCE_ROW_COLUMN]
+ERRORS_FILENAME = "validation_errors.csv"
+
+
+class ValidationRule(NamedTuple):
+    code: str
+    severity: str  # "error" drops the row from the ECR, "warning" only reports it
+    message: str
+    check: Callable  # (frame, context) -> boolean Series, True where the row fails
+
+
+def _numeric(frame, column):
+    import pandas as pd
+
+    return pd.to_numeric(frame[column], errors="coerce")
+
+
+def _not_digits(column: str, length: int):
+    return lambda frame, ctx: ~as_text(frame[column]).str.fullmatch(rf"\d{{{length}}}")
+
+
+def _blank(column: str):
+    return lambda frame, ctx: as_text(frame[column]).str.strip().isin(["", "nan", "None"])
+
+
+def _negative(*columns: str):
+    def check(frame, ctx):
+        failed = None
+        for column in columns:
+            mask = _numeric(frame, column) < 0
+            failed = mask if failed is None else failed | mask
+        return failed
+    return check
+
+
+def _repeated_in_file(column: str):
+    def check(frame, ctx):
+        ids = as_text(frame[column]).str.strip().str.replace(r"[\s-]", "", regex=True)
+        present = ~ids.isin(["", "nan", "None", "<NA>"]) & ids.notna()
+        return present & frame.assign(_id=ids).duplicated([SOURCE_FILE_COLUMN, "_id"], keep=False)
+    return check
+
+
+def _days_out_of_month(column: str):
+    def check(frame, ctx):
+        days = _numeric(frame, column)
+        return (days < 0) | (days > ctx["days_in_month"])
+    return check
+
+
+VALIDATION_RULES: Dict[str, List[ValidationRule]] = {
+    "pf": [
+        ValidationRule("PF_UAN_FORMAT", "error", "UAN must be exactly 12 digits", _not_digits("UAN No", 12)),
+        ValidationRule("PF_UAN_REPEATED", "error", "UAN appears more than once in the same file", _repeated_in_file("UAN No")),
+        ValidationRule("PF_NAME_MISSING", "error", "Member name is empty", _blank("MEMBER NAME")),
+        ValidationRule("PF_NEGATIVE_WAGES", "error", "Gross or EPF wages are negative", _negative("GROSS WAGES", "EPF Wages")),
+        ValidationRule("PF_NCP_DAYS_RANGE", "error", "NCP / LOP days exceed the days in the month", _days_out_of_month("NCP DAYS")),
+        ValidationRule(
+            "PF_EPF_ABOVE_GROSS", "warning", "EPF wages are higher than gross wages",
+            lambda frame, ctx: _numeric(frame, "EPF Wages") > _numeric(frame, "GROSS WAGES"),
+        ),
+    ],
+    "esi": [
+        ValidationRule("ESI_NUMBER_FORMAT", "error", "ESI number must be exactly 10 digits", _not_digits("ESI No", 10)),
+        ValidationRule("ESI_NUMBER_REPEATED", "error", "ESI number appears more than once in the same file", _repeated_in_file("ESI No")),
+        ValidationRule("ESI_NAME_MISSING", "error", "Member name is empty", _blank("MEMBER NAME")),
+        ValidationRule("ESI_NEGATIVE_WAGES", "error", "ESI gross wages are negative", _negative("ESI GROSS")),
+        ValidationRule("ESI_WORKED_DAYS_RANGE", "error", "Worked days exceed the days in the month", _days_out_of_month("WORKED DAYS")),
+    ],
+}
+
+# First output column holds the member id in both schemes
+_ID_COLUMN = {"pf": "UAN No", "esi": "ESI No"}
+
+
+def _join_flags(failed, labels: Dict[str, str]):
+    """';'-joined labels of the failed rules of every row of a boolean frame"""
+    import pandas as pd
+
+    joined = pd.Series("", index=failed.index)
+    for code, label in labels.items():
+        joined = joined.where(~failed[code], joined + label + "; ")
+    return joined.str.rstrip("; ")
+
+
+def validate_contributions(
+    scheme: str, frame, wage_month: date, output_dir: Optional[Path] = None
+) -> Tuple[object, Dict]:
+    """Run the scheme's rule catalog over the combined frame.
+
+    Returns the rows that passed every error rule (without the source
+    bookkeeping columns) and a summary for the processing result.
+    """
+    import pandas as pd
+
+    rules = VALIDATION_RULES[scheme]
+    context = {"days_in_month": calendar.monthrange(wage_month.year, wage_month.month)[1]}
+    failed = pd.DataFrame(
+        {rule.code: rule.check(frame, context).fillna(False).astype(bool) for rule in rules},
+        index=frame.index,
+    )
+    error_codes = [rule.code for rule in rules if rule.severity == "error"]
+    rejected = failed[error_codes].any(axis=1)
+    flagged = failed.any(axis=1)
+
+    summary = {
+        "checked_rows": len(frame),
+        "rejected_rows": int(rejected.sum()),
+        "warning_rows": int((flagged & ~rejected).sum()),
+        "rule_counts": {code: int(count) for code, count in failed.sum().items() if count},
+        "errors_file": None,
+    }
+
+    if flagged.any() and output_dir is not None:
+        bad = failed[flagged]
+        report = frame.loc[flagged, SOURCE_COLUMNS + [_ID_COLUMN[scheme], "MEMBER NAME"]].rename(
+            columns={SOURCE_FILE_COLUMN: "SOURCE FILE", SOURCE_ROW_COLUMN: "SOURCE ROW"}
+        )
+        report["ACTION"] = rejected[flagged].map({True: "rejected", False: "kept"})
+        report["CODES"] = _join_flags(bad, {rule.code: rule.code for rule in rules})
+        report["ERRORS"] = _join_flags(bad, {rule.code: rule.message for rule in rules})
+        errors_path = output_dir / ERRORS_FILENAME
+        report.to_csv(errors_path, index=False)
+        summary["errors_file"] = str(errors_path)
+
+    valid = frame.loc[~rejected].drop(columns=SOURCE_COLUMNS).reset_index(drop=True)
+    return valid, summary
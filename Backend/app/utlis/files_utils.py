@@ -1,4 +1,7 @@
+import os
 import re
+import uuid
+from datetime import datetime
 from pathlib import Path
 from enum import Enum as PyEnum
 
@@ -10,4 +13,16 @@ def sanitize_folder_name(foldername: str) -> str:
 class Role(str, PyEnum):
     USER = "user"
     HR = "hr"
-    ADMIN = "admin"
\ No newline at end of file
+    ADMIN = "admin"
+
+def unique_run_folder() -> str:
+    """Timestamped folder name that stays unique across concurrent workers"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write via a temp file and rename so readers in other workers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,129 @@
+"""Arrow-backed versus object / int64 columns through the processing stages.
+
+Runs the same synthetic upload through ingestion (``process_workbook``),
+duplicate resolution, validation and the ECR text rendering twice: once with
+ARROW_DTYPES on (``string[pyarrow]`` / ``int64[pyarrow]`` columns) and once
+with it off. Reports the median wall time per stage, the in-memory size of
+the combined frame and the tracemalloc peak of one full run.
+
+CSV input is the default so the comparison is not swamped by openpyxl.
+
+Usage (from Backend/, needs pyarrow):
+    python -m benchmarks.bench_dtypes --rows 200000 --iterations 3 -o benchmarks/results/dtypes_200k.json
+"""
+import argparse
+import io
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.common import environment_info, write_report
+from benchmarks.workbook_generator import SUPPORTED_FORMATS, frame_to_workbook, generate_esi_frame, generate_pf_frame
+
+STAGES = ("ingest", "dedup", "validate", "render_txt")
+
+
+def _run(scheme: str, content: bytes, file_format: str, output_dir: Path) -> Dict:
+    import pandas as pd
+    from starlette.datastructures import UploadFile
+
+    from services.column_resolver import DEFAULT_ALIASES
+    from services.dedup import deduplicate_members
+    from services.frame_dtypes import delimited_lines
+    from services.payroll_reader import process_workbook
+    from services.validation import validate_contributions
+
+    if scheme == "pf":
+        from services.pf import ID_DTYPES, build_pf_frame as build
+    else:
+        from services.esi import ID_DTYPES, build_esi_frame as build
+    registry = ((), DEFAULT_ALIASES[scheme])
+    timings = {}
+
+    start = time.perf_counter()
+    upload = UploadFile(file=io.BytesIO(content), filename=f"bench.{file_format}")
+    frames, entries = process_workbook(upload, ID_DTYPES, lambda df: build(registry, df), registry)
+    if not frames:
+        raise RuntimeError(entries)
+    frame = pd.concat(frames, ignore_index=True).dropna()
+    timings["ingest"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame, _ = deduplicate_members(scheme, frame, "keep-last")
+    timings["dedup"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame, _ = validate_contributions(scheme, frame, date(2024, 5, 1), output_dir)
+    timings["validate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lines = delimited_lines(frame, "#~#")
+    timings["render_txt"] = time.perf_counter() - start
+
+    return {
+        "timings": timings,
+        "rows_out": len(lines),
+        "frame_mb": frame.memory_usage(deep=True).sum() / (1024 * 1024),
+        "dtypes": sorted({str(dtype) for dtype in frame.dtypes}),
+    }
+
+
+def bench_mode(scheme: str, content: bytes, file_format: str, arrow: bool, iterations: int) -> Dict:
+    from core.config import settings
+
+    settings.ARROW_DTYPES = arrow
+    output_dir = Path(tempfile.mkdtemp(prefix="bench_dtypes_"))
+    runs = [_run(scheme, content, file_format, output_dir) for _ in range(iterations)]
+
+    tracemalloc.start()
+    _run(scheme, content, file_format, output_dir)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stage_ms = {
+        stage: round(statistics.median(run["timings"][stage] for run in runs) * 1000, 1) for stage in STAGES
+    }
+    return {
+        "rows_out": runs[0]["rows_out"],
+        "dtypes": runs[0]["dtypes"],
+        "stage_ms_median": stage_ms,
+        "total_ms_median": round(sum(stage_ms.values()), 1),
+        "frame_mb": round(runs[0]["frame_mb"], 1),
+        "traced_peak_mb": round(peak / (1024 * 1024), 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--schemes", nargs="+", choices=["pf", "esi"], default=["pf", "esi"])
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, default="csv")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args(argv)
+
+    from services.frame_dtypes import arrow_dtypes_enabled
+
+    if not arrow_dtypes_enabled():
+        parser.error("the Arrow path needs pyarrow (pip install pyarrow)")
+
+    report = {"environment": environment_info(), "rows": args.rows, "format": args.format, "scenarios": {}}
+    for scheme in args.schemes:
+        df = generate_pf_frame(args.rows) if scheme == "pf" else generate_esi_frame(args.rows)
+        content = frame_to_workbook(df, args.format)
+        results = {
+            "object": bench_mode(scheme, content, args.format, False, args.iterations),
+            "arrow": bench_mode(scheme, content, args.format, True, args.iterations),
+        }
+        results["speedup"] = round(results["object"]["total_ms_median"] / results["arrow"]["total_ms_median"], 2)
+        results["frame_memory_ratio"] = round(results["arrow"]["frame_mb"] / results["object"]["frame_mb"], 2)
+        report["scenarios"][scheme] = results
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Ingestion throughput per input format: reading an upload into ECR rows.
+
+Runs ``services.payroll_reader.process_workbook`` (read + header resolution +
+contribution columns) on the same synthetic payroll saved as .xlsx, .xls and
+.csv. Writing the output workbook is left out: it costs the same whatever the
+input format was.
+
+Usage (from Backend/):
+    python -m benchmarks.bench_ingest --rows 50000 --iterations 3 -o benchmarks/results/ingest_50k.json
+"""
+import argparse
+import io
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.common import environment_info, peak_rss_mb, write_report
+from benchmarks.workbook_generator import SUPPORTED_FORMATS, frame_to_workbook, generate_esi_frame, generate_pf_frame, xls_supported
+
+
+def _ingest(scheme: str, content: bytes, file_format: str) -> int:
+    from starlette.datastructures import UploadFile
+
+    from services.column_resolver import DEFAULT_ALIASES
+    from services.payroll_reader import process_workbook
+
+    if scheme == "pf":
+        from services.pf import ID_DTYPES, build_pf_frame as build
+    else:
+        from services.esi import ID_DTYPES, build_esi_frame as build
+    registry = ((), DEFAULT_ALIASES[scheme])
+    upload = UploadFile(file=io.BytesIO(content), filename=f"bench.{file_format}")
+    frames, entries = process_workbook(upload, ID_DTYPES, lambda df: build(registry, df), registry)
+    if not frames:
+        raise RuntimeError(entries)
+    return sum(len(frame) for frame in frames)
+
+
+def bench_format(scheme: str, rows: int, file_format: str, iterations: int) -> Dict:
+    df = generate_pf_frame(rows) if scheme == "pf" else generate_esi_frame(rows)
+    content = frame_to_workbook(df, file_format)
+    timings: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows_out = _ingest(scheme, content, file_format)
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    return {
+        "file_mb": round(len(content) / (1024 * 1024), 2),
+        "rows_out": rows_out,
+        "wall_ms_median": round(median * 1000, 1),
+        "throughput_rows_per_s": round(rows / median, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--schemes", nargs="+", choices=["pf", "esi"], default=["pf", "esi"])
+    parser.add_argument("--formats", nargs="+", choices=SUPPORTED_FORMATS, default=list(SUPPORTED_FORMATS))
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment_info(), "rows": args.rows, "scenarios": {}}
+    for scheme in args.schemes:
+        for file_format in args.formats:
+            if file_format == "xls" and (not xls_supported() or args.rows > 65535):
+                print(f"Skipping {scheme}.xls (needs xlwt and at most 65535 rows)")
+                continue
+            report["scenarios"][f"{scheme}.{file_format}"] = bench_format(scheme, args.rows, file_format, args.iterations)
+        csv_result = report["scenarios"].get(f"{scheme}.csv")
+        xlsx_result = report["scenarios"].get(f"{scheme}.xlsx")
+        if csv_result and xlsx_result:
+            report["scenarios"][f"{scheme}.csv"]["speedup_vs_xlsx"] = round(
+                csv_result["throughput_rows_per_s"] / xlsx_result["throughput_rows_per_s"], 1
+            )
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
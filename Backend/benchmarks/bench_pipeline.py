@@ -0,0 +1,236 @@
+"""In-process benchmark of the PF / ESI pipelines, batch download and dashboard services.
+
+Each scenario is run ``--iterations`` times against synthetic workbooks and a
+throwaway SQLite database. The JSON report holds throughput, latency
+percentiles and the process peak RSS observed after each scenario (scenarios
+run in order, so use ``--only`` to measure one in isolation).
+
+Usage (from Backend/):
+    python -m benchmarks.bench_pipeline --rows 1000 10000 --iterations 5 -o report.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from benchmarks.common import (
+    create_workdir,
+    create_user,
+    environment_info,
+    open_session,
+    peak_rss_mb,
+    summarize_latencies,
+    timed,
+    write_report,
+)
+
+UPLOAD_MONTH = "2024-05-01"
+DASHBOARD_YEAR = 2025
+
+
+def _upload_files(payloads: List[bytes], file_format: str):
+    from starlette.datastructures import UploadFile
+
+    return [
+        UploadFile(file=io.BytesIO(content), filename=f"branch_{index + 1}.{file_format}")
+        for index, content in enumerate(payloads)
+    ]
+
+
+async def bench_processing(scheme: str, rows: int, file_format: str, files_per_upload: int, iterations: int, db, user) -> Dict:
+    from benchmarks.workbook_generator import generate_workbook
+    from services.pf import process_pf_files
+    from services.esi import process_esi_files
+
+    payloads = [generate_workbook(scheme, rows, file_format, seed=index) for index in range(files_per_upload)]
+    latencies: List[float] = []
+    for _ in range(iterations):
+        files = _upload_files(payloads, file_format)
+        with timed(latencies):
+            if scheme == "pf":
+                result = await process_pf_files(files, "Bench Folder", user, UPLOAD_MONTH, db)
+            else:
+                result = await process_esi_files(files, "Bench Folder", UPLOAD_MONTH, user, db)
+        if result.status != "success":
+            raise RuntimeError(f"{scheme} processing failed: {result.message} {result.processed_files}")
+
+    total_rows = rows * files_per_upload * iterations
+    return {
+        "iterations": iterations,
+        "rows_per_upload": rows * files_per_upload,
+        "throughput_rows_per_s": round(total_rows / (sum(latencies) / 1000), 1),
+        "latency_ms": summarize_latencies(latencies),
+    }
+
+
+async def bench_batch_download(scheme: str, iterations: int, db, user) -> Dict:
+    from fastapi import BackgroundTasks
+    from database.models import ProcessedFilePF, ProcessedFileESI
+
+    if scheme == "pf":
+        from api.router.pf import download_multiple_pf_files as download
+        model = ProcessedFilePF
+    else:
+        from api.router.esi import download_multiple_esi_files as download
+        model = ProcessedFileESI
+
+    ids = [row.id for row in db.query(model.id).filter(model.status == "success").all()]
+    if not ids:
+        raise RuntimeError(f"No successful {scheme} records to download")
+    file_ids = ",".join(str(i) for i in ids)
+
+    latencies: List[float] = []
+    total_bytes = 0
+    for _ in range(iterations):
+        with timed(latencies):
+            response = await download(
+                file_ids=file_ids, current_user=user, db=db, background_tasks=BackgroundTasks()
+            )
+            async for chunk in response.body_iterator:
+                total_bytes += len(chunk)
+
+    return {
+        "iterations": iterations,
+        "records_per_request": len(ids),
+        "throughput_mb_per_s": round(total_bytes / (1024 * 1024) / (sum(latencies) / 1000), 2),
+        "latency_ms": summarize_latencies(latencies),
+    }
+
+
+def seed_dashboard_records(db, user, count: int) -> None:
+    """Insert submitted remittances spread over the benchmark financial year"""
+    from database.models import ProcessedFilePF, ProcessedFileESI
+
+    rng = random.Random(42)
+    fy_start = date(DASHBOARD_YEAR - 1, 4, 1)
+    for model in (ProcessedFilePF, ProcessedFileESI):
+        records = []
+        for index in range(count):
+            upload_month = (fy_start + timedelta(days=31 * (index % 12))).replace(day=1)
+            records.append(model(
+                user_id=user.id,
+                filename=f"seed_{index}.xlsx",
+                filepath="seed.xlsx,seed.txt",
+                status="success",
+                message="seeded",
+                upload_month=upload_month,
+                upload_date=upload_month,
+                remittance_submitted=True,
+                remittance_month=upload_month,
+                remittance_date=upload_month + timedelta(days=rng.randint(5, 25)),
+                remittance_amount=round(rng.uniform(10000, 500000), 2),
+            ))
+        db.add_all(records)
+    db.commit()
+
+
+async def bench_dashboard(iterations: int, db, user) -> Dict[str, Dict]:
+    from database.models import ProcessedFilePF, ProcessedFileESI
+    from services import dashboard
+
+    calls = {
+        "monthly_amounts": lambda: dashboard.get_monthly_amounts(db, DASHBOARD_YEAR, user),
+        "summary_stats": lambda: dashboard.get_summary_stats(db, DASHBOARD_YEAR, None, user),
+        "submission_timeline_pf": lambda: dashboard.get_submission_timeline_data(db, ProcessedFilePF, DASHBOARD_YEAR, user),
+        "submission_timeline_esi": lambda: dashboard.get_submission_timeline_data(db, ProcessedFileESI, DASHBOARD_YEAR, user),
+        "delayed_submissions": lambda: dashboard.get_delayed_submissions(db, DASHBOARD_YEAR, user),
+        "delayed_submissions_chart": lambda: dashboard.get_delayed_submissions_chart_data(db, DASHBOARD_YEAR, user),
+        "year_list": lambda: dashboard.get_all_years(user, db),
+        "avg_remittance_day": lambda: dashboard.get_avg_remittance_day_by_year(db, DASHBOARD_YEAR - 1, user),
+    }
+
+    results = {}
+    for name, call in calls.items():
+        latencies: List[float] = []
+        for _ in range(iterations):
+            # The dashboard services print debugging output for every row
+            with contextlib.redirect_stdout(io.StringIO()), timed(latencies):
+                await call()
+        results[f"dashboard.{name}"] = {
+            "iterations": iterations,
+            "throughput_ops_per_s": round(iterations / (sum(latencies) / 1000), 1),
+            "latency_ms": summarize_latencies(latencies),
+        }
+    return results
+
+
+async def run(args) -> Dict:
+    workdir = create_workdir()
+    db = open_session()
+    user = create_user(db)
+    results: Dict[str, Dict] = {}
+
+    def wanted(name: str) -> bool:
+        return not args.only or any(name.startswith(prefix) for prefix in args.only)
+
+    from benchmarks.workbook_generator import xls_supported
+
+    for scheme in args.schemes:
+        for file_format in args.formats:
+            if file_format == "xls" and not xls_supported():
+                print("Skipping .xls scenarios: xlwt is not installed")
+                continue
+            for rows in args.rows:
+                name = f"process.{scheme}.{file_format}.{rows}"
+                if not wanted(name):
+                    continue
+                print(f"Running {name}")
+                results[name] = await bench_processing(
+                    scheme, rows, file_format, args.files_per_upload, args.iterations, db, user
+                )
+                results[name]["peak_rss_mb"] = peak_rss_mb()
+
+        name = f"batch_download.{scheme}"
+        if wanted(name):
+            print(f"Running {name}")
+            try:
+                results[name] = await bench_batch_download(scheme, args.iterations, db, user)
+                results[name]["peak_rss_mb"] = peak_rss_mb()
+            except RuntimeError as e:
+                print(f"Skipping {name}: {e}")
+
+    if wanted("dashboard"):
+        print("Running dashboard services")
+        seed_dashboard_records(db, user, args.dashboard_records)
+        for name, result in (await bench_dashboard(args.iterations, db, user)).items():
+            result["peak_rss_mb"] = peak_rss_mb()
+            results[name] = result
+
+    db.close()
+    return {
+        "environment": environment_info(),
+        "parameters": {
+            "rows": args.rows,
+            "formats": args.formats,
+            "schemes": args.schemes,
+            "files_per_upload": args.files_per_upload,
+            "iterations": args.iterations,
+            "dashboard_records": args.dashboard_records,
+            "workdir": str(workdir),
+        },
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--formats", nargs="+", choices=["xlsx", "xls", "csv"], default=["xlsx", "xls", "csv"])
+    parser.add_argument("--schemes", nargs="+", choices=["pf", "esi"], default=["pf", "esi"])
+    parser.add_argument("--files-per-upload", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--dashboard-records", type=int, default=2000)
+    parser.add_argument("--only", nargs="+", help="Run only scenarios whose name starts with one of these prefixes")
+    parser.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Response serialization: FastAPI's response_model path versus core/responses.py.
+
+Two payloads are encoded the way an endpoint would return them:
+
+* listing   - ``List[ProcessedFileResponse]`` built as dicts from ORM rows
+              (dates as ``date`` objects), like GET /pf/processed_files
+* dashboard - a ``SubmissionsDataResponse`` model instance with many bubble
+              points, like GET /dashboard/submissions_data
+
+Paths measured (median ms per response, body size):
+
+* fastapi_json    - validate + serialize against the response_model, json.dumps
+                    (the behaviour before ORJSON became the default)
+* fastapi_orjson  - same, encoded by ORJSONResponse
+* validated_once  - validated_json_response: one validation, pydantic-core
+                    writes the JSON bytes
+* prevalidated    - prevalidated_response on data already dumped by
+                    dump_validated (a dashboard cache hit)
+
+Usage (from Backend/):
+    python -m benchmarks.bench_serialization --rows 20000 --points 20000 -o benchmarks/results/serialization.json
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.common import environment_info, write_report
+
+
+def listing_payload(rows: int) -> List[Dict]:
+    created = datetime(2024, 5, 3, 10, 15, 30, 123456)
+    return [
+        {
+            "id": i,
+            "user_id": i % 40,
+            "filename": f"Branch_{i}_2024_05_01.xlsx",
+            "filepath": f"processed_pf/2024-05-01/20240503_101530_{i:08x}/Branch_{i}_2024_05_01.xlsx,"
+            f"processed_pf/2024-05-01/20240503_101530_{i:08x}/Branch_{i}_2024_05_01.txt",
+            "status": "success",
+            "message": "All files processed successfully.",
+            "upload_date": date(2024, 5, 1),
+            "remittance_submitted": i % 3 != 0,
+            "remittance_date": date(2024, 6, 10) if i % 3 else None,
+            "remittance_challan_path": f"remittance_challans/2024-05-01/PF_Remittance_{i}.pdf" if i % 3 else None,
+            "remittance_amount": 125000.5 + i if i % 3 else None,
+            "created_at": created + timedelta(seconds=i),
+            "remittance_month": date(2024, 5, 1) if i % 3 else None,
+            "updated_at": None,
+            "source_folder": f"Branch_{i}",
+            "processed_files_count": 3,
+            "success_files_count": 3,
+            "excel_file_url": f"processed_pf/2024-05-01/Branch_{i}.xlsx",
+            "text_file_url": f"processed_pf/2024-05-01/Branch_{i}.txt",
+        }
+        for i in range(rows)
+    ]
+
+
+def dashboard_payload(points: int):
+    from schemas.dashboard import DelayedData, DelayedSubmission, SubmissionData, SubmissionPoint, SubmissionsDataResponse
+
+    labels = ["Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec", "Jan", "Feb", "Mar"]
+    per_month = max(points // len(labels), 1)
+
+    def timeline(offset: int) -> SubmissionData:
+        return SubmissionData(
+            labels=labels,
+            points=[
+                [SubmissionPoint(x=month, y=float((i * 7 + offset) % 31), r=5 + i % 4) for i in range(per_month)]
+                for month in range(len(labels))
+            ],
+        )
+
+    delayed = DelayedData(
+        labels=labels,
+        datasets={
+            scheme: [[DelayedSubmission(delay_days=i % 20) for i in range(per_month)] for _ in labels]
+            for scheme in ("PF", "ESI")
+        },
+    )
+    return SubmissionsDataResponse(pf_submissions=timeline(0), esi_submissions=timeline(3), delayed_submissions=delayed, year=2024)
+
+
+def _fastapi_path(annotation, response_class) -> Callable:
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+
+    field = create_model_field(name="Response", type_=annotation, mode="serialization")
+
+    def run(content):
+        data = asyncio.run(serialize_response(field=field, response_content=content))
+        return response_class(data).body
+
+    return run
+
+
+def paths(annotation) -> Dict[str, Callable]:
+    from fastapi.responses import JSONResponse, ORJSONResponse
+
+    from core.responses import dump_validated, prevalidated_response, validated_json_response
+
+    return {
+        "fastapi_json": _fastapi_path(annotation, JSONResponse),
+        "fastapi_orjson": _fastapi_path(annotation, ORJSONResponse),
+        "validated_once": lambda content: validated_json_response(content, annotation).body,
+        # Dumped outside the timed call, as it is when a cached payload is served
+        "prevalidated": lambda dumped: prevalidated_response(dumped).body,
+        "_dump": lambda content: dump_validated(content, annotation),
+    }
+
+
+def _measure(run: Callable, content, iterations: int) -> Dict:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        body = run(content)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(timings), 2), "min_ms": round(min(timings), 2), "bytes": len(body)}
+
+
+def bench_payload(annotation, content, iterations: int) -> Dict:
+    runs = paths(annotation)
+    dumped = runs.pop("_dump")(content)
+    results = {
+        name: _measure(run, dumped if name == "prevalidated" else content, iterations) for name, run in runs.items()
+    }
+    baseline = results["fastapi_json"]["median_ms"]
+    for name in ("fastapi_orjson", "validated_once", "prevalidated"):
+        results[name]["speedup"] = round(baseline / results[name]["median_ms"], 1)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="Processed-file records in the listing")
+    parser.add_argument("--points", type=int, default=20000, help="Bubble points per timeline in the dashboard payload")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args(argv)
+
+    from schemas.dashboard import SubmissionsDataResponse
+    from schemas.response import ProcessedFileResponse
+
+    report = {"environment": environment_info(), "rows": args.rows, "points": args.points, "scenarios": {}}
+    report["scenarios"]["listing"] = bench_payload(List[ProcessedFileResponse], listing_payload(args.rows), args.iterations)
+    report["scenarios"]["dashboard"] = bench_payload(SubmissionsDataResponse, dashboard_payload(args.points), args.iterations)
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
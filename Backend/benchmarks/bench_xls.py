@@ -0,0 +1,91 @@
+"""Legacy .xls ingestion: pandas ``engine="xlrd"`` versus the projected xlrd reader.
+
+Both paths read the same synthetic workbook and run the scheme's sheet
+conversion (header resolution + contribution columns), so the comparison covers
+everything up to the combined frame. Reports wall time per iteration and the
+peak memory traced by tracemalloc during one run of each path.
+
+Usage (from Backend/, needs xlwt to generate .xls files):
+    python -m benchmarks.bench_xls --rows 50000 --iterations 3 -o benchmarks/results/xls_50k.json
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.common import environment_info, write_report
+from benchmarks.workbook_generator import generate_workbook, xls_supported
+
+
+def _paths(scheme: str) -> Dict[str, Callable[[bytes], object]]:
+    import pandas as pd
+
+    from services.column_resolver import DEFAULT_ALIASES
+    from services.payroll_reader import read_xls_projected
+
+    if scheme == "pf":
+        from services.pf import ID_DTYPES, build_pf_frame as build
+    else:
+        from services.esi import ID_DTYPES, build_esi_frame as build
+    registry = ((), DEFAULT_ALIASES[scheme])
+
+    def pandas_xlrd(content: bytes):
+        sheets = pd.read_excel(BytesIO(content), engine="xlrd", dtype=ID_DTYPES, sheet_name=None)
+        return [build(registry, df) for df in sheets.values()]
+
+    def projected(content: bytes):
+        sheets = read_xls_projected(content, registry[1])
+        return [build(registry, df) for df in sheets.values()]
+
+    return {"pandas_xlrd": pandas_xlrd, "projected_xlrd": projected}
+
+
+def _measure(run: Callable[[bytes], object], content: bytes, iterations: int) -> Dict:
+    timings: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        frames = run(content)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    run(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows_out": sum(len(frame) for frame in frames),
+        "wall_ms": {
+            "median": round(statistics.median(timings), 1),
+            "min": round(min(timings), 1),
+            "max": round(max(timings), 1),
+        },
+        "traced_peak_mb": round(peak / (1024 * 1024), 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--schemes", nargs="+", choices=["pf", "esi"], default=["pf", "esi"])
+    parser.add_argument("--junk-columns", type=int, default=6, help="Extra columns the projection can skip")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args(argv)
+
+    if not xls_supported():
+        parser.error("generating .xls workbooks needs xlwt (pip install xlwt)")
+
+    report = {"environment": environment_info(), "rows": args.rows, "scenarios": {}}
+    for scheme in args.schemes:
+        content = generate_workbook(scheme, args.rows, "xls", junk_columns=args.junk_columns)
+        results = {name: _measure(run, content, args.iterations) for name, run in _paths(scheme).items()}
+        baseline = results["pandas_xlrd"]["wall_ms"]["median"]
+        results["speedup"] = round(baseline / results["projected_xlrd"]["wall_ms"]["median"], 2)
+        results["file_mb"] = round(len(content) / (1024 * 1024), 2)
+        report["scenarios"][scheme] = results
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Shared helpers for the benchmark scripts.
+
+The API modules import each other as top-level packages (``core``, ``services``,
+``database``...), so the benchmarks put ``Backend/app`` on ``sys.path`` and run
+everything inside a throwaway working directory with its own SQLite database.
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+APP_DIR = BACKEND_DIR / "app"
+
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+
+def create_workdir(prefix: str = "lcs_bench_") -> Path:
+    """Create a temp directory, chdir into it and point the app at a SQLite DB inside it.
+
+    Must be called before anything imports ``database.session``.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix=prefix))
+    os.chdir(workdir)
+    from core.config import settings
+
+    settings.DATABASE_URL = f"sqlite:///{workdir / 'bench.db'}"
+    return workdir
+
+
+def open_session():
+    from database.base import Base
+    from database.session import SessionLocal, engine
+    import database.models  # noqa: F401 - registers the tables on Base
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal()
+
+
+def create_user(db, username: str = "bench_admin", role: str = "admin"):
+    from database.models import UserModel
+
+    user = db.query(UserModel).filter(UserModel.username == username).first()
+    if user:
+        return user
+    user = UserModel(
+        username=username,
+        hashed_password="not-used",
+        email=f"{username}@bench.example.com",
+        full_name=username,
+        role=role,
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB"""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux and bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def summarize_latencies(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "min": round(min(latencies_ms), 3),
+        "mean": round(statistics.fmean(latencies_ms), 3),
+        "p50": round(percentile(latencies_ms, 50), 3),
+        "p90": round(percentile(latencies_ms, 90), 3),
+        "p95": round(percentile(latencies_ms, 95), 3),
+        "p99": round(percentile(latencies_ms, 99), 3),
+        "max": round(max(latencies_ms), 3),
+    }
+
+
+@contextmanager
+def timed(latencies_ms: List[float]):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+
+def environment_info() -> Dict[str, str]:
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": str(os.cpu_count()),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+    for module in ("pandas", "openpyxl", "xlrd", "sqlalchemy", "fastapi"):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            info[module] = "unavailable"
+    return info
+
+
+def write_report(report: Dict, output: Optional[str]) -> None:
+    text = json.dumps(report, indent=2, default=str)
+    if output:
+        Path(output).write_text(text)
+        print(f"Report written to {output}")
+    else:
+        print(text)
@@ -0,0 +1,127 @@
+"""Minimal asyncio HTTP/1.1 client used by the load test.
+
+Only the standard library is used so the harness runs anywhere the API does.
+It supports keep-alive connection pooling, Content-Length and chunked response
+bodies, and urlencoded / multipart request bodies - enough for this API.
+"""
+import asyncio
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+
+class HTTPResponse:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def encode_form(fields: Dict[str, str]) -> Tuple[bytes, str]:
+    return urlencode(fields).encode(), "application/x-www-form-urlencoded"
+
+
+def encode_multipart(fields: Dict[str, str], files: List[Tuple[str, str, bytes]]) -> Tuple[bytes, str]:
+    """files is a list of (field name, filename, content)"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, filename, content in files:
+        parts.append(
+            (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f"Content-Type: application/octet-stream\r\n\r\n"
+            ).encode()
+            + content
+            + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class AsyncHTTPClient:
+    def __init__(self, host: str, port: int, pool_size: int = 64, timeout: float = 120.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _connect(self):
+        if self._idle:
+            return self._idle.pop()
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+        content_type: Optional[str] = None,
+    ) -> HTTPResponse:
+        async with self._slots:
+            reader, writer = await self._connect()
+            try:
+                response, keep_alive = await asyncio.wait_for(
+                    self._roundtrip(reader, writer, method, path, headers or {}, body, content_type),
+                    self.timeout,
+                )
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return response
+
+    async def _roundtrip(self, reader, writer, method, path, headers, body, content_type):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            response_headers[key.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            response_body = b"".join(chunks)
+        elif "content-length" in response_headers:
+            response_body = await reader.readexactly(int(response_headers["content-length"]))
+        else:
+            response_body = await reader.read()
+
+        keep_alive = response_headers.get("connection", "").lower() != "close"
+        return HTTPResponse(status, response_headers, response_body), keep_alive
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
@@ -0,0 +1,144 @@
+"""Cold start report for the API process.
+
+Runs ``python -X importtime -c "import main"`` in fresh interpreters and
+summarizes total import time, the slowest top-level packages, and which heavy
+processing dependencies ended up loaded at startup. It then launches the app
+with uvicorn and measures time-to-first-request (process spawn until the first
+successful HTTP response).
+
+Usage (from Backend/):
+    python -m benchmarks.importtime --runs 5 -o benchmarks/results/importtime.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from benchmarks.common import APP_DIR, environment_info, write_report
+
+# Packages that only the PF / ESI processing paths need
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "xlrd", "filetype", "passlib", "pyarrow")
+
+
+def _parse_importtime(stderr: str) -> Dict[str, Dict[str, int]]:
+    """Return {module: {"self_us", "cumulative_us"}} for every import in the log"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2]
+        modules[name.strip()] = {
+            "self_us": self_us,
+            "cumulative_us": cumulative_us,
+            "depth": (len(name) - len(name.lstrip())) // 2,
+        }
+    return modules
+
+
+def measure_imports(runs: int) -> Dict:
+    probe = (
+        "import sys, json; import main; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    totals: List[float] = []
+    by_package: Dict[str, List[int]] = defaultdict(list)
+    loaded: List[str] = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", probe],
+            cwd=str(APP_DIR),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        modules = _parse_importtime(completed.stderr)
+        totals.append(modules["main"]["cumulative_us"] / 1000)
+        package_totals: Dict[str, int] = defaultdict(int)
+        for name, info in modules.items():
+            package_totals[name.split(".")[0]] += info["self_us"]
+        for package, self_us in package_totals.items():
+            by_package[package].append(self_us)
+        loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    slowest = sorted(
+        ((package, statistics.median(values) / 1000) for package, values in by_package.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:15]
+    return {
+        "import_main_ms": {
+            "median": round(statistics.median(totals), 1),
+            "min": round(min(totals), 1),
+            "max": round(max(totals), 1),
+        },
+        "slowest_packages_ms": {package: round(ms, 1) for package, ms in slowest},
+        "heavy_modules_loaded_at_startup": loaded,
+    }
+
+
+async def _time_to_first_request(port: int) -> float:
+    from benchmarks.http_client import AsyncHTTPClient
+    from benchmarks.load_test import launch_server
+
+    start = time.perf_counter()
+    server = launch_server(port)
+    client = AsyncHTTPClient("127.0.0.1", port)
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                response = await client.request("GET", "/auth/users/me")
+                # 401 is fine: the app answered a routed request
+                if response.status in (200, 401):
+                    return time.perf_counter() - start
+            except OSError:
+                pass
+            await asyncio.sleep(0.02)
+        raise RuntimeError("API did not answer within 60s")
+    finally:
+        await client.close()
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def measure_first_request(runs: int) -> Dict:
+    from benchmarks.load_test import free_port
+
+    samples = [asyncio.run(_time_to_first_request(free_port())) * 1000 for _ in range(runs)]
+    return {
+        "median": round(statistics.median(samples), 1),
+        "min": round(min(samples), 1),
+        "max": round(max(samples), 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--label", default="current", help="Key to store this measurement under")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure imports")
+    parser.add_argument("-o", "--output", help="JSON file to write; an existing file keeps its other labels")
+    args = parser.parse_args(argv)
+
+    measurement = {"environment": environment_info(), "imports": measure_imports(args.runs)}
+    if not args.skip_server:
+        measurement["time_to_first_request_ms"] = measure_first_request(args.runs)
+
+    report = {}
+    if args.output:
+        try:
+            with open(args.output) as f:
+                report = json.load(f)
+        except FileNotFoundError:
+            pass
+    report[args.label] = measurement
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""HTTP load test against a locally launched API instance.
+
+Starts the app with uvicorn in a temp directory (temp SQLite DB), seeds an admin
+and a few HR users, then runs virtual users that pick actions by weight:
+logins, concurrent PF / ESI folder uploads, listing calls and dashboard bundles
+(the three requests the dashboard page issues together). The report has
+per-endpoint throughput and tail latency.
+
+Usage (from Backend/):
+    python -m benchmarks.load_test --duration 60 --concurrency 20 -o run_a.json
+    python -m benchmarks.load_test --workers 4 --duration 60 --concurrency 20 -o run_b.json
+    python -m benchmarks.load_test --url http://127.0.0.1:7056 --duration 30 -o run_c.json
+    python -m benchmarks.load_test --compare run_a.json run_b.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlparse
+
+from benchmarks.common import BACKEND_DIR, environment_info, summarize_latencies, write_report
+from benchmarks.http_client import AsyncHTTPClient, encode_form, encode_multipart
+
+UPLOAD_MONTH = "2024-05-01"
+DEFAULT_MIX = "login=1,upload_pf=1,upload_esi=1,list_pf=3,list_esi=3,dashboard=4"
+PASSWORD = "loadtest123"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def timed(self, key: str, coro):
+        start = time.perf_counter()
+        try:
+            response = await coro
+        except Exception:
+            self.errors[key] += 1
+            self.latencies[key].append((time.perf_counter() - start) * 1000)
+            return None
+        self.latencies[key].append((time.perf_counter() - start) * 1000)
+        if response.status >= 400:
+            self.errors[key] += 1
+        return response
+
+    def report(self, elapsed_s: float) -> Dict[str, Dict]:
+        endpoints = {}
+        for key, values in sorted(self.latencies.items()):
+            endpoints[key] = {
+                "count": len(values),
+                "errors": self.errors.get(key, 0),
+                "throughput_rps": round(len(values) / elapsed_s, 2),
+                "latency_ms": summarize_latencies(values),
+            }
+        return endpoints
+
+
+class LoadScenario:
+    def __init__(self, client: AsyncHTTPClient, recorder: Recorder, args):
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.tokens: Dict[str, str] = {}
+        self.pf_payloads: List[bytes] = []
+        self.esi_payloads: List[bytes] = []
+
+    def _auth(self, username: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[username]}"}
+
+    async def login(self, username: str):
+        body, content_type = encode_form({"username": username, "password": PASSWORD})
+        response = await self.recorder.timed(
+            "POST /auth/login", self.client.request("POST", "/auth/login", body=body, content_type=content_type)
+        )
+        if response is not None and response.status == 200:
+            self.tokens[username] = response.json()["access_token"]
+
+    async def upload(self, scheme: str, username: str):
+        payloads = self.pf_payloads if scheme == "pf" else self.esi_payloads
+        files = [("files", f"branch_{i + 1}.xlsx", content) for i, content in enumerate(payloads)]
+        body, content_type = encode_multipart(
+            {"folder_name": f"Load {username}", "upload_month": UPLOAD_MONTH}, files
+        )
+        return await self.recorder.timed(
+            f"POST /{scheme}/process_folder",
+            self.client.request(
+                "POST", f"/{scheme}/process_folder", self._auth(username), body, content_type
+            ),
+        )
+
+    async def listing(self, scheme: str, username: str):
+        query = urlencode({"upload_month": UPLOAD_MONTH})
+        return await self.recorder.timed(
+            f"GET /{scheme}/processed_files",
+            self.client.request("GET", f"/{scheme}/processed_files?{query}", self._auth(username)),
+        )
+
+    async def dashboard_bundle(self, username: str):
+        year = self.args.dashboard_year
+        paths = [
+            f"/dashboard/summary_stats?year={year}",
+            f"/dashboard/submissions_data?year={year}",
+            "/dashboard/year_list",
+        ]
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            self.recorder.timed(f"GET {path.split('?')[0]}", self.client.request("GET", path, self._auth(username)))
+            for path in paths
+        ])
+        self.recorder.latencies["dashboard bundle"].append((time.perf_counter() - start) * 1000)
+
+    async def setup(self):
+        from benchmarks.workbook_generator import generate_workbook
+
+        self.pf_payloads = [generate_workbook("pf", self.args.rows, seed=i) for i in range(self.args.files_per_upload)]
+        self.esi_payloads = [generate_workbook("esi", self.args.rows, seed=i) for i in range(self.args.files_per_upload)]
+
+        usernames = ["load_admin"] + [f"load_hr_{i}" for i in range(self.args.users)]
+        for username in usernames:
+            await self.client.request(
+                "POST",
+                "/auth/register",
+                body=json.dumps({
+                    "username": username,
+                    "email": f"{username}@loadtest.example.com",
+                    "password": PASSWORD,
+                    "full_name": username,
+                    "role": "hr",
+                }).encode(),
+                content_type="application/json",
+            )
+            await self.login(username)
+        missing = [u for u in usernames if u not in self.tokens]
+        if missing:
+            raise RuntimeError(f"Could not log in seeded users: {missing}")
+
+        # Give every HR user one processed month with a submitted remittance so the
+        # listing and dashboard endpoints have data to work with.
+        for username in usernames[1:]:
+            for scheme in ("pf", "esi"):
+                await self.upload(scheme, username)
+                listing = await self.listing(scheme, username)
+                if listing is None or listing.status != 200 or not listing.json():
+                    continue
+                file_id = listing.json()[0]["id"]
+                body, content_type = encode_multipart(
+                    {"remittance_date": "2024-06-12", "remittance_amount": "125000"},
+                    [("remittance_file", "challan.pdf", b"%PDF-1.4 load test challan")],
+                )
+                await self.client.request(
+                    "POST",
+                    f"/{scheme}/processed_files/{file_id}/submit_remittance",
+                    self._auth(username),
+                    body,
+                    content_type,
+                )
+        self.recorder.latencies.clear()
+        self.recorder.errors.clear()
+
+    async def virtual_user(self, index: int, deadline: float, weights: Dict[str, float]):
+        rng = random.Random(index)
+        username = f"load_hr_{index % self.args.users}"
+        actions = list(weights)
+        action_weights = [weights[a] for a in actions]
+        while time.perf_counter() < deadline:
+            action = rng.choices(actions, action_weights)[0]
+            if action == "login":
+                await self.login(username)
+            elif action in ("upload_pf", "upload_esi"):
+                await self.upload(action.split("_")[1], username)
+            elif action in ("list_pf", "list_esi"):
+                await self.listing(action.split("_")[1], username)
+            elif action == "dashboard":
+                await self.dashboard_bundle(username)
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight)
+    unknown = set(weights) - {"login", "upload_pf", "upload_esi", "list_pf", "list_esi", "dashboard"}
+    if unknown:
+        raise SystemExit(f"Unknown actions in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch_server(port: int, workers: int = 1) -> subprocess.Popen:
+    workdir = tempfile.mkdtemp(prefix="lcs_load_")
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.serve_local",
+            "--workdir", workdir, "--port", str(port), "--workers", str(workers),
+        ],
+        cwd=str(BACKEND_DIR),
+        # The dashboard services print per-row debugging output; keep it out of the report
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_ready(client: AsyncHTTPClient, timeout: float = 60.0) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            response = await client.request("GET", "/openapi.json")
+            if response.status == 200:
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("API did not become ready in time")
+
+
+async def run(args) -> Dict:
+    weights = parse_mix(args.mix)
+    server = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = launch_server(port, args.workers)
+
+    client = AsyncHTTPClient(host, port, pool_size=args.concurrency * 3)
+    recorder = Recorder()
+    try:
+        ready_s = await wait_until_ready(client)
+        scenario = LoadScenario(client, recorder, args)
+        await scenario.setup()
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*[
+            scenario.virtual_user(i, deadline, weights) for i in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.close()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    endpoints = recorder.report(elapsed)
+    total = sum(e["count"] for k, e in endpoints.items() if k != "dashboard bundle")
+    return {
+        "environment": environment_info(),
+        "parameters": {
+            "url": args.url or f"local uvicorn on port {port}",
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "users": args.users,
+            "rows": args.rows,
+            "files_per_upload": args.files_per_upload,
+            "mix": weights,
+        },
+        "server_ready_s": round(ready_s, 3),
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": total,
+        "total_throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare_reports(base_path: str, new_path: str) -> None:
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    header = f"{'endpoint':<36}{'rps':>22}{'p95 ms':>26}{'p99 ms':>26}{'errors':>12}"
+    print(header)
+    print("-" * len(header))
+    for key in sorted(set(base["endpoints"]) | set(new["endpoints"])):
+        b = base["endpoints"].get(key)
+        n = new["endpoints"].get(key)
+        if not b or not n:
+            print(f"{key:<36}{'only in ' + ('new' if n else 'base'):>22}")
+            continue
+        row = f"{key:<36}"
+        row += f"{b['throughput_rps']:>7} -> {n['throughput_rps']:<6} {_change(b['throughput_rps'], n['throughput_rps']):>6}"
+        for pct in ("p95", "p99"):
+            bv, nv = b["latency_ms"][pct], n["latency_ms"][pct]
+            row += f"{bv:>9.1f} -> {nv:<8.1f} {_change(bv, nv):>6}"
+        row += f"{b['errors']:>6} -> {n['errors']}"
+        print(row)
+    print(f"\nTotal throughput: {base['total_throughput_rps']} -> {new['total_throughput_rps']} rps "
+          f"({_change(base['total_throughput_rps'], new['total_throughput_rps'])})")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target an already running instance instead of launching one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the launched instance")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of measured load")
+    parser.add_argument("--concurrency", type=int, default=10, help="Number of virtual users")
+    parser.add_argument("--users", type=int, default=5, help="Number of HR accounts to spread load over")
+    parser.add_argument("--rows", type=int, default=500, help="Rows per uploaded workbook")
+    parser.add_argument("--files-per-upload", type=int, default=2)
+    parser.add_argument("--dashboard-year", type=int, default=2025)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Action weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two saved reports and exit")
+    parser.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    report = asyncio.run(run(args))
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
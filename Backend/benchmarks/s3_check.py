@@ -0,0 +1,179 @@
+"""End-to-end check of the s3 storage backend against a real S3 API.
+
+Starts a moto server (``pip install "moto[server]"``) on a free port, or uses
+an already running S3-compatible service given with --endpoint (MinIO, see the
+README), and drives the API in-process with STORAGE_BACKEND=s3:
+
+- a PF upload lands its outputs in the bucket under S3_PREFIX
+- with the node-local cache wiped, listing and downloads still work, and the
+  presigned URL serves the stored bytes
+- a challan above S3_MULTIPART_THRESHOLD_MB is uploaded in parts
+- with presigning off, the API streams the file itself and answers a
+  conditional GET with 304
+- a key deleted by another node (a second S3Storage) is seen as missing at once
+
+Each check prints "ok"; the first failure stops the run with exit code 1.
+
+Usage (from Backend/):
+    python -m benchmarks.s3_check
+    python -m benchmarks.s3_check --endpoint http://127.0.0.1:9000 --access-key minioadmin --secret-key minioadmin
+"""
+import argparse
+import io
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import List, Optional
+
+PDF_HEADER = b"%PDF-1.4\n"
+UPLOAD_MONTH = "2024-05-01"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_moto(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('moto server exited; install it with pip install "moto[server]"')
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("moto server did not start")
+
+
+def _check(name: str, condition: bool, detail: str = "") -> None:
+    if not condition:
+        raise AssertionError(f"{name} {detail}".strip())
+    print(f"ok  {name}")
+
+
+def run_checks(endpoint: str, bucket: str, access_key: str, secret_key: str) -> None:
+    # Settings are read at import time, so the environment comes first
+    os.environ.update(
+        STORAGE_BACKEND="s3",
+        S3_BUCKET=bucket,
+        S3_PREFIX="s3check",
+        S3_ENDPOINT_URL=endpoint,
+        S3_ACCESS_KEY_ID=access_key,
+        S3_SECRET_ACCESS_KEY=secret_key,
+        S3_MULTIPART_THRESHOLD_MB="5",
+        S3_MULTIPART_CHUNK_MB="5",
+        # The test challan is random bytes, not a parseable PDF
+        CHALLAN_PARSING="false",
+    )
+    from benchmarks.common import create_user, create_workdir, open_session
+    from benchmarks.workbook_generator import generate_workbook
+
+    create_workdir(prefix="lcs_s3_")
+    from fastapi.testclient import TestClient
+
+    from core.config import settings
+    from core.security import create_access_token
+    from main import app
+    from services.storage import S3Storage, get_storage
+
+    db = open_session()
+    user = create_user(db)
+    storage = get_storage()
+    s3 = storage.client
+    try:
+        s3.create_bucket(Bucket=bucket)
+    except s3.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': user.username})}"
+
+    response = client.post(
+        "/pf/process_folder",
+        files=[("files", ("branch_1.xlsx", generate_workbook("pf", 200), "application/octet-stream"))],
+        data={"folder_name": "S3 check", "upload_month": UPLOAD_MONTH},
+    )
+    _check("upload", response.status_code == 200 and response.json()["status"] == "success", response.text[:300])
+    file_id = response.json()["file_id"]
+    listed = s3.list_objects_v2(Bucket=bucket, Prefix="s3check/processed_pf/")
+    keys = [item["Key"] for item in listed.get("Contents", [])]
+    _check("outputs in bucket", any(key.endswith(".xlsx") for key in keys) and any(key.endswith(".txt") for key in keys), str(keys))
+
+    shutil.rmtree(settings.STORAGE_CACHE_DIR, ignore_errors=True)
+    response = client.get("/pf/processed_files", params={"upload_month": UPLOAD_MONTH})
+    _check("listing without local cache", response.status_code == 200 and len(response.json()) == 1, response.text[:300])
+    response = client.get(f"/pf/processed_files/{file_id}/download", params={"file_type": "txt"}, follow_redirects=False)
+    _check("presigned redirect", response.status_code in (302, 307), str(response.status_code))
+    with urllib.request.urlopen(response.headers["location"]) as presigned:
+        body = presigned.read()
+    text_key = next(key for key in keys if key.endswith(".txt"))
+    _check("presigned content", body == s3.get_object(Bucket=bucket, Key=text_key)["Body"].read())
+
+    challan = PDF_HEADER + os.urandom(12 * 1024 * 1024)
+    response = client.post(
+        f"/pf/processed_files/{file_id}/submit_remittance",
+        data={"remittance_date": "2024-06-10", "remittance_amount": "100"},
+        files={"remittance_file": ("challan.pdf", io.BytesIO(challan), "application/pdf")},
+    )
+    _check("challan upload", response.status_code == 200, response.text[:300])
+    challan_key = response.json()["details"]["challan_path"]
+    head = s3.head_object(Bucket=bucket, Key=f"s3check/{challan_key}")
+    _check("multipart upload", "-" in head["ETag"] and head["ContentLength"] == len(challan), head["ETag"])
+
+    settings.S3_PRESIGN_EXPIRES_S = 0
+    shutil.rmtree(settings.STORAGE_CACHE_DIR, ignore_errors=True)
+    response = client.get(f"/pf/processed_files/{file_id}/remittance_challan")
+    _check("proxied download", response.status_code == 200 and response.content == challan, str(response.status_code))
+    response = client.get(
+        f"/pf/processed_files/{file_id}/remittance_challan", headers={"If-None-Match": response.headers["etag"]}
+    )
+    _check("conditional GET", response.status_code == 304, str(response.status_code))
+
+    _check("challan exists", storage.exists(challan_key))
+    S3Storage().delete(challan_key)
+    _check("delete seen by other node", not storage.exists(challan_key))
+    response = client.get(f"/pf/processed_files/{file_id}/remittance_challan")
+    _check("deleted challan not served", response.status_code == 404, str(response.status_code))
+    db.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", help="S3 endpoint to use instead of starting a moto server")
+    parser.add_argument("--bucket", default="lcs-s3-check")
+    parser.add_argument("--access-key", default="testing")
+    parser.add_argument("--secret-key", default="testing")
+    args = parser.parse_args(argv)
+
+    server = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        port = _free_port()
+        server = _start_moto(port)
+        endpoint = f"http://127.0.0.1:{port}"
+    try:
+        run_checks(endpoint, args.bucket, args.access_key, args.secret_key)
+    except AssertionError as e:
+        print(f"FAIL {e}")
+        sys.exit(1)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
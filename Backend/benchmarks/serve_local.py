@@ -0,0 +1,48 @@
+"""Run the API with uvicorn inside a throwaway working directory.
+
+Outputs and the SQLite database land in --workdir, so load tests never touch the
+real database or the processed_* folders.
+
+    python -m benchmarks.serve_local --workdir /tmp/lcs_load --port 8765 --workers 4
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from benchmarks.common import APP_DIR
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workdir", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    # Worker processes re-import the settings, so configure them through the environment
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir.resolve() / 'load_test.db'}"
+
+    import uvicorn
+    from main import app, create_tables
+
+    if args.workers > 1:
+        create_tables()
+        uvicorn.run(
+            "main:app",
+            app_dir=str(APP_DIR),
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level="warning",
+        )
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
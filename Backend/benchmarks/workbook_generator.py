@@ -0,0 +1,162 @@
+"""Synthetic PF / ESI payroll workbook generator.
+
+Header names are drawn from the alias lists the services accept, so generated
+files exercise the same column resolution real client templates go through.
+Junk columns, dashed UANs and zero-ESI rows are mixed in the way they show up
+in customer files.
+
+Usage:
+    python -m benchmarks.workbook_generator --scheme pf --rows 10000 --format xlsx -o out/
+"""
+import argparse
+import random
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.common import APP_DIR  # noqa: F401 - puts the app on sys.path
+
+import pandas as pd
+
+from services.pf import PF_REQUIRED_COLUMNS
+from services.esi import ESI_REQUIRED_COLUMNS
+
+FIRST_NAMES = ["Arun", "Priya", "Karthik", "Divya", "Suresh", "Lakshmi", "Vignesh", "Meena", "Rahul", "Anitha"]
+LAST_NAMES = ["Kumar", "Raj", "Subramaniam", "Devi", "Krishnan", "Nair", "Iyer", "Reddy", "Sharma", "Pillai"]
+JUNK_COLUMNS = {
+    "Department": lambda rng: rng.choice(["Production", "Stores", "Admin", "Quality", "Maintenance"]),
+    "Designation": lambda rng: rng.choice(["Operator", "Helper", "Supervisor", "Executive"]),
+    "Bank A/c No": lambda rng: str(rng.randint(10**10, 10**11 - 1)),
+    "Basic": lambda rng: rng.randint(8000, 30000),
+    "HRA": lambda rng: rng.randint(1000, 8000),
+    "Remarks": lambda rng: rng.choice(["", "", "", "Joined mid-month", "On notice"]),
+}
+SUPPORTED_FORMATS = ("xlsx", "xls", "csv")
+
+
+def _pick_headers(required: Dict[str, List[str]], rng: random.Random) -> Dict[str, str]:
+    return {field: rng.choice(aliases) for field, aliases in required.items()}
+
+
+def _employee_name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def generate_pf_frame(rows: int, seed: int = 0, junk_columns: int = 3) -> pd.DataFrame:
+    rng = random.Random(seed)
+    headers = _pick_headers(PF_REQUIRED_COLUMNS, rng)
+    data = {headers[field]: [] for field in PF_REQUIRED_COLUMNS}
+    junk = rng.sample(list(JUNK_COLUMNS), min(junk_columns, len(JUNK_COLUMNS)))
+    for column in junk:
+        data[column] = []
+
+    for i in range(rows):
+        uan = str(100000000000 + seed * 1_000_000 + i)
+        if rng.random() < 0.1:
+            uan = f"{uan[:4]}-{uan[4:8]}-{uan[8:]}"
+        gross = rng.randint(9000, 85000)
+        epf_wages = min(gross, rng.choice([15000, gross, int(gross * 0.6)]))
+        data[headers["UAN No"]].append(uan)
+        data[headers["Employee Name"]].append(_employee_name(rng))
+        data[headers["Gross Wages"]].append(gross + rng.choice([0, 0.25, 0.5, 0.75]))
+        data[headers["EPF Wages"]].append(epf_wages)
+        data[headers["LOP Days"]].append(rng.choice([0, 0, 0, 0.5, 1, 1.5, 2, 3]))
+        for column in junk:
+            data[column].append(JUNK_COLUMNS[column](rng))
+
+    return pd.DataFrame(data)
+
+
+def generate_esi_frame(rows: int, seed: int = 0, junk_columns: int = 3) -> pd.DataFrame:
+    rng = random.Random(seed)
+    headers = _pick_headers(ESI_REQUIRED_COLUMNS, rng)
+    data = {headers[field]: [] for field in ESI_REQUIRED_COLUMNS}
+    junk = rng.sample(list(JUNK_COLUMNS), min(junk_columns, len(JUNK_COLUMNS)))
+    for column in junk:
+        data[column] = []
+
+    for i in range(rows):
+        # Roughly 5% of employees are above the ESI ceiling and carry a zero ESI number
+        exempt = rng.random() < 0.05
+        data[headers["ESI No"]].append("0" if exempt else str(1100000000 + seed * 1_000_000 + i))
+        data[headers["Employee Name"]].append(_employee_name(rng))
+        data[headers["ESI Gross"]].append(0 if exempt else rng.randint(8000, 21000))
+        data[headers["Worked Days"]].append(rng.choice([26, 26, 26, 25.5, 24, 22, 30, 31]))
+        for column in junk:
+            data[column].append(JUNK_COLUMNS[column](rng))
+
+    return pd.DataFrame(data)
+
+
+def frame_to_workbook(df: pd.DataFrame, file_format: str = "xlsx", sheet_name: str = "Sheet1") -> bytes:
+    buffer = BytesIO()
+    if file_format == "xlsx":
+        df.to_excel(buffer, index=False, sheet_name=sheet_name, engine="openpyxl")
+    elif file_format == "xls":
+        _write_xls(df, buffer, sheet_name)
+    elif file_format == "csv":
+        buffer.write(df.to_csv(index=False).encode("utf-8"))
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+    return buffer.getvalue()
+
+
+def _write_xls(df: pd.DataFrame, buffer: BytesIO, sheet_name: str) -> None:
+    # pandas dropped .xls writing, so legacy workbooks are produced with xlwt directly
+    try:
+        import xlwt
+    except ImportError:
+        raise RuntimeError("Generating .xls workbooks requires xlwt (pip install xlwt)")
+    if len(df) > 65535:
+        raise ValueError(".xls workbooks are limited to 65535 data rows")
+
+    book = xlwt.Workbook()
+    sheet = book.add_sheet(sheet_name)
+    for col_idx, column in enumerate(df.columns):
+        sheet.write(0, col_idx, str(column))
+    for row_idx, row in enumerate(df.itertuples(index=False), start=1):
+        for col_idx, value in enumerate(row):
+            sheet.write(row_idx, col_idx, value.item() if hasattr(value, "item") else value)
+    book.save(buffer)
+
+
+def xls_supported() -> bool:
+    try:
+        import xlwt  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def generate_workbook(scheme: str, rows: int, file_format: str = "xlsx", seed: int = 0, junk_columns: int = 3) -> bytes:
+    if scheme == "pf":
+        df = generate_pf_frame(rows, seed, junk_columns)
+    elif scheme == "esi":
+        df = generate_esi_frame(rows, seed, junk_columns)
+    else:
+        raise ValueError(f"Unknown scheme: {scheme}")
+    return frame_to_workbook(df, file_format)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scheme", choices=["pf", "esi"], default="pf")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--files", type=int, default=1, help="Number of workbooks to generate")
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, default="xlsx")
+    parser.add_argument("--junk-columns", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output-dir", default=".")
+    args = parser.parse_args(argv)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for index in range(args.files):
+        content = generate_workbook(args.scheme, args.rows, args.format, args.seed + index, args.junk_columns)
+        target = output_dir / f"{args.scheme}_{args.rows}_{index + 1}.{args.format}"
+        target.write_bytes(content)
+        print(f"Wrote {target} ({len(content)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
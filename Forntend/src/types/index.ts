@@ -25,7 +25,7 @@ export interface ProcessedFile {
   id: number;
   user_id: number;
   filename: string;
-  filepath: string;
+  filepath: string | null;
   status: string;
   message: string;
   created_at: string;